@@ -1,22 +1,12 @@
 from flask import Blueprint, request, jsonify
-from utils.database import Database
+from utils.extensions import db, llm, response_cache, task_queue
 from dotenv import load_dotenv
-import os
-from utils.database import JobInfo
+from utils.listing import parse_list_args, list_response, stream_format, stream_list_response, JOB_FIELDS
 
 load_dotenv()
 
 add_job_page = Blueprint('add_job_page', __name__)
 
-db = Database(
-    username='595RKK4KraPnQQe.root',
-    password=os.getenv('db_pass'),
-    host='gateway01.ap-southeast-1.prod.aws.tidbcloud.com',
-    port=4000,
-    database='JOB_HUNTING',
-    ca_path=os.environ["DB_SSL_PEM"]
-)
-
 
 @add_job_page.route('/add-job', methods=['POST'])
 def add_job():
@@ -39,35 +29,57 @@ def add_job():
 
     if r.get("status") == "failure":
         return jsonify({"error": r.get("error")}), 500
-    
-    return jsonify({"message": "Job added successfully"}), 201
+
+    job_id = r["data"]["job_id"]
+
+    # Research the company now, off the request path; the job's
+    # research_status tracks it
+    r = task_queue.submit(
+        "company_research",
+        llm.research_job_company,
+        db._get_current_object(),
+        job_id,
+        company_website,
+        key=job_id
+    )
+    if r.get("status") == "failure":
+        db.update_job_research_status(job_id, "failed")
+
+    return jsonify({
+        "message": "Job added successfully",
+        "job_id": job_id,
+        "research_task_id": r["data"]["task_id"] if r.get("status") == "success" else None
+    }), 201
 
 @add_job_page.route('/get-all-jobs', methods=['GET'])
 def get_all_jobs():
     try:
-        with db.SessionLocal.begin() as session:
-            jobs = session.query(JobInfo).all()
-            job_list = []
-            for job in jobs:
-                job_data = {
-                    "job_id": job.job_id,
-                    "job_title": job.job_title,
-                    "company_name": job.company_name,
-                    "location": job.location,
-                    "job_description": job.job_description,
-                    "application_link": job.application_link,
-                    "company_website": job.company_website,
-                    "status": job.status
-                }
-                job_list.append(job_data)
-            return jsonify(job_list), 200
-    except Exception as e:
-        print(f"Error fetching jobs: {e}")
-        return jsonify({"error": str(e)}), 500
+        options = parse_list_args(request.args, JOB_FIELDS, filters=("status", "company_name"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stream = stream_format(request.args)
+
+    def build():
+        r = db.get_all_jobs(stream=bool(stream), **options)
+
+        if r.get("status") == "failure":
+            return jsonify({"error": r.get("error")}), 500
+
+        if stream:
+            return stream_list_response(r["data"], stream)
+
+        # The body stays a bare list; the next page's cursor travels in a header
+        return list_response(r, body=r["data"]), 200
+
+    return response_cache.respond(["jobs"], build)
 
 @add_job_page.route('/get-all-jobs/<string:job_id>', methods=['GET'])
 def get_job_by_id_route(job_id):
-    r = db.get_job_by_id(job_id)
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    def build():
+        r = db.get_job_by_id(job_id)
+        return jsonify(r), 200 if r.get("status") == "success" else 500
+
+    return response_cache.respond([f"job:{job_id}"], build)
 
 
@@ -0,0 +1,54 @@
+from asgiref.wsgi import WsgiToAsgi
+from quart import Quart, request
+from werkzeug.exceptions import HTTPException
+from async_dashboard_page import async_dashboard_page
+from main import CORS_EXPOSE_HEADERS, CORS_ORIGINS, app as flask_app
+from utils.telemetry import register_async_telemetry
+import os
+
+# Async serving mode: `uvicorn asgi:app`. The model-bound routes (see
+# async_dashboard_page.py) run as coroutines, so one process can keep hundreds
+# of Gemini calls in flight; every other route is forwarded to the Flask app,
+# which WsgiToAsgi runs in a thread pool. Both share the Flask app's services.
+
+# Seconds Quart lets a response run before cancelling it (its default is 60);
+# a streamed reply can wait on company research and a model call that the
+# call policy allows up to 120 s. The Dockerfile gives gunicorn the same value.
+RESPONSE_TIMEOUT = int(os.getenv("RESPONSE_TIMEOUT", 300))
+
+
+def create_asgi_app(flask_app):
+    async_app = Quart(__name__)
+    async_app.config["RESPONSE_TIMEOUT"] = RESPONSE_TIMEOUT
+    async_app.extensions.update(flask_app.extensions)
+    async_app.register_blueprint(async_dashboard_page)
+    register_async_telemetry(async_app)
+
+    @async_app.after_request
+    async def allow_cors(response):
+        # Mirrors flask_cors on the Flask side; preflights go to Flask
+        origin = request.headers.get("Origin")
+        if origin in CORS_ORIGINS:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Expose-Headers"] = ", ".join(CORS_EXPOSE_HEADERS)
+            response.headers["Vary"] = "Origin"
+        return response
+
+    wsgi_app = WsgiToAsgi(flask_app)
+    async_routes = async_app.url_map.bind("")
+
+    async def app(scope, receive, send):
+        if scope["type"] == "http":
+            try:
+                if scope["method"] == "OPTIONS":
+                    return await wsgi_app(scope, receive, send)
+                async_routes.match(scope["path"], method=scope["method"])
+            except HTTPException:
+                return await wsgi_app(scope, receive, send)
+        # Matched async routes and lifespan events
+        await async_app(scope, receive, send)
+
+    return app
+
+
+app = create_asgi_app(flask_app)
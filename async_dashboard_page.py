@@ -0,0 +1,117 @@
+from quart import Blueprint, Response, current_app, jsonify, request
+from werkzeug.local import LocalProxy
+from dashboard_page import PROFILE_FIELDS
+from utils.streaming import SSE_HEADERS, sse_event, wants_stream
+from contextlib import nullcontext
+import asyncio
+
+# Async versions of the model-bound dashboard routes, served by asgi.py. The
+# services are the same objects the Flask app created; every other route is
+# still answered by the Flask blueprints.
+async_dashboard_page = Blueprint('async_dashboard_page', __name__)
+
+db = LocalProxy(lambda: current_app.extensions["db"])
+task_queue = LocalProxy(lambda: current_app.extensions["task_queue"])
+llm = LocalProxy(lambda: current_app.extensions["llm"])
+
+
+def async_sse_response(events, lock=None):
+    async def generate():
+        async with lock or nullcontext():
+            async for event in events:
+                yield sse_event(event)
+
+    return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+@async_dashboard_page.route('/add-person', methods=['POST'])
+async def add_person():
+    data = await request.form
+
+    job_id = data.get('job_id')
+    profile_text = data.get('profile_text')
+
+    if not job_id or not profile_text or not profile_text.strip():
+        return jsonify({"error": "job_id and profile_text are required"}), 400
+
+    r = await llm.aget_profile_json(profile_text=profile_text, db=db._get_current_object())
+
+    if r.get("status") == "failure":
+        return jsonify({"error": r.get("error")}), 500
+
+    person = {field: r["data"].get(field) for field in PROFILE_FIELDS}
+    r = await asyncio.to_thread(db.set_person, job_id=job_id, **person)
+
+    if r.get("status") == "failure":
+        return jsonify({"error": r.get("error")}), 500
+
+    return jsonify(r), 201
+
+@async_dashboard_page.route('/generate-cold-message/<string:person_id>', methods=['GET'])
+async def generate_message(person_id):
+    if wants_stream(request.args):
+        return async_sse_response(
+            llm.astream_cold_message(db._get_current_object(), person_id),
+            lock=task_queue.async_key_lock(person_id)
+        )
+
+    r = await task_queue.submit_async(
+        "cold_message",
+        llm.agenerate_cold_message,
+        db._get_current_object(),
+        person_id,
+        key=person_id
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Cold message generation queued"
+    }), 202
+
+@async_dashboard_page.route('/send-follow-up/<string:person_id>', methods=['POST'])
+async def send_follow_up(person_id):
+    data = await request.form
+    new_message = data.get('message')
+
+    if not new_message or new_message.strip() == "":
+        return jsonify({"error": "Message cannot be empty"}), 400
+
+    person_chat = await asyncio.to_thread(db.get_message, id=person_id, last_n=1)
+
+    if person_chat.get("status") == "failure":
+        return jsonify(person_chat), 500
+
+    if person_chat["data"] == []:
+        return jsonify({
+            "error": "No existing conversation found. Please start a new chat first."
+        }), 400
+
+    if wants_stream(request.args):
+        # Same per-person lock as the queued follow-ups, so the two cannot
+        # interleave their appends
+        return async_sse_response(
+            llm.astream_follow_up(db._get_current_object(), person_id, new_message),
+            lock=task_queue.async_key_lock(person_id)
+        )
+
+    r = await task_queue.submit_async(
+        "follow_up",
+        llm.asend_follow_up,
+        db._get_current_object(),
+        person_id,
+        new_message,
+        key=person_id
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Follow-up queued"
+    }), 202
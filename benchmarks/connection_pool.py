@@ -0,0 +1,81 @@
+# Counts database connections opened while serving simulated requests.
+#
+# "before" mirrors the old layout: add_job_page and dashboard_page each built
+# their own engine with SQLAlchemy's default pool settings. "after" is the
+# single shared engine created by main.create_app with the tuned pool.
+#
+#   python benchmarks/connection_pool.py --requests 1000 --threads 16
+#
+# BENCH_DATABASE_URL points the run at a real server (e.g. the TiDB gateway);
+# by default a throwaway SQLite file is used, which is enough to compare how
+# many connections each layout opens. Against SQLite the timings say nothing
+# about connection setup cost (TCP and TLS handshakes), only the counts carry
+# over.
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, event, text
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import pool_settings_from_env
+
+
+def count_connections(engine, counter):
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with counter["lock"]:
+            counter["opened"] += 1
+
+
+def run(engines, requests, threads, work_ms):
+    counter = {"opened": 0, "lock": threading.Lock()}
+    for engine in engines:
+        count_connections(engine, counter)
+
+    def handle(i):
+        # Requests alternate between the blueprints, as the frontend does
+        engine = engines[i % len(engines)]
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            time.sleep(work_ms / 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(handle, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    for engine in engines:
+        engine.dispose()
+    return counter["opened"], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--work-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    settings = pool_settings_from_env()
+
+    before = [create_engine(url), create_engine(url)]
+    after = [create_engine(url, **settings)]
+
+    print(f"{args.requests} requests, {args.threads} threads, pool settings {settings}")
+    for label, engines in (("before", before), ("after", after)):
+        opened, elapsed = run(engines, args.requests, args.threads, args.work_ms)
+        per_1000 = opened * 1000 / args.requests
+        print(f"{label:>6}: {len(engines)} engine(s), {opened} connections opened "
+              f"({per_1000:.1f} per 1,000 requests), {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# Peak RSS of /get-all-people/<job_id> for one job with 50k people, built in
+# one piece (jsonify) and streamed (?stream=true and ?stream=ndjson). Each
+# mode runs in a fresh process, so every peak is measured from the same
+# baseline: the process after the app has been created and has served a
+# warm-up request.
+#
+#   python benchmarks/list_memory_benchmark.py
+#   python benchmarks/list_memory_benchmark.py --rows 200000
+#
+# Runs on a SQLite file seeded once (the first run takes a while).
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED_BATCH = 1000
+MODES = {
+    "jsonify": "",
+    "stream json": "?stream=true",
+    "stream ndjson": "?stream=ndjson",
+}
+
+
+def person(job_id, n):
+    return {
+        "job_id": job_id,
+        "name": f"person {n}",
+        "headline": "software engineer at a company that builds things",
+        "about": "builds reliable backend systems. " * 20,
+        "current_company": "Example Corp",
+        "current_job_title": "senior software engineer",
+        "duration_in_current_company": "2 years",
+        "previous_experiences": [{"Sample Labs": "software engineer"}, {"Other Inc": "intern"}],
+        "education": [{"Example University": "b.tech"}],
+        "additional_info": ["shares an interest in distributed systems"]
+    }
+
+
+def seed(path, rows):
+    from utils.database import Database
+
+    db = Database(url=f"sqlite:///{path}")
+    db.create_tables()
+    job_id = db.set_job("Engineer", "Example Corp", "Remote", "Build things.",
+                        "https://example.com/apply", "https://example.com")["data"]["job_id"]
+    for i in range(0, rows, SEED_BATCH):
+        db.set_people_bulk([person(job_id, n) for n in range(i, min(rows, i + SEED_BATCH))])
+    return job_id
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == "darwin" else 1)
+
+
+def measure(path, job_id, query):
+    # Runs in the child process; "-" stands for no query string
+    query = "" if query == "-" else query
+    os.environ.update({"DB_BACKEND": "sqlite", "SQLITE_PATH": path, "LLM_BACKEND": "fake", "LOG_LEVEL": "ERROR"})
+    from main import create_app
+
+    client = create_app().test_client()
+    client.get(f"/get-all-people/{job_id}?limit=10{query.replace('?', '&')}").get_data()
+    baseline = peak_rss_mb()
+
+    started = time.perf_counter()
+    response = client.get(f"/get-all-people/{job_id}{query}", buffered=False)
+    size = 0
+    for chunk in response.iter_encoded():
+        size += len(chunk)
+    response.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"{baseline:.1f} {peak_rss_mb():.1f} {size} {elapsed:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--measure", nargs=3, metavar=("PATH", "JOB_ID", "QUERY"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), f"list_memory_{args.rows}.db")
+    started = time.perf_counter()
+    job_id = seed(path, args.rows)
+    print(f"{args.rows:,} people (seeded in {time.perf_counter() - started:.1f}s)")
+    print(f"{'mode':<16}{'baseline MB':>13}{'peak MB':>10}{'growth MB':>11}{'body MB':>9}{'seconds':>9}")
+
+    for mode, query in MODES.items():
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--measure", path, job_id, query or "-"],
+            check=True, capture_output=True, text=True, cwd=ROOT
+        ).stdout.split()
+        baseline, peak, size, elapsed = float(output[-4]), float(output[-3]), int(output[-2]), float(output[-1])
+        print(f"{mode:<16}{baseline:>13.1f}{peak:>10.1f}{peak - baseline:>11.1f}{size / 2 ** 20:>9.1f}{elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# Open-loop load test for the LLM-bound routes: /add-person,
+# /generate-cold-message (submit + poll /task-status until done) and
+# /send-follow-up, at a fixed request rate.
+#
+#   python benchmarks/load_test.py --rps 20 --duration 30
+#   python benchmarks/load_test.py --url http://localhost:8080 --rps 5
+#
+# Without --url the app is built in-process with the fake LLM backend and, unless
+# DB_BACKEND is set, a temporary SQLite database, so the numbers measure this
+# code rather than Gemini. FAKE_LLM_LATENCY_MS,
+# FAKE_LLM_JITTER_MS, FAKE_LLM_FAILURE_RATE and FAKE_LLM_RATE_LIMIT_RATE shape
+# the simulated model.
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, form=None):
+        data = urllib.parse.urlencode(form).encode() if form is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=300) as response:
+                return response.status, json.loads(response.read() or b"null")
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read() or b"null")
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, form=None):
+        response = self.app.test_client().open(path, method=method, data=form)
+        return response.status_code, response.get_json()
+
+
+def build_in_process_app():
+    os.environ["LLM_BACKEND"] = "fake"
+    if "DB_BACKEND" not in os.environ:
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "load_test.db")
+    from main import app
+    return app
+
+
+def percentile(samples, p):
+    if not samples:
+        return float("nan")
+    samples = sorted(samples)
+    index = min(len(samples) - 1, max(0, round(p / 100 * len(samples)) - 1))
+    return samples[index]
+
+
+class LoadTest:
+    def __init__(self, client, job_id, poll_interval):
+        self.client = client
+        self.job_id = job_id
+        self.poll_interval = poll_interval
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.people = []
+        self.conversations = []
+        self.lock = threading.Lock()
+        self.counter = 0
+
+    def record(self, name, started, ok):
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if not ok:
+                self.errors[name] += 1
+
+    def wait_for_task(self, task_id):
+        while True:
+            status, body = self.client.request("GET", f"/task-status/{task_id}")
+            if status != 200:
+                return False
+            if body["data"]["status"] in ("succeeded", "failed"):
+                return body["data"]["status"] == "succeeded"
+            time.sleep(self.poll_interval)
+
+    def add_person(self):
+        with self.lock:
+            self.counter += 1
+            n = self.counter
+        started = time.perf_counter()
+        status, body = self.client.request("POST", "/add-person", {
+            "job_id": self.job_id,
+            "profile_text": f"Load test profile {n} {random.random()}"
+        })
+        self.record("add-person", started, status == 201)
+        if status == 201:
+            with self.lock:
+                self.people.append(body["data"]["person_id"])
+
+    def cold_message(self):
+        with self.lock:
+            person_id = random.choice(self.people) if self.people else None
+        if person_id is None:
+            return self.add_person()
+        started = time.perf_counter()
+        status, body = self.client.request("GET", f"/generate-cold-message/{person_id}")
+        self.record("generate-cold-message (submit)", started, status == 202)
+        if status == 202:
+            ok = self.wait_for_task(body["data"]["task_id"])
+            self.record("generate-cold-message (complete)", started, ok)
+            if ok:
+                with self.lock:
+                    self.conversations.append(person_id)
+
+    def follow_up(self):
+        with self.lock:
+            person_id = random.choice(self.conversations) if self.conversations else None
+        if person_id is None:
+            return self.cold_message()
+        started = time.perf_counter()
+        status, body = self.client.request("POST", f"/send-follow-up/{person_id}", {
+            "message": "Thanks! Could you share who the hiring manager is?"
+        })
+        self.record("send-follow-up (submit)", started, status == 202)
+        if status == 202:
+            self.record("send-follow-up (complete)", started, self.wait_for_task(body["data"]["task_id"]))
+
+    def run(self, rps, duration, mix, concurrency):
+        operations = [self.add_person, self.cold_message, self.follow_up]
+        total = int(rps * duration)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for i in range(total):
+                # Open loop: requests are issued on schedule whatever the latency
+                delay = started + i / rps - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(random.choices(operations, weights=mix)[0])
+        return time.perf_counter() - started
+
+    def report(self, elapsed):
+        print(f"{'endpoint':<34}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}")
+        for name in sorted(self.latencies):
+            samples = self.latencies[name]
+            print(f"{name:<34}{len(samples):>7}{self.errors[name]:>8}"
+                  f"{percentile(samples, 50) * 1000:>10.1f}{percentile(samples, 95) * 1000:>10.1f}"
+                  f"{percentile(samples, 99) * 1000:>10.1f}{len(samples) / elapsed:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Base URL of a running server; default runs the app in-process")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--concurrency", type=int, default=200, help="max in-flight client requests")
+    parser.add_argument("--mix", default="4,3,3", help="weights for add-person,cold-message,follow-up")
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    client = HttpClient(args.url) if args.url else InProcessClient(build_in_process_app())
+
+    status, body = client.request("POST", "/add-job", {
+        "job_title": "Load Test Engineer",
+        "company_name": "Example Corp",
+        "location": "Remote",
+        "job_description": "Build and operate backend services.",
+        "application_link": "https://example.com/jobs/1",
+        "company_website": "https://example.com"
+    })
+    if status != 201:
+        sys.exit(f"Could not create a job: {status} {body}")
+
+    test = LoadTest(client, body["job_id"], args.poll_interval)
+    mix = [float(weight) for weight in args.mix.split(",")]
+    elapsed = test.run(args.rps, args.duration, mix, args.concurrency)
+    print(f"target {args.rps} req/s for {args.duration}s, wall time {elapsed:.1f}s")
+    test.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Times ContactRanker.rank for one job with 1k/10k contacts: cold (every
+# profile tokenized), warm (cached vectors) and after one contact is added
+# (only the new profile tokenized).
+#
+#   python benchmarks/ranking_benchmark.py
+#   python benchmarks/ranking_benchmark.py --sizes 10000 --repeat 50
+#
+# Runs on a fresh SQLite file per size.
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.database import Database
+from utils.ranking import ContactRanker
+
+SEED_BATCH = 500
+WORDS = ("backend frontend platform data machine learning infrastructure payments search mobile security "
+         "python java golang kubernetes react distributed systems recruiting talent hiring manager director "
+         "engineering product analytics cloud devops startup fintech healthcare marketplace ads growth").split()
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def person(rng, job_id, n):
+    return {
+        "job_id": job_id,
+        "name": f"person {n}",
+        "headline": text(rng, 8),
+        "about": text(rng, 80),
+        "current_company": "Example Corp",
+        "current_job_title": text(rng, 3),
+        "duration_in_current_company": "2 years",
+        "previous_experiences": [{f"Company {rng.randrange(500)}": text(rng, 4)} for _ in range(3)],
+        "education": [{"Example University": "b.tech"}],
+        "additional_info": [text(rng, 10)]
+    }
+
+
+def seed(db, size):
+    rng = random.Random(size)
+    job_id = db.set_job("Backend Engineer", "Example Corp", "Remote", text(rng, 300),
+                        "https://example.com/apply", "https://example.com")["data"]["job_id"]
+    people = [person(rng, job_id, n) for n in range(size)]
+    for i in range(0, size, SEED_BATCH):
+        db.set_people_bulk(people[i:i + SEED_BATCH])
+    return job_id, rng
+
+
+def timed(fn):
+    started = time.perf_counter()
+    r = fn()
+    if r.get("status") != "success":
+        raise RuntimeError(r)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for size in [int(size) for size in args.sizes.split(",")]:
+        db = Database(url="sqlite:///" + os.path.join(tempfile.mkdtemp(), f"ranking_{size}.db"))
+        db.create_tables()
+        job_id, rng = seed(db, size)
+        ranker = ContactRanker(db)
+
+        cold = timed(lambda: ranker.rank(job_id, limit=50))
+        warm = sorted(timed(lambda: ranker.rank(job_id, limit=50)) for _ in range(args.repeat))
+        added = []
+        for n in range(args.repeat):
+            db.set_person(**person(rng, job_id, size + n))
+            added.append(timed(lambda: ranker.rank(job_id, limit=50)))
+        added.sort()
+
+        print(f"{size:,} contacts")
+        print(f"{'case':<22}{'mean ms':>10}{'p50 ms':>10}")
+        print(f"{'cold':<22}{cold * 1000:>10.1f}{cold * 1000:>10.1f}")
+        print(f"{'warm':<22}{statistics.fmean(warm) * 1000:>10.1f}{warm[len(warm) // 2] * 1000:>10.1f}")
+        print(f"{'after one added':<22}{statistics.fmean(added) * 1000:>10.1f}{added[len(added) // 2] * 1000:>10.1f}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
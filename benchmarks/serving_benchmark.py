@@ -0,0 +1,136 @@
+# Compares the sync (gunicorn main:app) and async (uvicorn asgi:app) serving
+# modes on the model-bound routes: the same number of workers receive a burst
+# of concurrent requests while the fake LLM backend holds every model call for
+# FAKE_LLM_LATENCY_MS.
+#
+#   python benchmarks/serving_benchmark.py
+#   python benchmarks/serving_benchmark.py --concurrency 400 --latency-ms 1000 --route stream
+#
+# Each mode gets its own server process and temporary SQLite database.
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from load_test import HttpClient, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    # Threaded workers, as the Dockerfile runs them
+    "sync": lambda port, workers: ["gunicorn", "--bind", f"127.0.0.1:{port}", "--worker-class", "gthread", "--workers", str(workers),
+                                   "--threads", "16", "--timeout", "300", "main:app"],
+    "async": lambda port, workers: ["uvicorn", "asgi:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, workers, latency_ms):
+    port = free_port()
+    env = dict(
+        os.environ,
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY_MS=str(latency_ms),
+        DB_BACKEND="sqlite",
+        SQLITE_PATH=os.path.join(tempfile.mkdtemp(), f"serving_{mode}.db"),
+        LOG_LEVEL="WARNING",
+    )
+    process = subprocess.Popen(SERVERS[mode](port, workers), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = HttpClient(f"http://127.0.0.1:{port}")
+    for _ in range(100):
+        try:
+            client.request("GET", "/cache-stats")
+            return process, client
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.1)
+    process.kill()
+    sys.exit(f"{mode} server did not start")
+
+
+def stream(client, path):
+    # Reads the whole event stream; the request ends when the "done" event has
+    # been sent
+    with urllib.request.urlopen(client.base_url + path, timeout=600) as response:
+        body = response.read().decode()
+    return response.status, "event: done" in body
+
+
+def run(mode, args):
+    process, client = start_server(mode, args.workers, args.latency_ms)
+    try:
+        status, body = client.request("POST", "/add-job", {
+            "job_title": "Benchmark Engineer",
+            "company_name": "Example Corp",
+            "location": "Remote",
+            "job_description": "Build and operate backend services.",
+            "application_link": "https://example.com/jobs/1",
+            "company_website": "https://example.com"
+        })
+        job_id = body["job_id"]
+        status, body = client.request("POST", "/add-person", {"job_id": job_id, "profile_text": "warm up"})
+        person_id = body["data"]["person_id"]
+        # Warm the company research cache so every stream costs one model call
+        stream(client, f"/generate-cold-message/{person_id}?stream=true")
+
+        def add_person(i):
+            status, body = client.request("POST", "/add-person", {"job_id": job_id, "profile_text": f"{mode} profile {i}"})
+            return status == 201
+
+        def cold_message(i):
+            status, ok = stream(client, f"/generate-cold-message/{person_id}?stream=true")
+            return status == 200 and ok
+
+        call = add_person if args.route == "add-person" else cold_message
+
+        def timed(i):
+            started = time.perf_counter()
+            ok = call(i)
+            return time.perf_counter() - started, ok
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(timed, range(args.requests)))
+        elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+    latencies = [latency for latency, ok in results]
+    errors = sum(1 for latency, ok in results if not ok)
+    print(f"{mode:<8}{len(results):>9}{errors:>8}{elapsed:>9.1f}{len(results) / elapsed:>9.1f}"
+          f"{percentile(latencies, 50) * 1000:>10.0f}{percentile(latencies, 95) * 1000:>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--route", choices=("add-person", "stream"), default="add-person",
+                        help="POST /add-person, or a streamed /generate-cold-message")
+    parser.add_argument("--workers", type=int, default=1, help="server processes per mode")
+    parser.add_argument("--concurrency", type=int, default=200, help="requests in flight")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=int, default=250, help="simulated model latency")
+    args = parser.parse_args()
+
+    print(f"{args.requests} x {args.route}, {args.concurrency} in flight, {args.workers} worker(s), "
+          f"{args.latency_ms} ms per model call")
+    print(f"{'mode':<8}{'requests':>9}{'errors':>8}{'wall s':>9}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode in args.modes.split(","):
+        run(mode, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import click
+from flask import current_app
+
+
+def register_commands(app):
+    @app.cli.command("init-db")
+    def init_db():
+        """Create any missing tables."""
+        current_app.extensions["db"].create_tables()
+        click.echo("Tables created")
+
+    @app.cli.command("migrate-chat-history")
+    @click.option("--batch-size", default=100, show_default=True)
+    def migrate_chat_history(batch_size):
+        """Move ChatHistory JSON blobs into the per-turn ChatMessages table."""
+        r = current_app.extensions["db"].migrate_chat_history(batch_size=batch_size)
+        if r.get("status") == "failure":
+            raise click.ClickException(r.get("error"))
+        click.echo(f"Migrated {r['data']['migrated']} conversations")
+
+    @app.cli.command("migrate-schema")
+    @click.option("--repair", is_flag=True, help="Delete duplicate and orphaned people that block the new constraints.")
+    def migrate_schema(repair):
+        """Add missing Jobs columns and the PersonInfo indexes and foreign key to an existing database."""
+        r = current_app.extensions["db"].migrate_schema(repair=repair)
+        if r.get("status") == "failure":
+            raise click.ClickException(r.get("error"))
+        for name in r["data"]["applied"]:
+            click.echo(f"Added {name}")
+        for name in r["data"]["skipped"]:
+            click.echo(f"Skipped {name} (not supported by this database)")
+        if r["data"]["removed"]:
+            click.echo(f"Removed {r['data']['removed']} duplicate or orphaned people")
+        if not r["data"]["applied"]:
+            click.echo("Schema is up to date")
+
+    @app.cli.command("rebuild-search-index")
+    @click.option("--batch-size", default=500, show_default=True)
+    def rebuild_search_index(batch_size):
+        """Index every job, person and chat turn for /search from scratch."""
+        r = current_app.extensions["db"].rebuild_search_index(batch_size=batch_size)
+        if r.get("status") == "failure":
+            raise click.ClickException(r.get("error"))
+        click.echo(f"Indexed {r['data']['job']} jobs, {r['data']['person']} people and {r['data']['chat']} chat turns")
+
+    @app.cli.command("gc-orphans")
+    @click.option("--batch-size", default=500, show_default=True)
+    @click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+    @click.option("--dry-run", is_flag=True, help="Count orphans without deleting them.")
+    def gc_orphans(batch_size, pause, dry_run):
+        """Delete people whose job is gone and conversations whose owner is gone."""
+        r = current_app.extensions["db"].gc_orphans(batch_size=batch_size, dry_run=dry_run, pause=pause)
+        if r.get("status") == "failure":
+            raise click.ClickException(r.get("error"))
+        verb = "Found" if dry_run else "Purged"
+        for table, count in r["data"].items():
+            click.echo(f"{verb} {count} orphaned {table.replace('_', ' ')} rows")
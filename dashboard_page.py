@@ -1,23 +1,33 @@
 from flask import Blueprint, request, jsonify
-from utils.large_language_model import LLM
-from utils.database import Database
+from utils.database import DUPLICATE_PERSON_ERROR
+from utils.extensions import db, llm, ranker, response_cache, task_queue
+from utils.listing import parse_list_args, list_response, stream_format, stream_list_response, PERSON_FIELDS
+from utils.streaming import sse_response, wants_stream
 from dotenv import load_dotenv
+import json
 import os
 
 load_dotenv()
 
 dashboard_page = Blueprint('dashboard_page', __name__)
 
-db = Database(
-    username='595RKK4KraPnQQe.root',
-    password=os.getenv('db_pass'),
-    host='gateway01.ap-southeast-1.prod.aws.tidbcloud.com',
-    port=4000,
-    database='JOB_HUNTING',
-    ca_path=os.environ["DB_SSL_PEM"]
-)
+MAX_BULK_IDS = 500
+# /add-people makes one model call per profile
+MAX_BULK_PROFILES = int(os.getenv("MAX_BULK_PROFILES", 100))
+NOT_FOUND_ERRORS = ("Person not found", "People not found", "Job not found")
+
+def status_code(r):
+    if r.get("status") == "success":
+        return 200
+    return 404 if r.get("error") in NOT_FOUND_ERRORS else 500
 
-llm = LLM()
+def read_person_ids(data):
+    person_ids = data.get("person_ids")
+    if not isinstance(person_ids, list) or not person_ids or not all(isinstance(i, str) for i in person_ids):
+        raise ValueError("person_ids must be a non-empty list of ids")
+    if len(person_ids) > MAX_BULK_IDS:
+        raise ValueError(f"At most {MAX_BULK_IDS} person_ids per request")
+    return list(dict.fromkeys(person_ids))
 
 @dashboard_page.route('/add-person', methods=['POST'])
 def add_person():
@@ -26,7 +36,10 @@ def add_person():
     job_id = data.get('job_id')
     profile_text = data.get('profile_text')
 
-    r = llm.get_profile_json(profile_text=profile_text)
+    if not job_id or not profile_text or not profile_text.strip():
+        return jsonify({"error": "job_id and profile_text are required"}), 400
+
+    r = llm.get_profile_json(profile_text=profile_text, db=db)
 
     if r.get("status") == "failure":
         return jsonify({"error": r.get("error")}), 500
@@ -50,21 +63,245 @@ def add_person():
     # Return the newly created person object
     return jsonify(r), 201
 
+PROFILE_FIELDS = (
+    "name",
+    "headline",
+    "about",
+    "current_company",
+    "current_job_title",
+    "duration_in_current_company",
+    "previous_experiences",
+    "education",
+    "additional_info",
+)
+
+INVALID_PROFILE_ERROR = "A profile must be its text or an object with profile_text"
+
+def read_profile_items():
+    # Accepts {"job_id": ..., "profiles": [...]}, a bare JSON array, or NDJSON
+    # (one profile per line). A profile is either its text or an object with
+    # "profile_text" and an optional per-item "job_id". A malformed item is
+    # kept as {"error": ...} so it is reported on its own.
+    default_job_id = request.args.get('job_id')
+
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        items = []
+        for line in request.stream:
+            if line.strip():
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    items.append(None)
+    else:
+        body = request.get_json(silent=True)
+        if body is None:
+            raise ValueError("Invalid JSON body")
+        if isinstance(body, dict):
+            default_job_id = body.get("job_id", default_job_id)
+            items = body.get("profiles", [])
+        else:
+            items = body
+        if not isinstance(items, list):
+            raise ValueError("profiles must be a list")
+
+    profiles = []
+    for item in items:
+        if isinstance(item, str):
+            item = {"profile_text": item}
+        if not isinstance(item, dict):
+            profiles.append({"error": INVALID_PROFILE_ERROR})
+            continue
+        profiles.append({
+            "job_id": item.get("job_id", default_job_id),
+            "profile_text": item.get("profile_text")
+        })
+    return profiles
+
+def add_profiles(db, llm, profiles, progress=None):
+    # The /add-people task: extracts every profile, then inserts the new
+    # people in one batch. Each item is reported as created, duplicate or
+    # failed, by its index in the request.
+    progress = progress or (lambda message: None)
+    report = [{"index": i} for i in range(len(profiles))]
+    pending = []
+    for i, profile in enumerate(profiles):
+        if profile.get("error"):
+            report[i].update(status="failed", error=profile["error"])
+        elif not isinstance(profile["job_id"], str) or not profile["job_id"] \
+                or not isinstance(profile["profile_text"], str) or not profile["profile_text"].strip():
+            report[i].update(status="failed", error="job_id and profile_text are required")
+        else:
+            pending.append(i)
+
+    progress(f"Extracting {len(pending)} profiles")
+    extracted = llm.get_profile_jsons([profiles[i]["profile_text"] for i in pending], db=db)
+
+    existing = db.get_existing_people_names({profiles[i]["job_id"] for i in pending})
+    if existing.get("status") == "failure":
+        return existing
+    seen = existing["data"]
+
+    new_people = []
+    new_people_index = []
+    for i, r in zip(pending, extracted):
+        if r.get("status") == "failure":
+            report[i].update(status="failed", error=r.get("error"))
+            continue
+
+        person = {field: r["data"].get(field) for field in PROFILE_FIELDS}
+        person["job_id"] = profiles[i]["job_id"]
+        key = (person["job_id"], person["name"])
+        if key in seen:
+            report[i].update(status="duplicate", error="Person with the same name already exists for this job.")
+            continue
+
+        seen.add(key)
+        new_people.append(person)
+        new_people_index.append(i)
+
+    progress(f"Saving {len(new_people)} people")
+    r = db.set_people_bulk(new_people)
+
+    if r.get("status") == "failure":
+        for i in new_people_index:
+            report[i].update(status="failed", error=r.get("error"))
+    else:
+        rejected = r.get("rejected", {})
+        for j, (i, person) in enumerate(zip(new_people_index, r["data"])):
+            if j in rejected:
+                error = rejected[j]
+                report[i].update(status="duplicate" if error == DUPLICATE_PERSON_ERROR else "failed", error=error)
+            else:
+                report[i].update(status="created", data=person)
+
+    created = sum(1 for item in report if item["status"] == "created")
+    return {
+        "data": report,
+        "status": "success",
+        "message": f"Added {created} of {len(profiles)} people"
+    }
+
+@dashboard_page.route('/add-people', methods=['POST'])
+def add_people():
+    try:
+        profiles = read_profile_items()
+    except ValueError:
+        return jsonify({"error": "Body must be a JSON array, an object with 'profiles', or NDJSON"}), 400
+
+    if not profiles:
+        return jsonify({"error": "No profiles provided"}), 400
+
+    if len(profiles) > MAX_BULK_PROFILES:
+        return jsonify({"error": f"At most {MAX_BULK_PROFILES} profiles per request"}), 400
+
+    # One model call per profile; the client polls /task-status/<task_id>
+    # for the per-item report
+    r = task_queue.submit(
+        "add_people",
+        add_profiles,
+        db._get_current_object(),
+        llm._get_current_object(),
+        profiles
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": f"Adding {len(profiles)} people queued"
+    }), 202
+
 @dashboard_page.route('/add-connection/<string:person_id>', methods=['PUT'])
 def add_connection(person_id):
     r = db.update_person_status(person_id, "Connected")
     
     if r.get("status") == "failure":
-        return jsonify({"error": r.get("error")}), 500
+        return jsonify({"error": r.get("error")}), status_code(r)
     
     return jsonify(r), 200
 
 
 @dashboard_page.route('/generate-cold-message/<string:person_id>', methods=['GET'])
 def generate_message(person_id):
-    r = llm.generate_cold_message(db, person_id)
-    
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    # ?stream=true forwards tokens as Server-Sent Events while they are generated
+    if wants_stream(request.args):
+        return sse_response(
+            llm.stream_cold_message(db._get_current_object(), person_id),
+            lock=task_queue.key_lock(person_id)
+        )
+
+    # Generation takes two model calls; run it in the background and let the
+    # client poll /task-status/<task_id>
+    r = task_queue.submit(
+        "cold_message",
+        llm.generate_cold_message,
+        db._get_current_object(),
+        person_id,
+        key=person_id
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Cold message generation queued"
+    }), 202
+
+@dashboard_page.route('/generate-cold-messages/<string:job_id>', methods=['POST'])
+def generate_messages(job_id):
+    # People who already have a conversation keep it unless ?overwrite=true
+    overwrite = request.values.get('overwrite', 'false').lower() in ('1', 'true', 'yes')
+
+    r = task_queue.submit(
+        "cold_messages",
+        llm.generate_cold_messages,
+        db._get_current_object(),
+        job_id,
+        overwrite=overwrite,
+        key_lock=task_queue.key_lock,
+        key=job_id
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Cold message generation queued for all people on this job"
+    }), 202
+
+@dashboard_page.route('/refresh-company-research/<string:job_id>', methods=['POST'])
+def refresh_company_research(job_id):
+    job = db.get_job_by_id(job_id)
+
+    if job.get("status") == "failure":
+        return jsonify(job), 404 if job.get("error") == "Job not found" else 500
+
+    # Same background research as /add-job; the client polls
+    # /task-status/<task_id>
+    r = task_queue.submit(
+        "company_research",
+        llm.research_job_company,
+        db._get_current_object(),
+        job_id,
+        job["data"]["company_website"],
+        refresh=True,
+        key=job_id
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Company research refresh queued"
+    }), 202
 
 @dashboard_page.route('/send-follow-up/<string:person_id>', methods=['POST'])
 def send_follow_up(person_id):
@@ -74,8 +311,8 @@ def send_follow_up(person_id):
     if not new_message or new_message.strip() == "":
         return jsonify({"error": "Message cannot be empty"}), 400
 
-    # Fetch existing chat
-    person_chat = db.get_message(id=person_id)
+    # Only need to know the conversation exists; the task loads its context
+    person_chat = db.get_message(id=person_id, last_n=1)
 
     if person_chat.get("status") == "failure":
         return jsonify(person_chat), 500
@@ -84,38 +321,68 @@ def send_follow_up(person_id):
         return jsonify({
             "error": "No existing conversation found. Please start a new chat first."
         }), 400
-    messages = person_chat["data"]
-
-    # Append user message (Gemini format)
-    messages.append({
-        "role": "user",
-        "parts": [{"text": new_message.strip()}]
-    })
-###############
-    # Send updated conversation to Gemini
-    r = llm.get_follow_up_response(db=db,
-        prompt=messages,
-        person_id=person_id
+
+    if wants_stream(request.args):
+        # Same per-person lock as the queued follow-ups, so the two cannot
+        # interleave their appends
+        return sse_response(
+            llm.stream_follow_up(db._get_current_object(), person_id, new_message),
+            lock=task_queue.key_lock(person_id)
+        )
+
+    # The task re-reads the conversation once it holds the per-person lock, so
+    # follow-ups sent in quick succession are answered in order
+    r = task_queue.submit(
+        "follow_up",
+        llm.send_follow_up,
+        db._get_current_object(),
+        person_id,
+        new_message,
+        key=person_id
     )
 
     if r.get("status") == "failure":
         return jsonify(r), 500
 
-    return jsonify(r), 200 
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Follow-up queued"
+    }), 202
+
+@dashboard_page.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    # Counters are per worker process and reset on restart
+    return jsonify({
+        "data": {**llm.cache_stats(), "responses": response_cache.stats.snapshot()},
+        "status": "success"
+    }), 200
+
+@dashboard_page.route('/task-status/<string:task_id>', methods=['GET'])
+def task_status(task_id):
+    r = task_queue.get(task_id)
 
-@dashboard_page.route('/chat-history/<string:person_id>', methods=['GET'])
-def chat_history(person_id):
-    r = db.get_message(id=person_id)
-    
-    # If no chat history exists, return empty messages instead of error
     if r.get("status") == "failure":
-        return jsonify({
-            "data": [],
-            "status": "success"
-        }), 200
-    
+        return jsonify(r), 404 if r.get("error") == "Task not found" else 500
+
     return jsonify(r), 200
 
+@dashboard_page.route('/chat-history/<string:person_id>', methods=['GET'])
+def chat_history(person_id):
+    def build():
+        r = db.get_message(id=person_id)
+
+        # If no chat history exists, return empty messages instead of error
+        if r.get("status") == "failure":
+            return jsonify({
+                "data": [],
+                "status": "success"
+            }), 200
+
+        return jsonify(r), 200
+
+    return response_cache.respond([f"chat:{person_id}"], build)
+
 @dashboard_page.route('/clear-history/<string:person_id>', methods=['DELETE'])
 def clear_history(person_id):
     r = db.clear_messages(person_id)
@@ -124,21 +391,71 @@ def clear_history(person_id):
 
 @dashboard_page.route('/get-all-people/<string:job_id>', methods=['GET'])
 def get_all_people(job_id):
-    r = db.get_all_people(job_id)
+    try:
+        options = parse_list_args(request.args, PERSON_FIELDS, filters=("status",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    stream = stream_format(request.args)
+
+    def build():
+        r = db.get_all_people(job_id, stream=bool(stream), **options)
+        if stream and r.get("status") == "success":
+            return stream_list_response(r["data"], stream, envelope={"status": r["status"], "message": r["message"]})
+        return list_response(r), 200 if r.get("status") == "success" else 500
+
+    return response_cache.respond([f"people:{job_id}"], build)
 
 @dashboard_page.route('/get-all-connections/<string:job_id>', methods=['GET'])
 def get_all_connections(job_id):
-    r = db.get_all_connections(job_id)
-
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    try:
+        options = parse_list_args(request.args, PERSON_FIELDS, filters=("status",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stream = stream_format(request.args)
+
+    def build():
+        r = db.get_all_connections(job_id, stream=bool(stream), **options)
+        if stream and r.get("status") == "success":
+            return stream_list_response(r["data"], stream, envelope={"status": r["status"], "message": r["message"]})
+        return list_response(r), 200 if r.get("status") == "success" else 500
+
+    return response_cache.respond([f"people:{job_id}"], build)
+
+@dashboard_page.route('/rank-people/<string:job_id>', methods=['GET'])
+def rank_people(job_id):
+    # The job's people, best match for its description first; ?cursor= is
+    # an offset into the ranking
+    try:
+        options = parse_list_args(request.args, (), filters=("status",))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if options.get("cursor") and not options["cursor"].isdigit():
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    def build():
+        r = ranker.rank(job_id, **options)
+        return list_response(r), status_code(r)
+
+    return response_cache.respond([f"people:{job_id}", f"job:{job_id}"], build)
 
 @dashboard_page.route('/delete-person/<string:person_id>', methods=['DELETE'])
 def delete_person(person_id):
     r = db.delete_person(person_id)
 
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    return jsonify(r), status_code(r)
+
+@dashboard_page.route('/delete-people', methods=['DELETE'])
+def delete_people():
+    try:
+        person_ids = read_person_ids(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    r = db.delete_people(person_ids)
+
+    return jsonify(r), status_code(r)
 
 @dashboard_page.route('/update-person-status/<string:person_id>', methods=['PUT'])
 def update_person_status(person_id):
@@ -150,7 +467,23 @@ def update_person_status(person_id):
     
     r = db.update_person_status(person_id, status)
     
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    return jsonify(r), status_code(r)
+
+@dashboard_page.route('/update-people-status', methods=['PUT'])
+def update_people_status():
+    data = request.get_json(silent=True) or {}
+    status = data.get('status')
+
+    if not status:
+        return jsonify({"error": "Status is required"}), 400
+    try:
+        person_ids = read_person_ids(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    r = db.update_people_status(person_ids, status)
+
+    return jsonify(r), status_code(r)
 
 
 @dashboard_page.route('/update-job-status/<string:job_id>', methods=['PUT'])
@@ -163,10 +496,10 @@ def update_job_status(job_id):
     
     r = db.update_job_status(job_id, status)
 
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    return jsonify(r), status_code(r)
 
 @dashboard_page.route('/delete-job/<string:job_id>', methods=['DELETE'])
 def delete_job(job_id):
     r = db.delete_job(job_id)
 
-    return jsonify(r), 200 if r.get("status") == "success" else 500
+    return jsonify(r), status_code(r)
@@ -1,11 +1,53 @@
 from flask import Flask
 from add_job_page import add_job_page
 from dashboard_page import dashboard_page
+from resume_page import resume_page
+from search_page import search_page
 from flask_cors import CORS
+from commands import register_commands
+from utils.database import Database
+from utils.large_language_model import LLM
+from utils.ranking import ContactRanker
+from utils.response_cache import ResponseCache
+from utils.resume import ResumeTailor
+from utils.task_queue import TaskQueue, LocalTaskStore, TASK_STALE_SECONDS
+from utils.telemetry import register_telemetry
+import os
 
+CORS_ORIGINS = ["http://localhost:5173"]
+# Response headers the frontend reads; browsers hide any not listed here
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "ETag", "X-Request-ID"]
 
-app = Flask(__name__)
-CORS(app, origins=["http://localhost:5173"])
 
-app.register_blueprint(add_job_page)
-app.register_blueprint(dashboard_page)
+def create_app(db=None, llm=None):
+    app = Flask(__name__)
+    CORS(app, origins=CORS_ORIGINS, expose_headers=CORS_EXPOSE_HEADERS)
+    # JSON logs with a request id, per-route latency histograms and /metrics
+    register_telemetry(app)
+
+    # A single engine (and connection pool) per process, shared by all blueprints
+    app.extensions["db"] = db or Database.from_env()
+    app.extensions["llm"] = llm or LLM()
+    app.extensions["response_cache"] = ResponseCache(app.extensions["db"])
+    app.extensions["resumes"] = ResumeTailor(app.extensions["llm"])
+    app.extensions["ranker"] = ContactRanker(app.extensions["db"])
+
+    # Background workers for LLM-bound routes. Task state lives in the database
+    # so any gunicorn worker can answer a status poll; TASK_STORE=local keeps it
+    # in memory for single-process local runs.
+    task_store = LocalTaskStore() if os.getenv("TASK_STORE") == "local" else app.extensions["db"]
+    app.extensions["task_queue"] = TaskQueue(task_store)
+    # Tasks left queued or running by a process that has since stopped would
+    # otherwise be polled forever
+    task_store.fail_stale_tasks(TASK_STALE_SECONDS)
+
+    app.register_blueprint(add_job_page)
+    app.register_blueprint(dashboard_page)
+    app.register_blueprint(resume_page)
+    app.register_blueprint(search_page)
+    register_commands(app)
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,75 @@
+from flask import Blueprint, request, jsonify, send_from_directory
+from utils.extensions import db, resumes, task_queue
+from utils.resume import RESUME_FORMATS
+from dotenv import load_dotenv
+import re
+
+load_dotenv()
+
+resume_page = Blueprint('resume_page', __name__)
+
+MAX_BATCH_JOBS = 50
+
+@resume_page.route('/tailor-resume/<string:job_id>', methods=['POST'])
+def tailor_resume(job_id):
+    remarks = request.form.get('remarks', '')
+
+    r = task_queue.submit(
+        "resume",
+        resumes.tailor,
+        db._get_current_object(),
+        job_id,
+        remarks
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": "Resume tailoring queued"
+    }), 202
+
+@resume_page.route('/tailor-resumes', methods=['POST'])
+def tailor_resumes():
+    # job_ids as a repeated form field or one comma-separated value
+    job_ids = [job_id.strip() for value in request.form.getlist('job_ids') for job_id in value.split(',') if job_id.strip()]
+    job_ids = list(dict.fromkeys(job_ids))
+    remarks = request.form.get('remarks', '')
+
+    if not job_ids:
+        return jsonify({"error": "job_ids must list at least one job"}), 400
+    if len(job_ids) > MAX_BATCH_JOBS:
+        return jsonify({"error": f"At most {MAX_BATCH_JOBS} job_ids per request"}), 400
+
+    r = task_queue.submit(
+        "resumes",
+        resumes.tailor_batch,
+        db._get_current_object(),
+        job_ids,
+        remarks
+    )
+
+    if r.get("status") == "failure":
+        return jsonify(r), 500
+
+    return jsonify({
+        "data": r["data"],
+        "status": "success",
+        "message": f"Resume tailoring queued for {len(job_ids)} jobs"
+    }), 202
+
+@resume_page.route('/resumes/<string:resume_id>.<string:format>', methods=['GET'])
+def download_resume(resume_id, format):
+    if format not in RESUME_FORMATS or not re.fullmatch(r"[0-9a-f]{64}", resume_id):
+        return jsonify({"error": "Resume not found"}), 404
+
+    # Outputs are named by cache key and never change once written
+    return send_from_directory(
+        resumes.renderer.output_dir,
+        f"{resume_id}.{format}",
+        as_attachment=True,
+        download_name=f"resume-{resume_id[:12]}.{format}",
+        max_age=365 * 24 * 3600
+    )
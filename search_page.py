@@ -0,0 +1,39 @@
+from flask import Blueprint, request, jsonify
+from utils.database import SEARCH_DOC_TYPES
+from utils.extensions import db
+from utils.listing import parse_list_args, list_response
+from dotenv import load_dotenv
+
+load_dotenv()
+
+search_page = Blueprint('search_page', __name__)
+
+DEFAULT_SEARCH_LIMIT = 20
+
+@search_page.route('/search', methods=['GET'])
+def search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "q is required"}), 400
+
+    try:
+        options = parse_list_args(request.args, (), filters=("type", "job_id"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if options.get("type") and options["type"] not in SEARCH_DOC_TYPES:
+        return jsonify({"error": f"type must be one of: {', '.join(SEARCH_DOC_TYPES)}"}), 400
+    if options.get("cursor") and not options["cursor"].isdigit():
+        return jsonify({"error": "Invalid cursor"}), 400
+
+    r = db.search(
+        query,
+        doc_type=options.get("type"),
+        job_id=options.get("job_id"),
+        limit=options.get("limit", DEFAULT_SEARCH_LIMIT),
+        cursor=options.get("cursor")
+    )
+
+    if r.get("status") == "failure":
+        return jsonify({"error": r.get("error")}), 500
+
+    return list_response(r), 200
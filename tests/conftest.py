@@ -0,0 +1,56 @@
+import os
+
+# main builds its module-level app on import; keep it offline and throwaway
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", ":memory:")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ.setdefault("LLM_RATE_LIMITS", "")
+
+import pytest
+
+from main import create_app
+from utils.database import Database
+from utils.large_language_model import LLM
+from utils.llm_backends import FakeBackend
+
+
+@pytest.fixture
+def db(tmp_path):
+    # A file, not :memory:, so task threads get connections of their own
+    db = Database(url=f"sqlite:///{tmp_path / 'test.db'}")
+    db.create_tables()
+    yield db
+    db.engine.dispose()
+
+
+@pytest.fixture
+def llm():
+    return LLM(backend=FakeBackend(seed=0))
+
+
+@pytest.fixture
+def app(db, llm):
+    app = create_app(db=db, llm=llm)
+    yield app
+    app.extensions["task_queue"].shutdown()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def job_id(db):
+    r = db.set_job("Engineer", "Acme", "Remote", "Python backend", "https://acme.example/apply", "https://acme.example")
+    return r["data"]["job_id"]
+
+
+@pytest.fixture
+def add_person(db):
+    def add(job_id, name):
+        r = db.set_person(job_id, name, "Engineer", "", "Acme", "Engineer", "2 years", [], [], None)
+        assert r["status"] == "success", r
+        return r["data"]["person_id"]
+    return add
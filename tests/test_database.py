@@ -0,0 +1,87 @@
+from sqlalchemy import delete
+
+from utils.database import JobInfo, DUPLICATE_PERSON_ERROR, MISSING_NAME_ERROR
+
+
+def conversation(turns):
+    return [
+        {"role": "user" if i % 2 == 0 else "model", "parts": [{"text": f"turn {i}"}]}
+        for i in range(turns)
+    ]
+
+
+def test_set_person_rejects_a_duplicate_name_for_the_same_job(db, job_id, add_person):
+    add_person(job_id, "Jane Doe")
+
+    r = db.set_person(job_id, "Jane Doe", "", "", "Other Co", "", "", [], [], None)
+
+    assert r == {"error": DUPLICATE_PERSON_ERROR, "status": "failure"}
+    assert len(db.get_all_people(job_id)["data"]) == 1
+
+
+def test_set_person_allows_the_same_name_under_another_job(db, job_id, add_person):
+    other_job_id = db.set_job("Designer", "Acme", "Remote", "Figma", "https://acme.example/apply", "https://acme.example")["data"]["job_id"]
+    add_person(job_id, "Jane Doe")
+
+    assert db.set_person(other_job_id, "Jane Doe", "", "", "Acme", "", "", [], [], None)["status"] == "success"
+
+
+def test_set_person_requires_a_name(db, job_id):
+    r = db.set_person(job_id, "  ", "", "", "Acme", "", "", [], [], None)
+
+    assert r == {"error": MISSING_NAME_ERROR, "status": "failure"}
+
+
+def test_set_person_reports_a_missing_job(db):
+    r = db.set_person("no-such-job", "Jane Doe", "", "", "Acme", "", "", [], [], None)
+
+    assert r == {"error": "Job not found", "status": "failure"}
+
+
+def test_delete_job_removes_its_people_conversations_and_resumes(db, job_id, add_person):
+    person_id = add_person(job_id, "Jane Doe")
+    db.set_message(person_id, conversation(4))
+    db.set_chat_summary(person_id, "earlier", 1)
+    db.set_message(job_id, conversation(2))
+    db.set_tailored_resume("resume-key", job_id, "v1", "", {"summary": "text"})
+    scopes = ["jobs", f"job:{job_id}", f"people:{job_id}", f"chat:{person_id}"]
+    versions = db.get_cache_versions(scopes)["data"]
+
+    r = db.delete_job(job_id)
+
+    assert r["status"] == "success"
+    assert r["data"] == {"people": 1}
+    assert db.get_job_by_id(job_id)["error"] == "Job not found"
+    assert db.get_person_by_id(person_id)["status"] == "failure"
+    assert db.get_message(person_id)["data"] == []
+    assert db.get_message(job_id)["data"] == []
+    assert db.get_chat_summary(person_id)["data"] is None
+    assert db.get_tailored_resume("resume-key")["status"] == "failure"
+    bumped = db.get_cache_versions(scopes)["data"]
+    assert all(bumped[scope] != versions.get(scope) for scope in scopes)
+
+
+def test_delete_job_reports_a_missing_job(db):
+    assert db.delete_job("no-such-job")["error"] == "Job not found"
+
+
+def test_gc_orphans_dry_run_reports_what_the_real_run_purges(db, job_id, add_person):
+    person_id = add_person(job_id, "Jane Doe")
+    db.set_message(person_id, conversation(4))
+    # An orphan as left by a delete made before delete_job cascaded
+    with db.engine.connect() as connection:
+        connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        connection.execute(delete(JobInfo).where(JobInfo.job_id == job_id))
+        connection.commit()
+        connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+    version = db.get_cache_versions([f"chat:{person_id}"])["data"]
+
+    dry_run = db.gc_orphans(dry_run=True)["data"]
+    assert db.get_cache_versions([f"chat:{person_id}"])["data"] == version
+    purged = db.gc_orphans()["data"]
+
+    assert dry_run == purged
+    assert purged["people"] == 1
+    assert purged["chat_messages"] == 4
+    assert db.get_cache_versions([f"chat:{person_id}"])["data"] != version
+    assert db.gc_orphans()["data"] == {"people": 0, "chat_messages": 0, "chat_summaries": 0, "chat_history": 0}
@@ -0,0 +1,85 @@
+from utils import large_language_model
+from utils.large_language_model import (
+    FOLLOW_UP_KEEP_TURNS, FOLLOW_UP_MIN_TURN_CHARS, TRUNCATION_MARK,
+    estimate_tokens, follow_up_turn, message_text, summary_turns
+)
+
+
+def conversation(turns, length=20):
+    return [
+        {"role": "user" if i % 2 == 0 else "model", "parts": [{"text": f"turn {i} ".ljust(length, "x")}]}
+        for i in range(turns)
+    ]
+
+
+def test_a_short_conversation_is_sent_verbatim(db, llm):
+    db.set_message("person", conversation(4))
+    new_turn = follow_up_turn("Any openings?")
+
+    r = llm._follow_up_context(db, "person", new_turn)
+
+    assert r["data"]["summarized"] is False
+    assert r["data"]["contents"] == conversation(4) + [new_turn]
+    assert db.get_chat_summary("person")["data"] is None
+
+
+def test_older_turns_are_folded_into_a_stored_summary(db, llm):
+    turns = conversation(2 * FOLLOW_UP_KEEP_TURNS + 2)
+    db.set_message("person", turns)
+    new_turn = follow_up_turn("Any openings?")
+
+    r = llm._follow_up_context(db, "person", new_turn)
+
+    contents = r["data"]["contents"]
+    stored = db.get_chat_summary("person")["data"]
+    assert r["data"]["summarized"] is True
+    assert stored["covered_seq"] == len(turns) - FOLLOW_UP_KEEP_TURNS - 1
+    assert contents == summary_turns(stored["summary"]) + turns[-FOLLOW_UP_KEEP_TURNS:] + [new_turn]
+
+    # The next follow-up reads only the turns after the summary
+    r = llm._follow_up_context(db, "person", new_turn)
+    assert r["data"]["summarized"] is False
+    assert r["data"]["contents"] == contents
+
+
+def test_the_budget_keeps_the_latest_exchange_and_cuts_long_turns(db, llm, monkeypatch):
+    monkeypatch.setattr(large_language_model, "FOLLOW_UP_TOKEN_BUDGET", 2000)
+    # The latest exchange alone is three times the budget
+    turns = conversation(2, length=800) + conversation(2, length=12000)
+    db.set_message("person", turns)
+    new_turn = follow_up_turn("Any openings?")
+
+    r = llm._follow_up_context(db, "person", new_turn)
+
+    contents = r["data"]["contents"]
+    assert r["data"]["summarized"] is True
+    assert len(contents) == 2 + 2 + 1
+    for turn in contents[2:4]:
+        assert message_text(turn).endswith(TRUNCATION_MARK)
+        assert len(message_text(turn)) >= FOLLOW_UP_MIN_TURN_CHARS
+    assert r["data"]["estimated_prompt_tokens"] == estimate_tokens(contents)
+    assert estimate_tokens(contents) <= 2000
+
+
+def test_a_failed_summary_still_sends_a_bounded_request(db, llm, monkeypatch):
+    monkeypatch.setattr(large_language_model, "FOLLOW_UP_TOKEN_BUDGET", 1000)
+
+    def fail(previous_summary, turns):
+        raise RuntimeError("model down")
+
+    monkeypatch.setattr(llm, "_summarize_turns", fail)
+    db.set_message("person", conversation(2 * FOLLOW_UP_KEEP_TURNS + 2, length=600))
+    new_turn = follow_up_turn("Any openings?")
+
+    r = llm._follow_up_context(db, "person", new_turn)
+
+    assert r["data"]["summarized"] is False
+    assert db.get_chat_summary("person")["data"] is None
+    assert r["data"]["contents"][-1] == new_turn
+    assert estimate_tokens(r["data"]["contents"]) <= 1000
+
+
+def test_a_follow_up_needs_an_existing_conversation(db, llm):
+    r = llm._follow_up_context(db, "person", follow_up_turn("Hello"))
+
+    assert r["status"] == "failure"
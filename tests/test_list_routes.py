@@ -0,0 +1,93 @@
+import pytest
+
+
+@pytest.fixture
+def people(job_id, add_person):
+    return [add_person(job_id, f"Person {i}") for i in range(5)]
+
+
+def test_people_are_paged_with_a_cursor(client, job_id, people):
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        query = f"?limit=2&cursor={cursor}" if cursor else "?limit=2"
+        r = client.get(f"/get-all-people/{job_id}{query}")
+        assert r.status_code == 200
+        seen += [person["person_id"] for person in r.get_json()["data"]]
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert pages == 3
+    assert sorted(seen) == sorted(people)
+
+
+def test_fields_limit_what_each_row_returns(client, job_id, people):
+    r = client.get(f"/get-all-people/{job_id}?fields=person_id,name")
+
+    assert all(set(person) == {"person_id", "name"} for person in r.get_json()["data"])
+
+
+@pytest.mark.parametrize("query", ["?limit=0", "?limit=two", "?fields=password"])
+def test_invalid_list_arguments_are_rejected(client, job_id, query):
+    assert client.get(f"/get-all-people/{job_id}{query}").status_code == 400
+
+
+def test_an_unchanged_list_answers_304(client, job_id, people):
+    r = client.get(f"/get-all-people/{job_id}")
+    etag = r.headers["ETag"]
+
+    r = client.get(f"/get-all-people/{job_id}", headers={"If-None-Match": etag})
+
+    assert r.status_code == 304
+    assert r.headers["ETag"] == etag
+    assert r.get_data() == b""
+
+
+def test_a_write_changes_the_etag(client, job_id, people, add_person):
+    etag = client.get(f"/get-all-people/{job_id}").headers["ETag"]
+    add_person(job_id, "Someone New")
+
+    r = client.get(f"/get-all-people/{job_id}", headers={"If-None-Match": etag})
+
+    assert r.status_code == 200
+    assert r.headers["ETag"] != etag
+    assert len(r.get_json()["data"]) == len(people) + 1
+
+
+def test_a_write_to_another_job_keeps_the_etag(client, db, job_id, people, add_person):
+    etag = client.get(f"/get-all-people/{job_id}").headers["ETag"]
+    other_job_id = db.set_job("Designer", "Acme", "Remote", "Figma", "https://acme.example/apply", "https://acme.example")["data"]["job_id"]
+    add_person(other_job_id, "Someone New")
+
+    assert client.get(f"/get-all-people/{job_id}", headers={"If-None-Match": etag}).status_code == 304
+
+
+def test_each_page_has_its_own_etag(client, job_id, people):
+    first = client.get(f"/get-all-people/{job_id}?limit=2")
+    cursor = first.headers["X-Next-Cursor"]
+    second = client.get(f"/get-all-people/{job_id}?limit=2&cursor={cursor}",
+                        headers={"If-None-Match": first.headers["ETag"]})
+
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_streamed_lists_carry_no_etag(client, job_id, people):
+    r = client.get(f"/get-all-people/{job_id}?stream=true")
+    body = r.get_data(as_text=True)
+
+    assert r.status_code == 200
+    assert "ETag" not in r.headers
+    assert all(person_id in body for person_id in people)
+
+
+def test_the_jobs_list_answers_304_until_a_job_is_added(client, db, job_id):
+    etag = client.get("/get-all-jobs").headers["ETag"]
+    assert client.get("/get-all-jobs", headers={"If-None-Match": etag}).status_code == 304
+
+    db.set_job("Designer", "Acme", "Remote", "Figma", "https://acme.example/apply", "https://acme.example")
+
+    assert client.get("/get-all-jobs", headers={"If-None-Match": etag}).status_code == 200
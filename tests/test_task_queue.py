@@ -0,0 +1,102 @@
+import threading
+import time
+from datetime import timedelta
+
+from utils.database import TaskInfo, utcnow
+from utils.task_queue import TaskQueue, LocalTaskStore, INTERRUPTED_TASK_ERROR
+
+
+def wait_for(queue, task_id, status, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        task = queue.get(task_id)["data"]
+        if task["status"] == status:
+            return task
+        time.sleep(0.01)
+    raise AssertionError(f"task {task_id} is {task['status']}, not {status}")
+
+
+def test_tasks_sharing_a_key_run_one_at_a_time_in_order():
+    queue = TaskQueue(LocalTaskStore(), max_workers=4)
+    lock = threading.Lock()
+    running = []
+    overlap = []
+    order = []
+
+    def work(i, progress):
+        with lock:
+            running.append(i)
+            overlap.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(i)
+            order.append(i)
+        return {"status": "success"}
+
+    task_ids = [queue.submit("test", work, i, key="person")["data"]["task_id"] for i in range(8)]
+    queue.shutdown()
+
+    assert order == list(range(8))
+    assert max(overlap) == 1
+    assert all(queue.get(task_id)["data"]["status"] == "succeeded" for task_id in task_ids)
+
+
+def test_a_burst_for_one_key_holds_a_single_worker():
+    queue = TaskQueue(LocalTaskStore(), max_workers=2)
+    release = threading.Event()
+
+    def blocked(progress):
+        release.wait(5)
+        return {"status": "success"}
+
+    burst = [queue.submit("test", blocked, key="busy")["data"]["task_id"] for _ in range(4)]
+    other = queue.submit("test", lambda progress: {"status": "success"}, key="other")["data"]["task_id"]
+
+    # The other key gets the second worker while the burst waits its turn
+    wait_for(queue, burst[0], "running")
+    wait_for(queue, other, "succeeded")
+    assert [queue.get(task_id)["data"]["status"] for task_id in burst] == ["running", "queued", "queued", "queued"]
+
+    release.set()
+    queue.shutdown()
+    assert all(queue.get(task_id)["data"]["status"] == "succeeded" for task_id in burst)
+    assert not queue._pending
+
+
+def test_a_failed_task_does_not_stall_its_key():
+    queue = TaskQueue(LocalTaskStore(), max_workers=2)
+
+    def crash(progress):
+        raise RuntimeError("boom")
+
+    failed = queue.submit("test", crash, key="person")["data"]["task_id"]
+    after = queue.submit("test", lambda progress: {"status": "success"}, key="person")["data"]["task_id"]
+    queue.shutdown()
+
+    assert queue.get(failed)["data"]["error"] == "boom"
+    assert queue.get(after)["data"]["status"] == "succeeded"
+
+
+def test_key_lock_excludes_work_outside_the_queue():
+    queue = TaskQueue(LocalTaskStore(), max_workers=2)
+
+    with queue.key_lock("person"):
+        task_id = queue.submit("test", lambda progress: {"status": "success"}, key="person")["data"]["task_id"]
+        time.sleep(0.05)
+        assert queue.get(task_id)["data"]["status"] == "queued"
+
+    wait_for(queue, task_id, "succeeded")
+    queue.shutdown()
+
+
+def test_stale_tasks_are_failed(db):
+    stale = db.create_task("test")["data"]["task_id"]
+    fresh = db.create_task("test")["data"]["task_id"]
+    with db.SessionLocal.begin() as session:
+        session.query(TaskInfo).filter(TaskInfo.task_id == stale).update(
+            {"status": "running", "updated_at": utcnow() - timedelta(hours=2)})
+
+    assert db.fail_stale_tasks(3600)["data"]["failed"] == 1
+    assert db.get_task(stale)["data"]["status"] == "failed"
+    assert db.get_task(stale)["data"]["error"] == INTERRUPTED_TASK_ERROR
+    assert db.get_task(fresh)["data"]["status"] == "queued"
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+# Thread-safe in-process LRU cache whose entries expire after a TTL
+class TTLCache:
+    def __init__(self, maxsize=256, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Per-process hit/miss counters for a cache, e.g. record("memory_hits")
+class CacheStats:
+    def __init__(self, *counters):
+        self._counts = {counter: 0 for counter in counters}
+        self._lock = threading.Lock()
+
+    def record(self, counter):
+        with self._lock:
+            self._counts[counter] = self._counts.get(counter, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = sum(counts.values())
+        misses = counts.get("misses", 0)
+        counts["hit_rate"] = round((lookups - misses) / lookups, 4) if lookups else None
+        return counts
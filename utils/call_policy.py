@@ -0,0 +1,337 @@
+from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from utils.llm_backends import LLMBackend
+from utils.telemetry import LLM_POLICY_EVENTS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+def parse_model_values(text):
+    # "model=value,model=value" -> {"model": value}
+    values = {}
+    for item in (text or "").split(","):
+        if "=" in item:
+            model, value = item.split("=", 1)
+            values[model.strip()] = float(value)
+    return values
+
+
+# Per-request timeout in seconds, by model; LLM_TIMEOUT for models not listed
+LLM_TIMEOUTS = parse_model_values(os.getenv("LLM_TIMEOUTS", "gemini-2.5-flash-lite=30,gemini-3-pro-preview=120"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", 60))
+
+# Client-side rate limit in requests per minute, by model (set these to the
+# project's Gemini quota); 0 disables the limiter. A call that would wait more
+# than LLM_RATE_LIMIT_MAX_WAIT seconds for a slot fails instead of holding a
+# worker.
+LLM_RATE_LIMITS = parse_model_values(os.getenv("LLM_RATE_LIMITS", "gemini-2.5-flash-lite=4000,gemini-3-pro-preview=50"))
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", 0))
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", 30))
+
+# Retryable failures are retried with jittered exponential backoff, as long as
+# the next attempt can start within LLM_CALL_DEADLINE of the first
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", 4))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", 1.0))
+LLM_RETRY_MAX_BACKOFF = float(os.getenv("LLM_RETRY_MAX_BACKOFF", 30))
+LLM_CALL_DEADLINE = float(os.getenv("LLM_CALL_DEADLINE", 300))
+
+# After LLM_BREAKER_FAILURES consecutive provider failures (5xx, timeouts,
+# connection errors) calls to that model fail fast for LLM_BREAKER_RESET
+# seconds, then a single trial call decides whether to close the circuit
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", 30))
+
+RETRYABLE_CODES = {408, 429, 500, 502, 503, 504}
+PROVIDER_FAILURE_CODES = {500, 502, 503, 504}
+
+try:
+    import httpx
+    TRANSPORT_ERRORS = (TimeoutError, ConnectionError, httpx.TransportError)
+except ImportError:
+    TRANSPORT_ERRORS = (TimeoutError, ConnectionError)
+
+
+# Raised by the policy itself, never retried; .code mirrors the HTTP status
+class CallPolicyError(Exception):
+    code = 503
+
+
+class CircuitOpenError(CallPolicyError):
+    code = 503
+
+
+class RateLimitExceeded(CallPolicyError):
+    code = 429
+
+
+def is_provider_failure(e):
+    if isinstance(e, CallPolicyError):
+        return False
+    return isinstance(e, TRANSPORT_ERRORS) or getattr(e, "code", None) in PROVIDER_FAILURE_CODES
+
+
+def is_retryable(e):
+    if isinstance(e, CallPolicyError):
+        return False
+    return isinstance(e, TRANSPORT_ERRORS) or getattr(e, "code", None) in RETRYABLE_CODES
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60
+        # Up to six seconds' worth of calls may go out back to back
+        self.capacity = burst or max(1.0, per_minute / 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, max_wait):
+        # Takes a slot and returns how long to wait before using it; waiting
+        # callers go negative, so slots are handed out in arrival order
+        with self.lock:
+            self._refill(time.monotonic())
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+            if wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+    def pause(self, seconds):
+        # A 429 from the provider holds every caller back, not just the one
+        # that saw it
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Half open: one trial call at a time; a trial that never reports
+            # back (an abandoned stream) expires after reset_timeout
+            if self.trial_started is not None and now - self.trial_started < self.reset_timeout:
+                return False
+            self.trial_started = now
+            return True
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.warning("circuit closed", extra={"fields": {"model": self.name}})
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.opened_at is None and self.failures < self.failure_threshold:
+                return
+            if self.opened_at is None:
+                logger.warning("circuit opened", extra={"fields": {"model": self.name, "failures": self.failures}})
+            self.opened_at = time.monotonic()
+            self.trial_started = None
+
+
+class ModelPolicy:
+    def __init__(self, model):
+        self.model = model
+        self.timeout = LLM_TIMEOUTS.get(model, LLM_TIMEOUT)
+        per_minute = LLM_RATE_LIMITS.get(model, LLM_RATE_LIMIT)
+        self.bucket = TokenBucket(per_minute) if per_minute > 0 else None
+        self.breaker = CircuitBreaker(model, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+
+    def admit(self):
+        # Returns the rate-limit wait before the next attempt may start
+        if not self.breaker.allow():
+            LLM_POLICY_EVENTS.inc(model=self.model, event="circuit_open")
+            raise CircuitOpenError(f"{self.model} is unavailable (circuit open), try again later")
+        if self.bucket is None:
+            return 0.0
+        wait = self.bucket.reserve(LLM_RATE_LIMIT_MAX_WAIT)
+        if wait is None:
+            LLM_POLICY_EVENTS.inc(model=self.model, event="rate_limit_rejected")
+            raise RateLimitExceeded(f"{self.model} rate limit reached, try again later")
+        if wait > 0:
+            LLM_POLICY_EVENTS.inc(model=self.model, event="rate_limit_wait")
+        return wait
+
+    def record_success(self):
+        self.breaker.record_success()
+
+    def record_failure(self, e):
+        if is_provider_failure(e):
+            self.breaker.record_failure()
+        elif not isinstance(e, CallPolicyError):
+            # The provider answered (a 4xx), so it is not degraded
+            self.breaker.record_success()
+
+    def retry_delay(self, e, attempt, deadline):
+        # Records the failure and returns the backoff before the next attempt,
+        # or None when the error should be raised
+        self.record_failure(e)
+        if not is_retryable(e) or attempt >= LLM_RETRIES:
+            return None
+        backoff = min(LLM_RETRY_MAX_BACKOFF, LLM_RETRY_BACKOFF * (2 ** attempt))
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        if time.monotonic() + delay > deadline:
+            return None
+        if getattr(e, "code", None) == 429 and self.bucket is not None:
+            self.bucket.pause(delay)
+
+        LLM_POLICY_EVENTS.inc(model=self.model, event="retry")
+        logger.warning("llm call failed, retrying", extra={"fields": {
+            "model": self.model,
+            "attempt": attempt + 1,
+            "error": str(e),
+            "code": getattr(e, "code", None),
+            "delay_s": round(delay, 2)
+        }})
+        return delay
+
+
+# Wraps a backend with the per-model policy: timeout, rate limit, circuit
+# breaker and retries. Streams are only retried until their first chunk.
+class PolicyBackend(LLMBackend):
+    def __init__(self, backend):
+        self.backend = backend
+        self._policies = {}
+        self._policies_lock = threading.Lock()
+
+    def policy(self, model):
+        with self._policies_lock:
+            policy = self._policies.get(model)
+            if policy is None:
+                policy = self._policies[model] = ModelPolicy(model)
+            return policy
+
+    def generate(self, model, contents, config=None, timeout=None):
+        policy = self.policy(model)
+        deadline = time.monotonic() + LLM_CALL_DEADLINE
+        attempt = 0
+        while True:
+            wait = policy.admit()
+            if wait:
+                time.sleep(wait)
+            try:
+                response = self.backend.generate(model=model, contents=contents, config=config,
+                                                 timeout=timeout or policy.timeout)
+            except Exception as e:
+                delay = policy.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            policy.record_success()
+            return response
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        policy = self.policy(model)
+        deadline = time.monotonic() + LLM_CALL_DEADLINE
+        attempt = 0
+        while True:
+            wait = policy.admit()
+            if wait:
+                time.sleep(wait)
+            started = False
+            try:
+                for chunk in self.backend.generate_stream(model=model, contents=contents, config=config,
+                                                          timeout=timeout or policy.timeout):
+                    if not started:
+                        started = True
+                        policy.record_success()
+                    yield chunk
+            except Exception as e:
+                if started:
+                    policy.record_failure(e)
+                    raise
+                delay = policy.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if not started:
+                policy.record_success()
+            return
+
+    async def agenerate(self, model, contents, config=None, timeout=None):
+        policy = self.policy(model)
+        timeout = timeout or policy.timeout
+        deadline = time.monotonic() + LLM_CALL_DEADLINE
+        attempt = 0
+        while True:
+            wait = policy.admit()
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                # wait_for also bounds backends that ignore the timeout
+                response = await asyncio.wait_for(
+                    self.backend.agenerate(model=model, contents=contents, config=config, timeout=timeout),
+                    timeout
+                )
+            except Exception as e:
+                delay = policy.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            policy.record_success()
+            return response
+
+    async def agenerate_stream(self, model, contents, config=None, timeout=None):
+        policy = self.policy(model)
+        deadline = time.monotonic() + LLM_CALL_DEADLINE
+        attempt = 0
+        while True:
+            wait = policy.admit()
+            if wait:
+                await asyncio.sleep(wait)
+            started = False
+            try:
+                async for chunk in self.backend.agenerate_stream(model=model, contents=contents, config=config,
+                                                                 timeout=timeout or policy.timeout):
+                    if not started:
+                        started = True
+                        policy.record_success()
+                    yield chunk
+            except Exception as e:
+                if started:
+                    policy.record_failure(e)
+                    raise
+                delay = policy.retry_delay(e, attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            if not started:
+                policy.record_success()
+            return
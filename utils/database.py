@@ -1,13 +1,33 @@
-from sqlalchemy import create_engine, URL, Column, String, Text
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.dialects.mysql import JSON
+from sqlalchemy import create_engine, event, inspect, select, update, delete, URL, Column, ForeignKey, Index, String, Text, DateTime, Integer, Float, JSON, insert, func, and_, or_, case, tuple_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker, declarative_base, aliased
+from sqlalchemy.schema import AddConstraint
+from sqlalchemy.pool import StaticPool
 from dotenv import load_dotenv
+from utils.cache import TTLCache
+from utils.search import tokenize, job_document, person_document, is_searchable_message, message_document, message_text, snippet
+from utils.task_queue import INTERRUPTED_TASK_ERROR
+from utils.telemetry import instrument_methods, watch_engine
+from datetime import datetime, timezone, timedelta
+import os
+import ssl
+import math
+import time
 import ulid
 
 load_dotenv()
 
 Base = declarative_base()
 
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def tls_context(ca_path):
+    return ssl.create_default_context(cafile=ca_path)
+
 class JobInfo(Base):
     __tablename__ = 'Jobs'
 
@@ -19,11 +39,19 @@ class JobInfo(Base):
     application_link = Column(String(500), nullable=False)
     status = Column(String(100), default="Pending")
     company_website = Column(String(500), nullable=False)
+    # Company research queued at /add-job time: pending, running, ready or
+    # failed (NULL for jobs created before it existed)
+    research_status = Column(String(100), nullable=True, default="pending")
 
 class PersonInfo(Base):
     __tablename__ = 'PersonInfo'
+    # (job_id, name) also serves every "people of this job" lookup as a prefix
+    __table_args__ = (
+        Index('uq_person_job_name', 'job_id', 'name', unique=True),
+        Index('ix_person_job_status', 'job_id', 'status'),
+    )
 
-    job_id = Column(String(100), nullable=False)
+    job_id = Column(String(100), ForeignKey('Jobs.job_id', name='fk_person_job', ondelete='CASCADE'), nullable=False)
     person_id = Column(String(100), primary_key=True)
     name = Column(String(255), nullable=False)
     headline = Column(String(500), nullable=True)
@@ -36,35 +64,430 @@ class PersonInfo(Base):
     additional_info = Column(JSON, nullable=True)
     status = Column(String(100), default="Not Connected")
 
+# Legacy one-blob-per-conversation storage, read only until migrate_chat_history has run
 class ChatHistory(Base):
     __tablename__ = 'ChatHistory'
 
     id = Column(String(100), primary_key=True, nullable=False)
     messages = Column(JSON, default=[])
 
-class Database():
-    def __init__(self, username, password, host, port, database, ca_path):
-        
-        self.url = URL.create(
-            drivername="mysql+pymysql",
-            username=username,
-            password=password,
-            host=host,
-            port=port,
-            database=database,
+# One row per turn; chat_id is a person_id (or job_id), seq orders the turns
+class ChatMessage(Base):
+    __tablename__ = 'ChatMessages'
+
+    chat_id = Column(String(100), primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    role = Column(String(20), nullable=False)
+    parts = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+# Rolling summary of the turns with seq <= covered_seq, sent in their place
+class ChatSummary(Base):
+    __tablename__ = 'ChatSummaries'
+
+    chat_id = Column(String(100), primary_key=True)
+    summary = Column(Text, nullable=False)
+    covered_seq = Column(Integer, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+class CompanyResearch(Base):
+    __tablename__ = 'CompanyResearch'
+
+    company_website = Column(String(500), primary_key=True)
+    research = Column(Text, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+class ProfileExtraction(Base):
+    __tablename__ = 'ProfileExtractions'
+
+    cache_key = Column(String(64), primary_key=True)
+    prompt_version = Column(String(32), nullable=False)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+# Model output of the resume prompt, keyed by a hash of (resume version,
+# job_id, remarks); rendering it again is cheap, calling the model is not
+class TailoredResume(Base):
+    __tablename__ = 'TailoredResumes'
+
+    cache_key = Column(String(64), primary_key=True)
+    job_id = Column(String(100), nullable=False, index=True)
+    resume_version = Column(String(32), nullable=False)
+    remarks = Column(Text, nullable=True)
+    fields = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+
+class TaskInfo(Base):
+    __tablename__ = 'Tasks'
+
+    task_id = Column(String(100), primary_key=True)
+    kind = Column(String(100), nullable=False)
+    status = Column(String(100), default="queued")
+    progress = Column(String(255), nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+# Inverted index behind /search: one row per (term, document), written in the
+# same transaction as the job, person or chat turn it indexes. Documents are
+# "job", "person" and "chat" (one turn, doc_id "<chat_id>:<seq>"); scope_id is
+# the job_id of jobs and people and the chat_id of turns.
+class SearchTerm(Base):
+    __tablename__ = 'SearchIndex'
+    __table_args__ = (
+        Index('ix_search_term_weight', 'term', 'weight'),
+        Index('ix_search_document', 'doc_type', 'doc_id'),
+        Index('ix_search_scope', 'doc_type', 'scope_id'),
+    )
+
+    term = Column(String(64), primary_key=True)
+    doc_type = Column(String(10), primary_key=True)
+    doc_id = Column(String(120), primary_key=True)
+    scope_id = Column(String(100), nullable=False)
+    weight = Column(Float, nullable=False)
+
+# Version stamp per cached read scope ("jobs", "job:<job_id>",
+# "people:<job_id>", "chat:<person_id>"); rewritten in the same transaction as
+# every write that changes what the scope's routes return
+class CacheVersion(Base):
+    __tablename__ = 'CacheVersions'
+
+    scope = Column(String(200), primary_key=True)
+    version = Column(String(32), nullable=False)
+
+def job_to_dict(job):
+    return {
+        "job_id": job.job_id,
+        "job_title": job.job_title,
+        "company_name": job.company_name,
+        "location": job.location,
+        "job_description": job.job_description,
+        "application_link": job.application_link,
+        "company_website": job.company_website,
+        "status": job.status
+    }
+
+def person_to_dict(person):
+    return {
+        "person_id": person.person_id,
+        "job_id": person.job_id,
+        "name": person.name,
+        "headline": person.headline,
+        "about": person.about,
+        "current_company": person.current_company,
+        "current_job_title": person.current_job_title,
+        "duration_in_current_company": person.duration_in_current_company,
+        "previous_experiences": person.previous_experiences,
+        "education": person.education,
+        "additional_info": person.additional_info,
+        "status": person.status
+    }
+
+DELETE_BATCH_SIZE = int(os.getenv("DB_DELETE_BATCH_SIZE", 500))
+LOOKUP_BATCH_SIZE = 500
+# Rows fetched per round trip when a list endpoint streams its response
+STREAM_BATCH_SIZE = int(os.getenv("DB_STREAM_BATCH_SIZE", 1000))
+# append_messages attempts when a concurrent append took the same seq
+APPEND_RETRIES = 3
+# The tables holding a conversation and their chat id columns, under the
+# names gc_orphans reports
+CHAT_TABLES = (("chat_messages", ChatMessage.chat_id),
+               ("chat_summaries", ChatSummary.chat_id),
+               ("chat_history", ChatHistory.id))
+
+# Search: queries use at most SEARCH_MAX_TERMS terms and rank at most
+# SEARCH_MAX_CANDIDATES documents, the best matches for the query's rarest
+# term; document frequencies are cached for SEARCH_STATS_TTL seconds
+SEARCH_MAX_TERMS = int(os.getenv("SEARCH_MAX_TERMS", 8))
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", 2000))
+SEARCH_STATS_TTL = int(os.getenv("SEARCH_STATS_TTL", 60))
+SEARCH_INSERT_BATCH_SIZE = 1000
+SEARCH_DOC_TYPES = ("job", "person", "chat")
+
+DUPLICATE_PERSON_ERROR = "Person with the same name and current company already exists for this job."
+MISSING_NAME_ERROR = "Person name is required"
+
+def is_unique_violation(e):
+    # MySQL/TiDB report ER_DUP_ENTRY (1062); SQLite names the constraint kind
+    orig = getattr(e, "orig", e)
+    args = getattr(orig, "args", ())
+    return (bool(args) and args[0] == 1062) or "UNIQUE constraint failed" in str(orig)
+
+def integrity_error_message(e):
+    # person_id is a fresh ULID, so the only unique key a new person can
+    # collide on is uq_person_job_name
+    if is_unique_violation(e):
+        return DUPLICATE_PERSON_ERROR
+    if "foreign key" in str(e.orig).lower():
+        return "Job not found"
+    return str(e.orig)
+
+def has_name(name):
+    return isinstance(name, str) and bool(name.strip())
+
+def sqlite_engine(url, pool_size, max_overflow, pool_timeout):
+    connect_args = {"check_same_thread": False}
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # Every session must see the same in-memory database, so share one connection
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        engine = create_engine(
+            url,
+            connect_args=connect_args,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
         )
-        self.connect_args = {
-            "ssl": {
-                "ca": ca_path
-            }
-        }
-        self.engine = create_engine(self.url, connect_args=self.connect_args)
 
+    @event.listens_for(engine, "connect")
+    def configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers proceed while the task workers write
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    return engine
+
+# Where from_env connects when DB_BACKEND is mysql (the default)
+def mysql_settings_from_env():
+    return {
+        "username": os.getenv('db_user', '595RKK4KraPnQQe.root'),
+        "host": os.getenv('db_host', 'gateway01.ap-southeast-1.prod.aws.tidbcloud.com'),
+        "port": int(os.getenv('db_port', 4000)),
+        "database": os.getenv('db_name', 'JOB_HUNTING'),
+    }
+
+def pool_settings_from_env():
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 10)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 5)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+        "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", 30)),
+    }
+
+@instrument_methods
+class Database():
+    # MySQL over TLS (TiDB Cloud) by default. Passing url="sqlite:///path" or
+    # "sqlite://" (in-memory) runs the same schema on an embedded database
+    # for local development and benchmarks.
+    def __init__(self, username=None, password=None, host=None, port=None, database=None, ca_path=None, url=None,
+                 pool_size=10, max_overflow=5, pool_recycle=1800, pool_pre_ping=True, pool_timeout=30):
+
+        if url is not None and make_url(url).get_backend_name() == "sqlite":
+            self.url = url
+            self.engine = sqlite_engine(url, pool_size, max_overflow, pool_timeout)
+        else:
+            self.url = make_url(url) if url is not None else URL.create(
+                drivername="mysql+pymysql",
+                username=username,
+                password=password,
+                host=host,
+                port=port,
+                database=database,
+            )
+            # One context (CA loaded once) shared by every pooled connection;
+            # a MySQL url without ca_path connects without TLS
+            self.connect_args = {
+                "ssl": tls_context(ca_path)
+            } if ca_path or url is None else {}
+            self.engine = create_engine(
+                self.url,
+                connect_args=self.connect_args,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_recycle=pool_recycle,
+                pool_pre_ping=pool_pre_ping,
+                pool_timeout=pool_timeout,
+            )
+
+        watch_engine(self.engine)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.search_stats = TTLCache(maxsize=4096, ttl=SEARCH_STATS_TTL)
+
+    @classmethod
+    def from_env(cls):
+        # DB_BACKEND=sqlite stores everything in SQLITE_PATH (":memory:" for a
+        # throwaway database) and creates the tables on startup
+        if os.getenv('DB_BACKEND', 'mysql').lower() == 'sqlite':
+            path = os.getenv('SQLITE_PATH', 'job_ref_sys.db')
+            db = cls(url="sqlite://" if path == ":memory:" else f"sqlite:///{path}", **pool_settings_from_env())
+            db.create_tables()
+            return db
+
+        return cls(
+            password=os.getenv('db_pass'),
+            ca_path=os.environ["DB_SSL_PEM"],
+            **mysql_settings_from_env(),
+            **pool_settings_from_env()
+        )
 
     def create_tables(self):
         Base.metadata.create_all(bind=self.engine)
 
+    # Search index upkeep; like _bump_versions these run inside the caller's
+    # transaction
+    def _index_documents(self, connection, documents):
+        rows = [
+            {"term": term, "doc_type": doc_type, "doc_id": doc_id, "scope_id": scope_id, "weight": weight}
+            for doc_type, doc_id, scope_id, weights in documents
+            for term, weight in weights.items()
+        ]
+        for i in range(0, len(rows), SEARCH_INSERT_BATCH_SIZE):
+            connection.execute(insert(SearchTerm).values(rows[i:i + SEARCH_INSERT_BATCH_SIZE]))
+
+    def _unindex_documents(self, connection, doc_type, doc_ids):
+        for i in range(0, len(doc_ids), DELETE_BATCH_SIZE):
+            connection.execute(delete(SearchTerm).where(
+                SearchTerm.doc_type == doc_type, SearchTerm.doc_id.in_(doc_ids[i:i + DELETE_BATCH_SIZE])
+            ))
+
+    def _unindex_chats(self, connection, chat_ids):
+        for i in range(0, len(chat_ids), DELETE_BATCH_SIZE):
+            connection.execute(delete(SearchTerm).where(
+                SearchTerm.doc_type == "chat", SearchTerm.scope_id.in_(chat_ids[i:i + DELETE_BATCH_SIZE])
+            ))
+
+    def _bump_versions(self, session, scopes):
+        # Sorted so concurrent writers lock the version rows in the same order
+        rows = [{"scope": scope, "version": str(ulid.new())} for scope in sorted(set(scopes))]
+        if not rows:
+            return
+        if self.engine.dialect.name == "sqlite":
+            statement = sqlite_insert(CacheVersion).values(rows)
+            statement = statement.on_conflict_do_update(index_elements=["scope"], set_={"version": statement.excluded.version})
+        else:
+            statement = mysql_insert(CacheVersion).values(rows)
+            statement = statement.on_duplicate_key_update(version=statement.inserted.version)
+        session.execute(statement)
+
+    def _bump_people_versions(self, session, person_ids):
+        job_ids = session.scalars(select(PersonInfo.job_id).where(PersonInfo.person_id.in_(person_ids)).distinct()).all()
+        self._bump_versions(session, [f"people:{job_id}" for job_id in job_ids])
+
+    def get_cache_versions(self, scopes):
+        try:
+            with self.SessionLocal.begin() as session:
+                rows = session.execute(select(CacheVersion.scope, CacheVersion.version).where(CacheVersion.scope.in_(scopes))).all()
+                versions = {scope: version for scope, version in rows}
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure"
+            }
+        return {
+            "data": versions,
+            "status": "success"
+        }
+
+    # Both helpers run inside the caller's transaction (a Connection or a
+    # Session) and delete DELETE_BATCH_SIZE ids per statement
+    def _delete_chats(self, connection, chat_ids):
+        for i in range(0, len(chat_ids), DELETE_BATCH_SIZE):
+            chunk = chat_ids[i:i + DELETE_BATCH_SIZE]
+            connection.execute(delete(ChatMessage).where(ChatMessage.chat_id.in_(chunk)))
+            connection.execute(delete(ChatSummary).where(ChatSummary.chat_id.in_(chunk)))
+            connection.execute(delete(ChatHistory).where(ChatHistory.id.in_(chunk)))
+            self._unindex_chats(connection, chunk)
+            self._bump_versions(connection, [f"chat:{chat_id}" for chat_id in chunk])
+
+    def _delete_people(self, connection, person_ids):
+        # A person's conversation is stored under their person_id
+        self._delete_chats(connection, person_ids)
+        deleted = 0
+        for i in range(0, len(person_ids), DELETE_BATCH_SIZE):
+            chunk = person_ids[i:i + DELETE_BATCH_SIZE]
+            deleted += connection.execute(delete(PersonInfo).where(PersonInfo.person_id.in_(chunk))).rowcount
+            self._unindex_documents(connection, "person", chunk)
+        return deleted
+
+    def migrate_schema(self, repair=False):
+        # Brings a database created before PersonInfo had its indexes and foreign
+        # key (or before Jobs had research_status) up to the current schema;
+        # already-present pieces are skipped, so it is safe to run repeatedly. Existing duplicate (job_id, name) rows or
+        # people whose job is gone block the migration unless repair=True, which
+        # keeps the oldest row of each duplicate group and deletes the orphans
+        # (with their conversations).
+        applied = []
+        skipped = []
+        removed = 0
+        try:
+            self.create_tables()
+            with self.engine.begin() as connection:
+                inspector = inspect(connection)
+                job_columns = {column["name"] for column in inspector.get_columns(JobInfo.__tablename__)}
+                for column in JobInfo.__table__.columns:
+                    if column.name not in job_columns:
+                        preparer = connection.dialect.identifier_preparer
+                        connection.exec_driver_sql(
+                            f"ALTER TABLE {preparer.quote(JobInfo.__tablename__)} "
+                            f"ADD COLUMN {preparer.quote(column.name)} {column.type.compile(dialect=connection.dialect)}"
+                        )
+                        applied.append(f"{JobInfo.__tablename__}.{column.name}")
+
+                existing = {index["name"] for index in inspector.get_indexes(PersonInfo.__tablename__)}
+                existing |= {constraint["name"] for constraint in inspector.get_unique_constraints(PersonInfo.__tablename__)}
+
+                if "uq_person_job_name" not in existing:
+                    duplicate_groups = connection.execute(
+                        select(PersonInfo.job_id, PersonInfo.name)
+                        .group_by(PersonInfo.job_id, PersonInfo.name)
+                        .having(func.count() > 1)
+                    ).all()
+                    if duplicate_groups and not repair:
+                        return {
+                            "error": f"{len(duplicate_groups)} (job_id, name) pairs have duplicate people; rerun with repair to keep the oldest of each",
+                            "status": "failure"
+                        }
+                    duplicates = []
+                    for job_id, name in duplicate_groups:
+                        person_ids = connection.execute(
+                            select(PersonInfo.person_id)
+                            .where(PersonInfo.job_id == job_id, PersonInfo.name == name)
+                            .order_by(PersonInfo.person_id)
+                        ).scalars().all()
+                        duplicates.extend(person_ids[1:])
+                    self._delete_people(connection, duplicates)
+                    removed += len(duplicates)
+
+                for index in PersonInfo.__table__.indexes:
+                    if index.name not in existing:
+                        index.create(bind=connection)
+                        applied.append(index.name)
+
+                foreign_keys = inspector.get_foreign_keys(PersonInfo.__tablename__)
+                if not any(fk["referred_table"] == JobInfo.__tablename__ for fk in foreign_keys):
+                    if connection.dialect.name == "sqlite":
+                        # SQLite cannot add a constraint to an existing table
+                        skipped.append("fk_person_job")
+                    else:
+                        orphans = connection.execute(
+                            select(PersonInfo.person_id).where(PersonInfo.job_id.not_in(select(JobInfo.job_id)))
+                        ).scalars().all()
+                        if orphans and not repair:
+                            return {
+                                "error": f"{len(orphans)} people belong to jobs that no longer exist; rerun with repair to delete them",
+                                "status": "failure"
+                            }
+                        self._delete_people(connection, orphans)
+                        removed += len(orphans)
+                        fk = next(iter(PersonInfo.__table__.foreign_key_constraints))
+                        connection.execute(AddConstraint(fk))
+                        applied.append(fk.name)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to migrate schema"
+            }
+        return {
+            "data": {"applied": applied, "skipped": skipped, "removed": removed},
+            "status": "success"
+        }
+
     def set_job(self, job_title, company_name, location, job_description, application_link, company_website):
         try:
             job_id=str(ulid.new())
@@ -80,8 +503,8 @@ class Database():
 
             with self.SessionLocal.begin() as session:
                 session.add(new_job)
-
-            self.set_message(id=job_id, messages=[])
+                self._index_documents(session, [job_document(job_to_dict(new_job))])
+                self._bump_versions(session, ["jobs"])
         except Exception as e:
             return {
                 "error": str(e),
@@ -89,22 +512,18 @@ class Database():
                 "message": "Failed to create job"
             }
         return {
+            "data": {"job_id": job_id},
             "status": "success"
         }
 
     def set_person(self, job_id, name, headline, about, current_company, current_job_title, duration_in_current_company, previous_experiences, education, additional_info):
+        # The (job_id, name) unique index rejects duplicates, so no SELECT first
+        if not has_name(name):
+            return {
+                "error": MISSING_NAME_ERROR,
+                "status": "failure"
+            }
         try:
-            # Check if person with same name and company already exists
-            with self.SessionLocal.begin() as session:
-                existing_person = session.query(PersonInfo).filter(
-                    PersonInfo.name == name,
-                    PersonInfo.job_id == job_id
-                ).first()
-                if existing_person:
-                    return {
-                        "error": "Person with the same name and current company already exists for this job.",
-                        "status": "failure"
-                    }
             new_person = PersonInfo(
                 person_id=str(ulid.new()),
                 job_id=job_id,
@@ -116,26 +535,21 @@ class Database():
                 duration_in_current_company=duration_in_current_company,
                 previous_experiences=previous_experiences,
                 education=education,
-                additional_info=additional_info
+                additional_info=additional_info,
+                status="Not Connected"
             )
 
             with self.SessionLocal.begin() as session:
                 session.add(new_person)
-                # Prepare the inserted person data to return
-                person_data = {
-                    "person_id": new_person.person_id,
-                    "job_id": new_person.job_id,
-                    "name": new_person.name,
-                    "headline": new_person.headline,
-                    "about": new_person.about,
-                    "current_company": new_person.current_company,
-                    "current_job_title": new_person.current_job_title,
-                    "duration_in_current_company": new_person.duration_in_current_company,
-                    "previous_experiences": new_person.previous_experiences,
-                    "education": new_person.education,
-                    "additional_info": new_person.additional_info,
-                    "status": new_person.status,
-                }
+                session.flush()
+                person_data = person_to_dict(new_person)
+                self._index_documents(session, [person_document(person_data)])
+                self._bump_versions(session, [f"people:{job_id}"])
+        except IntegrityError as e:
+            return {
+                "error": integrity_error_message(e),
+                "status": "failure"
+            }
         except Exception as e:
             return {
                 "error": str(e),
@@ -146,12 +560,88 @@ class Database():
             "data": person_data
         }
 
+    def get_existing_people_names(self, job_ids):
+        try:
+            with self.SessionLocal.begin() as session:
+                rows = session.query(PersonInfo.job_id, PersonInfo.name).filter(
+                    PersonInfo.job_id.in_(list(job_ids))
+                ).all()
+                existing = {(job_id, name) for job_id, name in rows}
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get existing people"
+            }
+        return {
+            "data": existing,
+            "status": "success"
+        }
+
+    def set_people_bulk(self, people):
+        # people is a list of dicts with the same keys as set_person's arguments;
+        # all rows go out in one multi-row INSERT. If a constraint rejects the
+        # batch (a concurrent duplicate, a deleted job) the rows are retried one
+        # by one and the rejected ones are reported by index in "rejected".
+        rejected = {}
+        try:
+            rows = [
+                {
+                    "person_id": str(ulid.new()),
+                    "status": "Not Connected",
+                    **person
+                }
+                for person in people
+            ]
+            # A missing name would fail the NOT NULL column and take the
+            # whole batch down with it
+            valid = []
+            for i, row in enumerate(rows):
+                if has_name(row.get("name")):
+                    valid.append(i)
+                else:
+                    rejected[i] = MISSING_NAME_ERROR
+            if valid:
+                try:
+                    with self.SessionLocal.begin() as session:
+                        session.execute(insert(PersonInfo).values([rows[i] for i in valid]))
+                        self._index_documents(session, [person_document(rows[i]) for i in valid])
+                        self._bump_versions(session, [f"people:{rows[i]['job_id']}" for i in valid])
+                except IntegrityError:
+                    for i in valid:
+                        row = rows[i]
+                        try:
+                            with self.SessionLocal.begin() as session:
+                                session.execute(insert(PersonInfo).values(row))
+                                self._index_documents(session, [person_document(row)])
+                                self._bump_versions(session, [f"people:{row['job_id']}"])
+                        except IntegrityError as e:
+                            rejected[i] = integrity_error_message(e)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to add people"
+            }
+        return {
+            "data": rows,
+            "rejected": rejected,
+            "status": "success"
+        }
+
     def update_person_status(self, person_id, status):
         try:
             with self.SessionLocal.begin() as session:
-                person = session.query(PersonInfo).filter(PersonInfo.person_id == person_id).first()
-                person.status = status
-                session.add(person)
+                updated = session.execute(
+                    update(PersonInfo).where(PersonInfo.person_id == person_id).values(status=status)
+                ).rowcount
+                if updated:
+                    self._bump_people_versions(session, [person_id])
+            if not updated:
+                return {
+                    "error": "Person not found",
+                    "status": "failure"
+                }
         except Exception as e:
             return {
                 "error": str(e),
@@ -160,7 +650,31 @@ class Database():
         return {
             "status": "success"
         }
-        
+
+    def update_people_status(self, person_ids, status):
+        try:
+            with self.SessionLocal.begin() as session:
+                updated = session.execute(
+                    update(PersonInfo).where(PersonInfo.person_id.in_(list(person_ids))).values(status=status)
+                ).rowcount
+                if updated:
+                    self._bump_people_versions(session, list(person_ids))
+            if not updated:
+                return {
+                    "error": "People not found",
+                    "status": "failure"
+                }
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure"
+            }
+        return {
+            "data": {"updated": updated},
+            "status": "success",
+            "message": f"Updated {updated} of {len(person_ids)} people"
+        }
+
     def get_person_by_id(self, person_id):
         try:
             with self.SessionLocal.begin() as session:
@@ -194,6 +708,29 @@ class Database():
             "status": "success"
         }
 
+    def get_people_by_ids(self, person_ids, fields=None):
+        # Ids that do not exist are left out; LOOKUP_BATCH_SIZE ids per query
+        try:
+            fields = list(fields or [column.name for column in PersonInfo.__table__.columns])
+            columns = [getattr(PersonInfo, field) for field in fields]
+            people = []
+            with self.SessionLocal.begin() as session:
+                for i in range(0, len(person_ids), LOOKUP_BATCH_SIZE):
+                    chunk = person_ids[i:i + LOOKUP_BATCH_SIZE]
+                    people.extend(dict(row._mapping) for row in session.execute(
+                        select(*columns).where(PersonInfo.person_id.in_(chunk))
+                    ))
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get people"
+            }
+        return {
+            "data": people,
+            "status": "success"
+        }
+
     def get_job_by_id(self, job_id):
         try:
             with self.SessionLocal.begin() as session:
@@ -211,7 +748,8 @@ class Database():
                     "job_description": job.job_description,
                     "application_link": job.application_link,
                     "company_website": job.company_website,
-                    "status": job.status
+                    "status": job.status,
+                    "research_status": job.research_status
                 }
         except Exception as e:
             return {
@@ -223,20 +761,31 @@ class Database():
             "status": "success"
         }
 
+    def _message_rows(self, id, messages, start_seq=0):
+        return [
+            {
+                "chat_id": id,
+                "seq": start_seq + offset,
+                "role": message["role"],
+                "parts": message["parts"],
+                "created_at": utcnow()
+            }
+            for offset, message in enumerate(messages)
+        ]
+
     def set_message(self, id, messages):
+        # Replaces the whole conversation; use append_messages to add turns
         try:
-            # first check if chat history exists for id
             with self.SessionLocal.begin() as session:
-                chat = session.query(ChatHistory).filter(ChatHistory.id == id).first()
-                if chat:
-                    chat.messages = messages
-                    session.add(chat)
-                else:
-                    new_chat = ChatHistory(
-                        id=id,
-                        messages=messages
-                    )
-                    session.add(new_chat)            
+                session.execute(delete(ChatMessage).where(ChatMessage.chat_id == id))
+                session.execute(delete(ChatSummary).where(ChatSummary.chat_id == id))
+                session.execute(delete(ChatHistory).where(ChatHistory.id == id))
+                self._unindex_chats(session, [id])
+                if messages:
+                    rows = self._message_rows(id, messages)
+                    session.execute(insert(ChatMessage).values(rows))
+                    self._index_documents(session, [message_document(row) for row in rows if is_searchable_message(row)])
+                self._bump_versions(session, [f"chat:{id}"])
         except Exception as e:
             return {
                 "error": str(e),
@@ -247,16 +796,120 @@ class Database():
             "status": "success"
         }
 
-    def get_message(self, id):
+    def get_started_chat_ids(self, chat_ids):
+        # The ids among chat_ids that already have a conversation, moved or
+        # still a legacy blob; LOOKUP_BATCH_SIZE ids per query
         try:
+            started = set()
             with self.SessionLocal.begin() as session:
-                chat = session.query(ChatHistory).filter(ChatHistory.id == id).first()
-                if not chat:
-                    return {
-                        "error": "Chat history not found",
-                        "status": "failure"
-                    }
-                messages = chat.messages
+                for i in range(0, len(chat_ids), LOOKUP_BATCH_SIZE):
+                    chunk = chat_ids[i:i + LOOKUP_BATCH_SIZE]
+                    started.update(session.scalars(
+                        select(ChatMessage.chat_id).where(ChatMessage.chat_id.in_(chunk)).distinct()
+                    ))
+                    started.update(id for id, messages in session.execute(
+                        select(ChatHistory.id, ChatHistory.messages).where(ChatHistory.id.in_(chunk))
+                    ) if messages)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get conversations"
+            }
+        return {
+            "data": started,
+            "status": "success"
+        }
+
+    def set_messages_bulk(self, conversations):
+        # conversations maps chat id -> messages; replaces all of them with one
+        # DELETE and one multi-row INSERT
+        if not conversations:
+            return {
+                "status": "success"
+            }
+        try:
+            ids = list(conversations)
+            rows = [row for id, messages in conversations.items() for row in self._message_rows(id, messages)]
+            with self.SessionLocal.begin() as session:
+                session.query(ChatMessage).filter(ChatMessage.chat_id.in_(ids)).delete(synchronize_session=False)
+                session.query(ChatSummary).filter(ChatSummary.chat_id.in_(ids)).delete(synchronize_session=False)
+                session.query(ChatHistory).filter(ChatHistory.id.in_(ids)).delete(synchronize_session=False)
+                self._unindex_chats(session, ids)
+                if rows:
+                    session.execute(insert(ChatMessage).values(rows))
+                    self._index_documents(session, [message_document(row) for row in rows if is_searchable_message(row)])
+                self._bump_versions(session, [f"chat:{id}" for id in ids])
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to set messages"
+            }
+        return {
+            "status": "success"
+        }
+
+    def append_messages(self, id, messages):
+        # Writes only the new turns, so the cost of a follow-up does not grow
+        # with the length of the conversation. Writers in other processes can
+        # read the same max(seq); the loser hits the (chat_id, seq) key and
+        # retries after the winner's turns.
+        for attempt in range(APPEND_RETRIES):
+            try:
+                with self.SessionLocal.begin() as session:
+                    last_seq = session.query(func.max(ChatMessage.seq)).filter(ChatMessage.chat_id == id).scalar()
+                    rows = []
+                    if last_seq is None:
+                        # Carry over a legacy blob first so it is not hidden by the new turns
+                        chat = session.query(ChatHistory).filter(ChatHistory.id == id).first()
+                        if chat:
+                            rows = self._message_rows(id, chat.messages or [])
+                            session.delete(chat)
+                    start_seq = len(rows) if last_seq is None else last_seq + 1
+                    rows.extend(self._message_rows(id, messages, start_seq))
+                    session.execute(insert(ChatMessage).values(rows))
+                    self._index_documents(session, [message_document(row) for row in rows if is_searchable_message(row)])
+                    self._bump_versions(session, [f"chat:{id}"])
+                break
+            except Exception as e:
+                if isinstance(e, IntegrityError) and is_unique_violation(e) and attempt + 1 < APPEND_RETRIES:
+                    continue
+                return {
+                    "error": str(e),
+                    "status": "failure",
+                    "message": "Failed to append messages"
+                }
+        return {
+            "status": "success"
+        }
+
+    def get_message(self, id, last_n=None, after_seq=None, with_seq=False):
+        # last_n keeps only the most recent turns, after_seq skips turns already
+        # folded into the chat summary, with_seq adds each turn's "seq"
+        try:
+            with self.SessionLocal.begin() as session:
+                query = session.query(ChatMessage.seq, ChatMessage.role, ChatMessage.parts).filter(ChatMessage.chat_id == id)
+                if after_seq is not None:
+                    query = query.filter(ChatMessage.seq > after_seq)
+                if last_n:
+                    rows = query.order_by(ChatMessage.seq.desc()).limit(last_n).all()[::-1]
+                else:
+                    rows = query.order_by(ChatMessage.seq).all()
+
+                # Conversations not yet moved by migrate_chat_history
+                if not rows and after_seq is None:
+                    chat = session.query(ChatHistory).filter(ChatHistory.id == id).first()
+                    if chat and chat.messages:
+                        rows = [(seq, message["role"], message["parts"]) for seq, message in enumerate(chat.messages)]
+                        rows = rows[-last_n:] if last_n else rows
+
+                messages = []
+                for seq, role, parts in rows:
+                    message = {"role": role, "parts": parts}
+                    if with_seq:
+                        message["seq"] = seq
+                    messages.append(message)
         except Exception as e:
             return {
                 "error": str(e),
@@ -268,13 +921,55 @@ class Database():
             "status": "success"
         }
 
+    def get_chat_summary(self, id):
+        try:
+            with self.SessionLocal.begin() as session:
+                summary = session.query(ChatSummary).filter(ChatSummary.chat_id == id).first()
+                summary_data = None
+                if summary:
+                    summary_data = {
+                        "summary": summary.summary,
+                        "covered_seq": summary.covered_seq
+                    }
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get chat summary"
+            }
+        return {
+            "data": summary_data,
+            "status": "success"
+        }
+
+    def set_chat_summary(self, id, summary, covered_seq):
+        try:
+            with self.SessionLocal.begin() as session:
+                session.merge(ChatSummary(
+                    chat_id=id,
+                    summary=summary,
+                    covered_seq=covered_seq,
+                    updated_at=utcnow()
+                ))
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to set chat summary"
+            }
+        return {
+            "status": "success"
+        }
+
     def clear_messages(self, id):
+        # Clearing an empty history is not an error; "deleted" counts the turns removed
         try:
             with self.SessionLocal.begin() as session:
-                chat = session.query(ChatHistory).filter(ChatHistory.id == id).first()
-                if chat:
-                    chat.messages = []
-                    session.add(chat)
+                deleted = session.execute(delete(ChatMessage).where(ChatMessage.chat_id == id)).rowcount
+                session.execute(delete(ChatSummary).where(ChatSummary.chat_id == id))
+                deleted += session.execute(delete(ChatHistory).where(ChatHistory.id == id)).rowcount
+                self._unindex_chats(session, [id])
+                self._bump_versions(session, [f"chat:{id}"])
         except Exception as e:
             return {
                 "error": str(e),
@@ -282,123 +977,615 @@ class Database():
                 "message": "Failed to clear chat history"
             }
         return {
+            "data": {"deleted": deleted},
             "status": "success",
             "message": "Chat history cleared successfully"
         }
-    
-    def get_all_people(self, job_id):
-        try:
-            with self.SessionLocal.begin() as session:
-                people = session.query(PersonInfo).filter(PersonInfo.job_id == job_id).all()
-                people_list = []
-                for person in people:
-                    person_data = {
-                        "person_id": person.person_id,
-                        "job_id": person.job_id,
-                        "name": person.name,
-                        "headline": person.headline,
-                        "about": person.about,
-                        "current_company": person.current_company,
-                        "current_job_title": person.current_job_title,
-                        "duration_in_current_company": person.duration_in_current_company,
-                        "previous_experiences": person.previous_experiences,
-                        "education": person.education,
-                        "additional_info": person.additional_info,
-                        "status": person.status,
+
+    def migrate_chat_history(self, batch_size=100):
+        # Moves legacy ChatHistory JSON blobs into ChatMessages, one batch per
+        # transaction, and removes each blob once its turns are copied
+        migrated = 0
+        last_id = ""
+        try:
+            while True:
+                with self.SessionLocal.begin() as session:
+                    chats = session.query(ChatHistory).filter(ChatHistory.id > last_id).order_by(ChatHistory.id).limit(batch_size).all()
+                    if not chats:
+                        break
+                    last_id = chats[-1].id
+                    ids = [chat.id for chat in chats]
+                    already_migrated = {
+                        chat_id for (chat_id,) in session.query(ChatMessage.chat_id).filter(ChatMessage.chat_id.in_(ids)).distinct()
                     }
-                    people_list.append(person_data)
+                    rows = []
+                    for chat in chats:
+                        if chat.messages and chat.id not in already_migrated:
+                            rows.extend(self._message_rows(chat.id, chat.messages))
+                            migrated += 1
+                    if rows:
+                        session.execute(insert(ChatMessage).values(rows))
+                        self._index_documents(session, [message_document(row) for row in rows if is_searchable_message(row)])
+                    session.query(ChatHistory).filter(ChatHistory.id.in_(ids)).delete(synchronize_session=False)
         except Exception as e:
             return {
                 "error": str(e),
                 "status": "failure",
-                "message": "Failed to get people"
+                "message": "Failed to migrate chat history"
             }
         return {
-            "data": people_list,    
-            "status": "success",
-            "message": "People retrieved successfully"
+            "data": {"migrated": migrated},
+            "status": "success"
         }
 
-    def get_all_connections(self, job_id):
-        try:
-            with self.SessionLocal.begin() as session:
-                people = session.query(PersonInfo).filter(PersonInfo.job_id == job_id, PersonInfo.status != "Not Connected").all()
-                people_list = []
-                for person in people:
-                    person_data = {
-                        "person_id": person.person_id,
-                        "job_id": person.job_id,
-                        "name": person.name,
-                        "headline": person.headline,
-                        "about": person.about,
-                        "current_company": person.current_company,
-                        "current_job_title": person.current_job_title,
-                        "duration_in_current_company": person.duration_in_current_company,
-                        "previous_experiences": person.previous_experiences,
-                        "education": person.education,
-                        "additional_info": person.additional_info,
-                        "status": person.status,
+    def get_company_research(self, company_website, max_age=None):
+        try:
+            with self.SessionLocal.begin() as session:
+                research = session.query(CompanyResearch).filter(CompanyResearch.company_website == company_website).first()
+                if not research:
+                    return {
+                        "error": "Company research not found",
+                        "status": "failure"
+                    }
+                if max_age is not None and research.updated_at < utcnow() - timedelta(seconds=max_age):
+                    return {
+                        "error": "Company research expired",
+                        "status": "failure"
                     }
-                    people_list.append(person_data)
+                research_data = {
+                    "company_website": research.company_website,
+                    "research": research.research,
+                    "updated_at": research.updated_at
+                }
         except Exception as e:
             return {
                 "error": str(e),
                 "status": "failure",
-                "message": "Failed to get connections"
+                "message": "Failed to get company research"
             }
         return {
-            "data": people_list,    
-            "status": "success",
-            "message": "Connections retrieved successfully"
+            "data": research_data,
+            "status": "success"
         }
 
+    def set_company_research(self, company_website, research):
+        try:
+            with self.SessionLocal.begin() as session:
+                session.merge(CompanyResearch(
+                    company_website=company_website,
+                    research=research,
+                    updated_at=utcnow()
+                ))
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to store company research"
+            }
+        return {
+            "status": "success"
+        }
 
-    def delete_person(self, person_id):
+    def get_profile_extraction(self, cache_key):
         try:
             with self.SessionLocal.begin() as session:
-                person = session.query(PersonInfo).filter(PersonInfo.person_id == person_id).first()
-                if not person:
+                extraction = session.query(ProfileExtraction.data).filter(ProfileExtraction.cache_key == cache_key).first()
+                if not extraction:
                     return {
-                        "error": "Person not found",
+                        "error": "Profile extraction not found",
                         "status": "failure"
                     }
-                session.delete(person)
+                data = extraction.data
         except Exception as e:
             return {
                 "error": str(e),
                 "status": "failure",
-                "message": "Failed to delete person"
+                "message": "Failed to get profile extraction"
             }
         return {
-            "status": "success",
-            "message": "Person deleted successfully"
+            "data": data,
+            "status": "success"
         }
 
-    def update_job_status(self, job_id, status):
+    def set_profile_extraction(self, cache_key, prompt_version, data):
         try:
             with self.SessionLocal.begin() as session:
-                job = session.query(JobInfo).filter(JobInfo.job_id == job_id).first()
-                job.status = status
-                session.add(job)
+                session.merge(ProfileExtraction(
+                    cache_key=cache_key,
+                    prompt_version=prompt_version,
+                    data=data,
+                    created_at=utcnow()
+                ))
         except Exception as e:
             return {
                 "error": str(e),
-                "status": "failure"
+                "status": "failure",
+                "message": "Failed to store profile extraction"
             }
         return {
             "status": "success"
         }
-    
-    def delete_job(self, job_id):
+
+    def get_tailored_resume(self, cache_key):
         try:
             with self.SessionLocal.begin() as session:
-                job = session.query(JobInfo).filter(JobInfo.job_id == job_id).first()
-                if not job:
+                resume = session.query(TailoredResume.fields).filter(TailoredResume.cache_key == cache_key).first()
+                if not resume:
+                    return {
+                        "error": "Tailored resume not found",
+                        "status": "failure"
+                    }
+                fields = resume.fields
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get tailored resume"
+            }
+        return {
+            "data": fields,
+            "status": "success"
+        }
+
+    def set_tailored_resume(self, cache_key, job_id, resume_version, remarks, fields):
+        try:
+            with self.SessionLocal.begin() as session:
+                session.merge(TailoredResume(
+                    cache_key=cache_key,
+                    job_id=job_id,
+                    resume_version=resume_version,
+                    remarks=remarks,
+                    fields=fields,
+                    created_at=utcnow()
+                ))
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to store tailored resume"
+            }
+        return {
+            "status": "success"
+        }
+
+    def create_task(self, kind):
+        try:
+            task_id = str(ulid.new())
+            with self.SessionLocal.begin() as session:
+                session.add(TaskInfo(task_id=task_id, kind=kind, status="queued"))
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to create task"
+            }
+        return {
+            "data": {"task_id": task_id},
+            "status": "success"
+        }
+
+    def update_task(self, task_id, **fields):
+        try:
+            fields["updated_at"] = utcnow()
+            with self.SessionLocal.begin() as session:
+                session.query(TaskInfo).filter(TaskInfo.task_id == task_id).update(fields)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to update task"
+            }
+        return {
+            "status": "success"
+        }
+
+    # Fails tasks left queued or running by a process that stopped; see
+    # TaskQueue. Tasks still being worked on elsewhere are updated more often
+    # than stale_seconds, so they are left alone.
+    def fail_stale_tasks(self, stale_seconds):
+        try:
+            with self.SessionLocal.begin() as session:
+                failed = session.execute(
+                    update(TaskInfo)
+                    .where(TaskInfo.status.in_(("queued", "running")))
+                    .where(TaskInfo.updated_at < utcnow() - timedelta(seconds=stale_seconds))
+                    .values(status="failed", error=INTERRUPTED_TASK_ERROR, updated_at=utcnow())
+                ).rowcount
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to fail stale tasks"
+            }
+        return {
+            "data": {"failed": failed},
+            "status": "success"
+        }
+
+    def get_task(self, task_id):
+        try:
+            with self.SessionLocal.begin() as session:
+                task = session.query(TaskInfo).filter(TaskInfo.task_id == task_id).first()
+                if not task:
+                    return {
+                        "error": "Task not found",
+                        "status": "failure"
+                    }
+                task_data = {
+                    "task_id": task.task_id,
+                    "kind": task.kind,
+                    "status": task.status,
+                    "progress": task.progress,
+                    "result": task.result,
+                    "error": task.error,
+                    "created_at": task.created_at.isoformat(),
+                    "updated_at": task.updated_at.isoformat()
+                }
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get task"
+            }
+        return {
+            "data": task_data,
+            "status": "success"
+        }
+
+    def get_job_with_people(self, job_id):
+        try:
+            with self.SessionLocal.begin() as session:
+                rows = session.query(JobInfo, PersonInfo).outerjoin(
+                    PersonInfo, PersonInfo.job_id == JobInfo.job_id
+                ).filter(JobInfo.job_id == job_id).all()
+                if not rows:
                     return {
                         "error": "Job not found",
                         "status": "failure"
                     }
-                session.delete(job)
+                job_data = job_to_dict(rows[0][0])
+                people_list = [person_to_dict(person) for _, person in rows if person is not None]
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get job and people"
+            }
+        return {
+            "data": {
+                "job": job_data,
+                "people": people_list
+            },
+            "status": "success"
+        }
+
+    def _list_rows(self, model, primary_key, filters, limit=None, cursor=None, fields=None, stream=False):
+        # Keyset pagination on the ULID primary key: ULIDs sort by creation time,
+        # so "> cursor" resumes exactly where the previous page stopped.
+        fields = list(fields or [column.name for column in model.__table__.columns])
+        if primary_key.name not in fields:
+            fields.insert(0, primary_key.name)
+        columns = [getattr(model, field) for field in fields]
+
+        statement = select(*columns).where(*filters).order_by(primary_key)
+        if cursor:
+            statement = statement.where(primary_key > cursor)
+
+        if stream:
+            # A streamed list has no next_cursor: its headers go out before the
+            # last row is read. The last row's id is the next page's cursor.
+            return self._stream_rows(statement.limit(limit) if limit else statement), None
+
+        with self.SessionLocal.begin() as session:
+            if limit:
+                statement = statement.limit(limit + 1)
+            rows = [dict(row._mapping) for row in session.execute(statement)]
+
+        next_cursor = None
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1][primary_key.name]
+        return rows, next_cursor
+
+    def _stream_rows(self, statement):
+        # Generator over a server-side cursor (MySQL's unbuffered cursor; SQLite
+        # steps through the result as it is read): STREAM_BATCH_SIZE rows are
+        # held at a time, and the session stays open until the last row has
+        # been read or the generator is closed
+        with self.SessionLocal.begin() as session:
+            for row in session.execute(statement.execution_options(yield_per=STREAM_BATCH_SIZE)):
+                yield dict(row._mapping)
+
+    def get_all_jobs(self, limit=None, cursor=None, fields=None, status=None, company_name=None, stream=False):
+        try:
+            filters = []
+            if status:
+                filters.append(JobInfo.status == status)
+            if company_name:
+                filters.append(JobInfo.company_name == company_name)
+            job_list, next_cursor = self._list_rows(JobInfo, JobInfo.job_id, filters, limit, cursor, fields, stream)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get jobs"
+            }
+        return {
+            "data": job_list,
+            "next_cursor": next_cursor,
+            "status": "success",
+            "message": "Jobs retrieved successfully"
+        }
+
+    def get_all_people(self, job_id, limit=None, cursor=None, fields=None, status=None, stream=False):
+        try:
+            filters = [PersonInfo.job_id == job_id]
+            if status:
+                filters.append(PersonInfo.status == status)
+            people_list, next_cursor = self._list_rows(PersonInfo, PersonInfo.person_id, filters, limit, cursor, fields, stream)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get people"
+            }
+        return {
+            "data": people_list,
+            "next_cursor": next_cursor,
+            "status": "success",
+            "message": "People retrieved successfully"
+        }
+
+    def get_all_connections(self, job_id, limit=None, cursor=None, fields=None, status=None, stream=False):
+        try:
+            filters = [PersonInfo.job_id == job_id, PersonInfo.status != "Not Connected"]
+            if status:
+                filters.append(PersonInfo.status == status)
+            people_list, next_cursor = self._list_rows(PersonInfo, PersonInfo.person_id, filters, limit, cursor, fields, stream)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to get connections"
+            }
+        return {
+            "data": people_list,
+            "next_cursor": next_cursor,
+            "status": "success",
+            "message": "Connections retrieved successfully"
+        }
+
+
+    def _search_statistics(self, session, terms):
+        # Ranking only needs these roughly, so they are cached; a term with no
+        # documents is not, or a new job would stay unsearchable for a while
+        documents = self.search_stats.get("documents")
+        if documents is None:
+            documents = sum(session.scalar(select(func.count()).select_from(model)) for model in (JobInfo, PersonInfo, ChatMessage))
+            self.search_stats.set("documents", documents)
+
+        frequencies = {term: self.search_stats.get(f"term:{term}") for term in terms}
+        missing = [term for term, frequency in frequencies.items() if frequency is None]
+        if missing:
+            counted = dict(session.execute(
+                select(SearchTerm.term, func.count()).where(SearchTerm.term.in_(missing)).group_by(SearchTerm.term)
+            ).all())
+            for term in missing:
+                frequencies[term] = counted.get(term, 0)
+                if frequencies[term]:
+                    self.search_stats.set(f"term:{term}", frequencies[term])
+        return max(documents, 1), frequencies
+
+    def _rank_search(self, session, terms, documents, frequencies, doc_type, job_id, limit, offset):
+        # Every term must match. Candidates are the best-weighted documents of
+        # the rarest term, so the work is bounded however common the others are.
+        idf = {term: math.log(1 + documents / frequencies[term]) for term in terms}
+        rarest = min(terms, key=frequencies.get)
+
+        candidate = aliased(SearchTerm)
+        filters = [candidate.term == rarest]
+        if doc_type:
+            filters.append(candidate.doc_type == doc_type)
+        if job_id:
+            filters.append(or_(
+                and_(candidate.doc_type.in_(("job", "person")), candidate.scope_id == job_id),
+                and_(candidate.doc_type == "chat", candidate.scope_id.in_(select(PersonInfo.person_id).where(PersonInfo.job_id == job_id)))
+            ))
+        candidates = (
+            select(candidate.doc_type, candidate.doc_id)
+            .where(*filters)
+            .order_by(candidate.weight.desc())
+            .limit(SEARCH_MAX_CANDIDATES)
+            .subquery()
+        )
+
+        score = func.sum(SearchTerm.weight * case(idf, value=SearchTerm.term)).label("score")
+        return session.execute(
+            select(SearchTerm.doc_type, SearchTerm.doc_id, score)
+            .join(candidates, and_(SearchTerm.doc_type == candidates.c.doc_type, SearchTerm.doc_id == candidates.c.doc_id))
+            .where(SearchTerm.term.in_(terms))
+            .group_by(SearchTerm.doc_type, SearchTerm.doc_id)
+            .having(func.count() == len(terms))
+            .order_by(score.desc(), SearchTerm.doc_type, SearchTerm.doc_id)
+            .limit(limit)
+            .offset(offset)
+        ).all()
+
+    def _search_hits(self, session, ranked, terms):
+        ids = {doc_type: [] for doc_type in SEARCH_DOC_TYPES}
+        for doc_type, doc_id, score in ranked:
+            ids[doc_type].append(doc_id)
+
+        found = {}
+        if ids["job"]:
+            for row in session.execute(
+                select(JobInfo.job_id, JobInfo.job_title, JobInfo.company_name, JobInfo.status).where(JobInfo.job_id.in_(ids["job"]))
+            ):
+                found[("job", row.job_id)] = dict(row._mapping)
+        if ids["person"]:
+            for row in session.execute(
+                select(PersonInfo.person_id, PersonInfo.job_id, PersonInfo.name, PersonInfo.headline,
+                       PersonInfo.current_company, PersonInfo.status).where(PersonInfo.person_id.in_(ids["person"]))
+            ):
+                found[("person", row.person_id)] = dict(row._mapping)
+        if ids["chat"]:
+            keys = [(chat_id, int(seq)) for chat_id, seq in (doc_id.rsplit(":", 1) for doc_id in ids["chat"])]
+            for row in session.execute(
+                select(ChatMessage.chat_id, ChatMessage.seq, ChatMessage.role, ChatMessage.parts)
+                .where(tuple_(ChatMessage.chat_id, ChatMessage.seq).in_(keys))
+            ):
+                found[("chat", f"{row.chat_id}:{row.seq}")] = {
+                    "chat_id": row.chat_id,
+                    "seq": row.seq,
+                    "role": row.role,
+                    "snippet": snippet(message_text(row.parts), terms)
+                }
+
+        return [
+            {"type": doc_type, "score": round(score, 4), **found[(doc_type, doc_id)]}
+            for doc_type, doc_id, score in ranked
+            if (doc_type, doc_id) in found
+        ]
+
+    def search(self, query, doc_type=None, job_id=None, limit=20, cursor=None):
+        # Ranked hits over jobs, people and chat turns; cursor is the offset of
+        # the next page
+        try:
+            terms = list(dict.fromkeys(tokenize(query)))[:SEARCH_MAX_TERMS]
+            offset = int(cursor) if cursor else 0
+            hits = []
+            next_cursor = None
+            if terms:
+                with self.SessionLocal.begin() as session:
+                    documents, frequencies = self._search_statistics(session, terms)
+                    if all(frequencies.values()):
+                        ranked = self._rank_search(session, terms, documents, frequencies, doc_type, job_id, limit + 1, offset)
+                        if len(ranked) > limit:
+                            ranked = ranked[:limit]
+                            next_cursor = str(offset + limit)
+                        hits = self._search_hits(session, ranked, terms)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to search"
+            }
+        return {
+            "data": hits,
+            "next_cursor": next_cursor,
+            "status": "success"
+        }
+
+    def rebuild_search_index(self, batch_size=500):
+        # Indexes every job, person and chat turn from scratch, one batch per
+        # transaction; needed once for data written before the index existed.
+        # Searches see a partial index while it runs.
+        indexed = {doc_type: 0 for doc_type in SEARCH_DOC_TYPES}
+        # (doc type, document builder, keyset key, columns, rows left out)
+        sources = (
+            ("job", job_document, (JobInfo.job_id,),
+             (JobInfo.job_id, JobInfo.job_title, JobInfo.company_name, JobInfo.job_description), None),
+            ("person", person_document, (PersonInfo.person_id,),
+             (PersonInfo.person_id, PersonInfo.job_id, PersonInfo.name, PersonInfo.headline, PersonInfo.current_company), None),
+            # The opening prompt turns; see is_searchable_message
+            ("chat", message_document, (ChatMessage.chat_id, ChatMessage.seq),
+             (ChatMessage.chat_id, ChatMessage.seq, ChatMessage.role, ChatMessage.parts),
+             (ChatMessage.seq == 0) & (ChatMessage.role == "user")),
+        )
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(delete(SearchTerm))
+
+            for doc_type, document, key, columns, skipped in sources:
+                last_key = None
+                while True:
+                    with self.SessionLocal.begin() as session:
+                        query = select(*columns).order_by(*key).limit(batch_size)
+                        if skipped is not None:
+                            query = query.where(~skipped)
+                        if last_key is not None:
+                            query = query.where(tuple_(*key) > tuple_(*last_key))
+                        rows = [dict(row._mapping) for row in session.execute(query)]
+                        if not rows:
+                            break
+                        last_key = [rows[-1][column.name] for column in key]
+                        documents = [document(row) for row in rows]
+                        # A write racing the rebuild may have indexed some already
+                        self._unindex_documents(session, doc_type, [doc_id for _, doc_id, _, _ in documents])
+                        self._index_documents(session, documents)
+                        indexed[doc_type] += len(rows)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to rebuild search index"
+            }
+        return {
+            "data": indexed,
+            "status": "success"
+        }
+
+    def update_job_status(self, job_id, status):
+        try:
+            with self.SessionLocal.begin() as session:
+                updated = session.execute(
+                    update(JobInfo).where(JobInfo.job_id == job_id).values(status=status)
+                ).rowcount
+                if updated:
+                    self._bump_versions(session, ["jobs", f"job:{job_id}"])
+            if not updated:
+                return {
+                    "error": "Job not found",
+                    "status": "failure"
+                }
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure"
+            }
+        return {
+            "status": "success"
+        }
+
+    def update_job_research_status(self, job_id, research_status):
+        try:
+            with self.SessionLocal.begin() as session:
+                updated = session.execute(
+                    update(JobInfo).where(JobInfo.job_id == job_id).values(research_status=research_status)
+                ).rowcount
+                if updated:
+                    self._bump_versions(session, ["jobs", f"job:{job_id}"])
+            if not updated:
+                return {
+                    "error": "Job not found",
+                    "status": "failure"
+                }
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure"
+            }
+        return {
+            "status": "success"
+        }
+
+    def delete_job(self, job_id):
+        # Removes the job with its people, every conversation stored under
+        # them or the job itself and its tailored resumes, in one transaction
+        try:
+            with self.SessionLocal.begin() as session:
+                person_ids = session.scalars(select(PersonInfo.person_id).where(PersonInfo.job_id == job_id)).all()
+                self._delete_people(session, list(person_ids))
+                self._delete_chats(session, [job_id])
+                session.execute(delete(TailoredResume).where(TailoredResume.job_id == job_id))
+                self._unindex_documents(session, "job", [job_id])
+                deleted = session.execute(delete(JobInfo).where(JobInfo.job_id == job_id)).rowcount
+                self._bump_versions(session, ["jobs", f"job:{job_id}", f"people:{job_id}"])
+            if not deleted:
+                return {
+                    "error": "Job not found",
+                    "status": "failure"
+                }
         except Exception as e:
             return {
                 "error": str(e),
@@ -406,6 +1593,7 @@ class Database():
                 "message": "Failed to delete job"
             }
         return {
+            "data": {"people": len(person_ids)},
             "status": "success",
             "message": "Job deleted successfully"
         }
@@ -413,13 +1601,13 @@ class Database():
     def delete_person(self, person_id):
         try:
             with self.SessionLocal.begin() as session:
-                person = session.query(PersonInfo).filter(PersonInfo.person_id == person_id).first()
-                if not person:
-                    return {
-                        "error": "Person not found",
-                        "status": "failure"
-                    }
-                session.delete(person)
+                self._bump_people_versions(session, [person_id])
+                deleted = self._delete_people(session, [person_id])
+            if not deleted:
+                return {
+                    "error": "Person not found",
+                    "status": "failure"
+                }
         except Exception as e:
             return {
                 "error": str(e),
@@ -429,4 +1617,103 @@ class Database():
         return {
             "status": "success",
             "message": "Person deleted successfully"
-        }
\ No newline at end of file
+        }
+
+    def delete_people(self, person_ids):
+        try:
+            with self.SessionLocal.begin() as session:
+                self._bump_people_versions(session, list(person_ids))
+                deleted = self._delete_people(session, list(person_ids))
+            if not deleted:
+                return {
+                    "error": "People not found",
+                    "status": "failure"
+                }
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to delete people"
+            }
+        return {
+            "data": {"deleted": deleted},
+            "status": "success",
+            "message": f"Deleted {deleted} of {len(person_ids)} people"
+        }
+
+    def _live_chat_ids(self, session, chat_ids):
+        # Conversations belong to a person or, for legacy rows, to a job
+        live = set(session.scalars(select(PersonInfo.person_id).where(PersonInfo.person_id.in_(chat_ids))))
+        live |= set(session.scalars(select(JobInfo.job_id).where(JobInfo.job_id.in_(chat_ids))))
+        return live
+
+    def _count_chat_rows(self, session, chat_ids):
+        return {
+            name: session.scalar(select(func.count()).where(column.in_(chat_ids)))
+            for name, column in CHAT_TABLES
+        }
+
+    def gc_orphans(self, batch_size=DELETE_BATCH_SIZE, dry_run=False, pause=0):
+        # Purges people whose job is gone and conversations whose person (or
+        # job) is gone, left behind by deletes made before delete_job cascaded.
+        # Walks each table by primary key, one short transaction per batch, so
+        # no lock is held for long; pause sleeps between batches.
+        purged = {"people": 0, "chat_messages": 0, "chat_summaries": 0, "chat_history": 0}
+        try:
+            last_id = ""
+            while True:
+                with self.SessionLocal.begin() as session:
+                    rows = session.execute(
+                        select(PersonInfo.person_id, PersonInfo.job_id)
+                        .where(PersonInfo.person_id > last_id)
+                        .order_by(PersonInfo.person_id)
+                        .limit(batch_size)
+                    ).all()
+                    if not rows:
+                        break
+                    last_id = rows[-1].person_id
+                    job_ids = {row.job_id for row in rows}
+                    live_jobs = set(session.scalars(select(JobInfo.job_id).where(JobInfo.job_id.in_(job_ids))))
+                    orphans = [row.person_id for row in rows if row.job_id not in live_jobs]
+                    if orphans:
+                        # Deleting a person deletes their conversation too;
+                        # count it here, since the chat pass below won't see it
+                        for name, count in self._count_chat_rows(session, orphans).items():
+                            purged[name] += count
+                        if not dry_run:
+                            self._delete_people(session, orphans)
+                    purged["people"] += len(orphans)
+                if pause:
+                    time.sleep(pause)
+
+            for name, column in CHAT_TABLES:
+                last_id = ""
+                while True:
+                    with self.SessionLocal.begin() as session:
+                        chat_ids = session.scalars(
+                            select(column).where(column > last_id).group_by(column).order_by(column).limit(batch_size)
+                        ).all()
+                        if not chat_ids:
+                            break
+                        last_id = chat_ids[-1]
+                        live = self._live_chat_ids(session, chat_ids)
+                        orphans = [chat_id for chat_id in chat_ids if chat_id not in live]
+                        if orphans and not dry_run:
+                            purged[name] += session.execute(delete(column.class_).where(column.in_(orphans))).rowcount
+                            if column is ChatMessage.chat_id:
+                                self._unindex_chats(session, orphans)
+                            self._bump_versions(session, [f"chat:{chat_id}" for chat_id in orphans])
+                        elif orphans:
+                            purged[name] += session.scalar(select(func.count()).where(column.in_(orphans)))
+                    if pause:
+                        time.sleep(pause)
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to purge orphans"
+            }
+        return {
+            "data": purged,
+            "status": "success"
+        }
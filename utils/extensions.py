@@ -0,0 +1,10 @@
+from flask import current_app
+from werkzeug.local import LocalProxy
+
+# Process-wide services created once by main.create_app and shared by every blueprint
+db = LocalProxy(lambda: current_app.extensions["db"])
+task_queue = LocalProxy(lambda: current_app.extensions["task_queue"])
+llm = LocalProxy(lambda: current_app.extensions["llm"])
+response_cache = LocalProxy(lambda: current_app.extensions["response_cache"])
+resumes = LocalProxy(lambda: current_app.extensions["resumes"])
+ranker = LocalProxy(lambda: current_app.extensions["ranker"])
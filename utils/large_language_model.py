@@ -1,76 +1,376 @@
-from google import genai
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, nullcontext
 from dotenv import load_dotenv
+import asyncio
 import os
-from string import Template
 import json
+import logging
+from utils.cache import TTLCache, CacheStats
+import hashlib
+import re
+from utils.prompts import prompts
+from utils.llm_backends import InstrumentedBackend, backend_from_env
+from utils.call_policy import PolicyBackend
+from utils.task_queue import KeyedLocks
 
 # Load environment variables
 load_dotenv()
 
-api_key = os.getenv("gemini_api_key")
-if not api_key:
-    raise EnvironmentError("gemini_api_key not found in environment variables")
+logger = logging.getLogger(__name__)
+
+# Company research is stored in the database for COMPANY_RESEARCH_TTL seconds and
+# mirrored in a per-process LRU for a shorter window, so a manual refresh on one
+# worker reaches the others quickly.
+COMPANY_RESEARCH_TTL = int(os.getenv("COMPANY_RESEARCH_TTL", 7 * 24 * 3600))
+COMPANY_RESEARCH_MEMORY_TTL = int(os.getenv("COMPANY_RESEARCH_MEMORY_TTL", 600))
+COMPANY_RESEARCH_CACHE_SIZE = int(os.getenv("COMPANY_RESEARCH_CACHE_SIZE", 256))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 2048))
+PROFILE_CACHE_TTL = int(os.getenv("PROFILE_CACHE_TTL", 24 * 3600))
+
+# Bulk generation/extraction: parallel model calls per request. Timeouts,
+# retries and rate limits are applied per call by utils/call_policy.py.
+COLD_MESSAGE_CONCURRENCY = int(os.getenv("COLD_MESSAGE_CONCURRENCY", 4))
+PROFILE_EXTRACTION_CONCURRENCY = int(os.getenv("PROFILE_EXTRACTION_CONCURRENCY", 8))
+
+COLD_MESSAGE_MODEL = "gemini-3-pro-preview"
+
+# Fail at import if a template the code relies on is missing or has drifted
+prompts.require("profile_extractor", "profile_text")
+prompts.require("company_information", "company_website")
+prompts.require("cold_message", "employee_information", "job_description", "company_information")
+prompts.require("conversation_summary", "previous_summary", "transcript")
+prompts.require("resume_prompt", "current_resume_score", "remarks", "current_resume_text", "job_description")
+
+# Follow-ups send the rolling summary plus the last FOLLOW_UP_KEEP_TURNS turns
+# (rounded down to whole user/model exchanges) within FOLLOW_UP_TOKEN_BUDGET
+FOLLOW_UP_KEEP_TURNS = max(2, int(os.getenv("FOLLOW_UP_KEEP_TURNS", 6)) // 2 * 2)
+FOLLOW_UP_TOKEN_BUDGET = int(os.getenv("FOLLOW_UP_TOKEN_BUDGET", 8000))
+# A verbatim turn is never cut shorter than this to fit the budget
+FOLLOW_UP_MIN_TURN_CHARS = 2000
+TRUNCATION_MARK = "\n[...]"
+
+
+def message_text(message: dict) -> str:
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in message["parts"])
+
+
+# Roughly four characters per token for English text; good enough to keep a
+# request under budget without an extra count_tokens round trip
+def estimate_tokens(messages: list) -> int:
+    return sum(len(message_text(message)) for message in messages) // 4
+
+
+def truncate_turn(message: dict, max_chars: int) -> dict:
+    text = message_text(message)
+    if len(text) <= max_chars:
+        return message
+    return {"role": message["role"], "parts": [{"text": text[:max_chars] + TRUNCATION_MARK}]}
+
+
+def summary_turns(summary: str) -> list:
+    if not summary:
+        return []
+    return [
+        {"role": "user", "parts": [{"text": f"Summary of our conversation so far:\n{summary}"}]},
+        {"role": "model", "parts": [{"text": "Understood. I will continue from this summary."}]}
+    ]
+
+
+def token_usage(response) -> dict:
+    usage = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_token_count", None),
+        "output_tokens": getattr(usage, "candidates_token_count", None),
+        "total_tokens": getattr(usage, "total_token_count", None)
+    }
+
+
+def profile_failure(e):
+    if isinstance(e, json.JSONDecodeError):
+        error = "Model did not return valid JSON"
+    elif isinstance(e, (AttributeError, TypeError)):
+        error = "Empty or invalid response from model"
+    else:
+        error = str(e)
+    return {
+        "error": error,
+        "status": "failure"
+    }
+
+def cold_message_conversation(message_prompt: str, cold_message: str) -> list:
+    return [
+        {
+            "role": "user",
+            "parts": [{"text": message_prompt}]
+        },
+        {
+            "role": "model",
+            "parts": [{"text": cold_message}]
+        }
+    ]
 
 
-class LLM:
-    def __init__(self):
-        # Initialize Gemini client
-        self.client = genai.Client(api_key=api_key)
+def follow_up_turn(message: str) -> dict:
+    return {
+        "role": "user",
+        "parts": [{"text": message.strip()}]
+    }
 
-    def get_profile_json(self, profile_text: str) -> dict:
-        try:
-            # Load prompt template
-            with open(
-                "job-ref-sys/prompts/profile_extractor.txt",
-                "r",
-                encoding="utf-8"
-            ) as f:
-                prompt_template = Template(f.read())
-
-            prompt = prompt_template.substitute(profile_text=profile_text)
-
-            # Generate content (JSON enforced)
-            response = self.client.models.generate_content(
-                model="gemini-2.5-flash-lite",
-                contents=prompt,
-                config={
-                    "response_mime_type": "application/json"
-                }
-            )
 
-            # Parse JSON output
-            output = json.loads(response.text)
+def generation_failure(e, message: str) -> dict:
+    return {
+        "error": str(e),
+        "status": "failure",
+        "message": message
+    }
 
-        except FileNotFoundError:
-            return {
-                "error": "Prompt file not found",
-                "status": "failure"
-            }
 
-        except json.JSONDecodeError:
-            return {
-                "error": "Model did not return valid JSON",
-                "status": "failure"
-            }
+# Errors a streaming client can act on are passed through; anything else may
+# carry database or provider details, so it is logged and replaced by message
+CLIENT_ERRORS = (
+    "Person not found",
+    "Job not found",
+    "No existing conversation found. Please start a new chat first.",
+)
 
-        except (AttributeError, TypeError):
-            return {
-                "error": "Empty or invalid response from model",
-                "status": "failure"
-            }
 
-        except Exception as e:
-            return {
-                "error": str(e),
-                "status": "failure"
+def stream_error(r: dict, message: str) -> dict:
+    if r.get("error") in CLIENT_ERRORS:
+        return {"event": "error", "data": {"error": r["error"], "status": "failure"}}
+    logger.warning("stream failed", extra={"fields": {"error": r.get("error"), "message": message}})
+    return {"event": "error", "data": {"error": message, "status": "failure"}}
+
+
+def cold_message_result(cold_message: str, usage: dict = None) -> dict:
+    r = {"data": {"message": cold_message}}
+    if usage is not None:
+        r["usage"] = usage
+    r.update(status="success", message="Cold message generated successfully")
+    return r
+
+
+def follow_up_result(context: dict, chat_response: str, usage: dict) -> dict:
+    usage["estimated_prompt_tokens"] = context["data"]["estimated_prompt_tokens"]
+    usage["summarized"] = context["data"]["summarized"]
+    return {
+        "data": {"message": chat_response},
+        "usage": usage,
+        "status": "success",
+        "message": "Follow-up response generated successfully"
+    }
+
+
+def profile_cache_key(profile_text: str) -> str:
+    normalized = re.sub(r"\s+", " ", profile_text).strip()
+    key = f"{prompts.version('profile_extractor')}\n{normalized}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def normalize_company_website(company_website: str) -> str:
+    return company_website.strip().lower().rstrip("/")
+
+
+class LLM:
+    def __init__(self, backend=None):
+        # Gemini by default; LLM_BACKEND=fake selects the offline stand-in.
+        # Every attempt is instrumented; the policy decides whether to retry.
+        self.backend = PolicyBackend(InstrumentedBackend(backend or backend_from_env()))
+
+        self.company_research_cache = TTLCache(
+            maxsize=COMPANY_RESEARCH_CACHE_SIZE,
+            ttl=min(COMPANY_RESEARCH_MEMORY_TTL, COMPANY_RESEARCH_TTL)
+        )
+        self.company_research_stats = CacheStats("memory_hits", "database_hits", "misses")
+        self.profile_cache = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+        self.profile_cache_stats = CacheStats("memory_hits", "database_hits", "misses")
+        self._research_locks = KeyedLocks()
+
+    def _cached_profile(self, cache_key, db=None):
+        # Same text + same prompt version -> same extraction, so repeat imports
+        # are served from the LRU or the ProfileExtractions table
+        output = self.profile_cache.get(cache_key)
+        if output is not None:
+            self.profile_cache_stats.record("memory_hits")
+            return output
+
+        if db is not None:
+            r = db.get_profile_extraction(cache_key)
+            if r.get("status") == "success":
+                self.profile_cache_stats.record("database_hits")
+                self.profile_cache.set(cache_key, r["data"])
+                return r["data"]
+
+        self.profile_cache_stats.record("misses")
+        return None
+
+    def _profile_request(self, profile_text: str) -> dict:
+        # Generate content (JSON enforced)
+        return {
+            "model": "gemini-2.5-flash-lite",
+            "contents": prompts.render("profile_extractor", profile_text=profile_text),
+            "config": {
+                "response_mime_type": "application/json"
             }
+        }
+
+    def _store_profile(self, cache_key, output, db=None):
+        if db is not None:
+            db.set_profile_extraction(cache_key, prompts.version("profile_extractor"), output)
+        self.profile_cache.set(cache_key, output)
+
+    def get_profile_json(self, profile_text: str, db=None) -> dict:
+        if not isinstance(profile_text, str) or not profile_text.strip():
+            return profile_failure(ValueError("profile_text is required"))
+        cache_key = profile_cache_key(profile_text)
+        output = self._cached_profile(cache_key, db)
+
+        if output is None:
+            try:
+                response = self.backend.generate(**self._profile_request(profile_text))
+                output = json.loads(response.text)
+            except Exception as e:
+                return profile_failure(e)
+            self._store_profile(cache_key, output, db)
 
         return {
             "data": output,
             "status": "success"
         }
 
-    def generate_cold_message(self, db, person_id):
+    def get_profile_jsons(self, profile_texts: list, db=None, max_concurrency=PROFILE_EXTRACTION_CONCURRENCY) -> list:
+        # Results are returned in the same order as profile_texts
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            return list(pool.map(lambda text: self.get_profile_json(profile_text=text, db=db), profile_texts))
+
+    def cache_stats(self) -> dict:
+        return {
+            "profile_extraction": self.profile_cache_stats.snapshot(),
+            "company_research": self.company_research_stats.snapshot()
+        }
+
+    def get_company_information(self, db, company_website: str, refresh: bool = False) -> dict:
+        key = normalize_company_website(company_website)
+
+        # Concurrent cold messages for the same company wait for a single research call
+        with self._research_locks.hold(key):
+            if not refresh:
+                company_info = self.company_research_cache.get(key)
+                if company_info is not None:
+                    self.company_research_stats.record("memory_hits")
+                    return {
+                        "data": company_info,
+                        "status": "success"
+                    }
+
+                r = db.get_company_research(key, max_age=COMPANY_RESEARCH_TTL)
+                if r.get("status") == "success":
+                    self.company_research_stats.record("database_hits")
+                    self.company_research_cache.set(key, r["data"]["research"])
+                    return {
+                        "data": r["data"]["research"],
+                        "status": "success"
+                    }
+
+            self.company_research_stats.record("misses")
+            try:
+                prompt = prompts.render("company_information", company_website=company_website)
+
+                response = self.backend.generate(
+                    model="gemini-3-pro-preview",
+                    contents=prompt,
+                )
+
+                company_info = response.text.strip()
+            except Exception as e:
+                return {
+                    "error": str(e),
+                    "status": "failure",
+                    "message": "Failed to research company"
+                }
+
+            # A failed write only costs a future cache miss, so it is not fatal
+            db.set_company_research(key, company_info)
+            self.company_research_cache.set(key, company_info)
+
+        return {
+            "data": company_info,
+            "status": "success"
+        }
+
+    def research_job_company(self, db, job_id, company_website, refresh=False, progress=None):
+        # Queued by /add-job so the research is cached before the first cold
+        # message for the job needs it, and by /refresh-company-research. A
+        # failed refresh leaves the earlier research, and the job's status,
+        # as they were: that research is still stored and served.
+        progress = progress or (lambda message: None)
+        if not refresh:
+            db.update_job_research_status(job_id, "running")
+        progress("Researching company")
+
+        r = self.get_company_information(db, company_website, refresh=refresh)
+
+        if r.get("status") == "success":
+            db.update_job_research_status(job_id, "ready")
+        elif not refresh:
+            db.update_job_research_status(job_id, "failed")
+        if r.get("status") == "failure":
+            return r
+
+        return {
+            "data": {"job_id": job_id},
+            "status": "success",
+            "message": "Company research refreshed" if refresh else "Company research ready"
+        }
+
+    def _cold_message_prompt(self, person: dict, job: dict, company_info: str) -> str:
+        employee_information = f"name: {person['name']}\n" \
+                            f"headline: {person['headline']}\n" \
+                            f"about: {person['about']}\n" \
+                            f"current_company: {person['current_company']}\n" \
+                            f"current_job_title: {person['current_job_title']}\n" \
+                            f"duration_in_current_company: {person['duration_in_current_company']}\n" \
+                            f"previous_experiences: {person['previous_experiences']}\n" \
+                            f"education: {person['education']}\n" \
+                            f"additional_info: {person['additional_info']}\n"
+
+        job_description = f"job_title: {job['job_title']}\n" \
+                        f"company_name: {job['company_name']}\n" \
+                        f"job_description: {job['job_description']}\n" \
+                        f"application_link: {job['application_link']}\n"
+
+        return prompts.render(
+            "cold_message",
+            employee_information=employee_information,
+            job_description=job_description,
+            company_information=company_info
+        )
+
+    # Prompt, model call and reply for one cold message: used by the single,
+    # bulk and async paths alike; the streams send the same prompt to the
+    # same model
+    def _write_cold_message(self, person: dict, job: dict, company_info: str):
+        message_prompt = self._cold_message_prompt(person, job, company_info)
+
+        response = self.backend.generate(
+            model=COLD_MESSAGE_MODEL,
+            contents=message_prompt,
+        )
+
+        cold_message = response.text.strip()
+        return cold_message, cold_message_conversation(message_prompt, cold_message)
+
+    async def _awrite_cold_message(self, person: dict, job: dict, company_info: str):
+        message_prompt = self._cold_message_prompt(person, job, company_info)
+
+        response = await self.backend.agenerate(
+            model=COLD_MESSAGE_MODEL,
+            contents=message_prompt,
+        )
+
+        cold_message = response.text.strip()
+        return cold_message, cold_message_conversation(message_prompt, cold_message)
+
+    def _cold_message_inputs(self, db, person_id, progress):
         try:
             person_data = db.get_person_by_id(person_id)
 
@@ -80,16 +380,6 @@ class LLM:
                     "status": "failure"
                 }
 
-            employee_information = f"name: {person_data['data']['name']}\n" \
-                                f"headline: {person_data['data']['headline']}\n" \
-                                f"about: {person_data['data']['about']}\n" \
-                                f"current_company: {person_data['data']['current_company']}\n" \
-                                f"current_job_title: {person_data['data']['current_job_title']}\n" \
-                                f"duration_in_current_company: {person_data['data']['duration_in_current_company']}\n" \
-                                f"previous_experiences: {person_data['data']['previous_experiences']}\n" \
-                                f"education: {person_data['data']['education']}\n" \
-                                f"additional_info: {person_data['data']['additional_info']}\n"
-
             job_data = db.get_job_by_id(person_data["data"]["job_id"])
 
             if job_data.get("status") == "failure":
@@ -98,22 +388,11 @@ class LLM:
                     "status": "failure"
                 }
 
-            job_description = f"job_title: {job_data['data']['job_title']}\n" \
-                            f"company_name: {job_data['data']['company_name']}\n" \
-                            f"job_description: {job_data['data']['job_description']}\n" \
-                            f"application_link: {job_data['data']['application_link']}\n"
-
-            with open("job-ref-sys/prompts/company_information.txt", 'r', encoding='utf-8') as f:
-                prompt_template = Template(f.read())
-
-            prompt = prompt_template.substitute(company_website=job_data["data"]["company_website"])
+            progress("Researching company")
+            r = self.get_company_information(db, job_data["data"]["company_website"])
 
-            response = self.client.models.generate_content(
-                model="gemini-3-pro-preview",
-                contents=prompt,
-            )
-
-            company_info = response.text.strip()
+            if r.get("status") == "failure":
+                return r
         except Exception as e:
             return {
                 "error": str(e),
@@ -121,79 +400,473 @@ class LLM:
                 "message": "Failed to retrieve necessary data"
             }
 
+        return {
+            "data": {
+                "person": person_data["data"],
+                "job": job_data["data"],
+                "company_info": r["data"]
+            },
+            "status": "success"
+        }
+
+    def _store_cold_message(self, db, person_id, conversation):
+        return db.set_message(id=person_id, messages=conversation)
+
+    # The sync and async flows share every step but the model call: inputs
+    # and context are prepared, and replies stored, by the helpers around it
+    def generate_cold_message(self, db, person_id, progress=None):
+        progress = progress or (lambda message: None)
+        r = self._cold_message_inputs(db, person_id, progress)
+
+        if r.get("status") == "failure":
+            return r
+
         try:
-            with open("job-ref-sys/prompts/cold_message.txt", 'r', encoding='utf-8') as f:
-                message_template = Template(f.read())
-            
-            message_prompt = message_template.substitute(
-                employee_information=employee_information,
-                job_description=job_description,
-                company_information=company_info
-            )
+            progress("Generating cold message")
+            cold_message, conversation = self._write_cold_message(**r["data"])
 
-            response = self.client.models.generate_content(
-                model="gemini-3-pro-preview",
-                contents=message_prompt,
-            )
+            r = self._store_cold_message(db, person_id, conversation)
+            if r.get("status") == "failure":
+                return r
+        except Exception as e:
+            return generation_failure(e, "Failed to generate cold message")
+
+        return cold_message_result(cold_message)
+
+    # Streaming variants yield {"event": ..., "data": ...} dicts: "progress",
+    # then one "token" per chunk from Gemini, then "done" (after the message is
+    # stored) or "error".
+    def _stream_text(self, model, contents):
+        chunks = []
+        usage_chunk = None
+        for chunk in self.backend.generate_stream(model=model, contents=contents):
+            # Usage metadata arrives on the final chunk
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage_chunk = chunk
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield {"event": "token", "data": {"text": chunk.text}}
+        return "".join(chunks).strip(), token_usage(usage_chunk)
+
+    def stream_cold_message(self, db, person_id):
+        yield {"event": "progress", "data": {"message": "Researching company"}}
+        r = self._cold_message_inputs(db, person_id, lambda message: None)
+
+        if r.get("status") == "failure":
+            yield stream_error(r, "Failed to generate cold message")
+            return
+
+        try:
+            yield {"event": "progress", "data": {"message": "Generating cold message"}}
+            message_prompt = self._cold_message_prompt(**r["data"])
+            cold_message, usage = yield from self._stream_text(COLD_MESSAGE_MODEL, message_prompt)
+
+            r = self._store_cold_message(db, person_id, cold_message_conversation(message_prompt, cold_message))
+            if r.get("status") == "failure":
+                yield stream_error(r, "Failed to generate cold message")
+                return
+        except Exception as e:
+            yield stream_error({"error": str(e)}, "Failed to generate cold message")
+            return
+
+        yield {"event": "done", "data": cold_message_result(cold_message, usage)}
 
-            cold_message = response.text.strip()
-            conversation = [
-                            {
-                                "role": "user",
-                                "parts": [{"text": message_prompt}]
-                            },
-                            {
-                                "role": "model",
-                                "parts": [{"text": cold_message}]
-                            }
-                        ]
+    def stream_follow_up(self, db, person_id: str, message: str):
+        yield {"event": "progress", "data": {"message": "Preparing conversation"}}
+        context = self._prepare_follow_up(db, person_id, message)
 
-            db.set_message(id=person_id, messages=conversation)
+        if context.get("status") == "failure":
+            yield stream_error(context, "Failed to get follow-up response")
+            return
 
+        try:
+            yield {"event": "progress", "data": {"message": "Generating follow-up response"}}
+            chat_response, usage = yield from self._stream_text("gemini-3-pro-preview", context["data"]["contents"])
+
+            r = self._store_follow_up(db, person_id, context, chat_response)
+            if r.get("status") == "failure":
+                yield stream_error(r, "Failed to get follow-up response")
+                return
+        except Exception as e:
+            yield stream_error({"error": str(e)}, "Failed to get follow-up response")
+            return
+
+        yield {"event": "done", "data": follow_up_result(context, chat_response, usage)}
+
+    def generate_cold_messages(self, db, job_id, overwrite=False, key_lock=None, max_concurrency=COLD_MESSAGE_CONCURRENCY, progress=None):
+        # People who already have a conversation are skipped unless overwrite
+        # is set, since replacing it loses the follow-ups and their summary.
+        # key_lock(person_id) is the task queue's per-person lock, held while
+        # the conversations are written.
+        progress = progress or (lambda message: None)
+        key_lock = key_lock or (lambda key: nullcontext())
+        try:
+            r = db.get_job_with_people(job_id)
+
+            if r.get("status") == "failure":
+                return r
+
+            job = r["data"]["job"]
+            people = r["data"]["people"]
+
+            if not people:
+                return {
+                    "error": "No people found for this job",
+                    "status": "failure"
+                }
+
+            skipped = set()
+            if not overwrite:
+                r = db.get_started_chat_ids([person["person_id"] for person in people])
+                if r.get("status") == "failure":
+                    return r
+                skipped = r["data"]
+
+            pending = [person for person in people if person["person_id"] not in skipped]
+            if not pending:
+                return {
+                    "data": {"messages": {}, "failed": {}, "skipped": sorted(skipped)},
+                    "status": "success",
+                    "message": "Everyone on this job already has a conversation"
+                }
+
+            progress("Researching company")
+            r = self.get_company_information(db, job["company_website"])
+
+            if r.get("status") == "failure":
+                return r
+
+            company_info = r["data"]
         except Exception as e:
             return {
                 "error": str(e),
                 "status": "failure",
-                "message": "Failed to generate cold message"
+                "message": "Failed to retrieve necessary data"
             }
 
+        conversations = {}
+        messages = {}
+        failed = {}
+        progress(f"Generated 0/{len(pending)} cold messages")
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {
+                pool.submit(self._write_cold_message, person, job, company_info): person["person_id"]
+                for person in pending
+            }
+            for future in as_completed(futures):
+                person_id = futures[future]
+                try:
+                    messages[person_id], conversations[person_id] = future.result()
+                except Exception as e:
+                    failed[person_id] = str(e)
+                progress(f"Generated {len(messages)}/{len(pending)} cold messages")
+
+        if not messages:
+            return {
+                "data": {"failed": failed, "skipped": sorted(skipped)},
+                "error": "Failed to generate any cold message",
+                "status": "failure"
+            }
+
+        # Locks are taken in id order, so two bulk runs cannot deadlock; a
+        # conversation started while the messages were generated is kept
+        with ExitStack() as locks:
+            for person_id in sorted(conversations):
+                locks.enter_context(key_lock(person_id))
+
+            if not overwrite:
+                r = db.get_started_chat_ids(list(conversations))
+                if r.get("status") == "failure":
+                    return r
+                for person_id in r["data"]:
+                    skipped.add(person_id)
+                    del conversations[person_id], messages[person_id]
+
+            r = db.set_messages_bulk(conversations)
+
+        if r.get("status") == "failure":
+            return r
+
         return {
+            "data": {
+                "messages": messages,
+                "failed": failed,
+                "skipped": sorted(skipped)
+            },
             "status": "success",
-            "message": "Cold message generated successfully"
+            "message": f"Generated {len(messages)} of {len(people)} cold messages"
+        }
+
+    def tailor_resume(self, job_description: str, resume_text: str, current_score: str, remarks: str, fields: list) -> dict:
+        # One string per template placeholder; the schema makes Gemini return
+        # exactly those keys
+        response = self.backend.generate(
+            model="gemini-3-pro-preview",
+            contents=prompts.render(
+                "resume_prompt",
+                current_resume_score=current_score,
+                remarks=remarks,
+                current_resume_text=resume_text,
+                job_description=job_description
+            ),
+            config={
+                "response_mime_type": "application/json",
+                "response_schema": {
+                    "type": "OBJECT",
+                    "properties": {field: {"type": "STRING"} for field in fields},
+                    "required": list(fields)
+                }
+            }
+        )
+        output = json.loads(response.text)
+        missing = [field for field in fields if not isinstance(output.get(field), str) or not output[field].strip()]
+        if missing:
+            raise ValueError(f"Resume output is missing: {', '.join(missing)}")
+        return {field: output[field] for field in fields}
+
+    def _summarize_turns(self, previous_summary: str, turns: list) -> str:
+        transcript = "\n\n".join(f"{turn['role']}: {message_text(turn)}" for turn in turns)
+        prompt = prompts.render(
+            "conversation_summary",
+            previous_summary=previous_summary,
+            transcript=transcript
+        )
+        response = self.backend.generate(
+            model="gemini-2.5-flash-lite",
+            contents=prompt,
+        )
+        return response.text.strip()
+
+    def _follow_up_context(self, db, person_id: str, new_turn: dict) -> dict:
+        # Older turns are replaced by a rolling summary stored in ChatSummaries;
+        # only the turns after it are read and sent verbatim.
+        r = db.get_chat_summary(person_id)
+        if r.get("status") == "failure":
+            return r
+        summary = r["data"]["summary"] if r["data"] else ""
+        covered_seq = r["data"]["covered_seq"] if r["data"] else None
+
+        r = db.get_message(id=person_id, after_seq=covered_seq, with_seq=True)
+        if r.get("status") == "failure":
+            return r
+        turns = r["data"]
+
+        if not turns and not summary:
+            return {
+                "error": "No existing conversation found. Please start a new chat first.",
+                "status": "failure"
+            }
+
+        summarized = False
+        if len(turns) > 2 * FOLLOW_UP_KEEP_TURNS or estimate_tokens(summary_turns(summary) + turns + [new_turn]) > FOLLOW_UP_TOKEN_BUDGET:
+            # Up to FOLLOW_UP_KEEP_TURNS stay verbatim, fewer when they alone
+            # overflow the budget, but always the latest exchange
+            keep = FOLLOW_UP_KEEP_TURNS
+            while keep > 2 and estimate_tokens(turns[-keep:] + [new_turn]) > FOLLOW_UP_TOKEN_BUDGET:
+                keep -= 2
+            if len(turns) > keep:
+                older, recent = turns[:-keep], turns[-keep:]
+                try:
+                    summary = self._summarize_turns(summary, older)
+                    db.set_chat_summary(person_id, summary, older[-1]["seq"])
+                    turns = recent
+                    summarized = True
+                except Exception:
+                    # Sending the turns verbatim still works; the budget trim below
+                    # keeps the request bounded until the next attempt succeeds
+                    logger.warning("conversation summary failed", exc_info=True, extra={"fields": {"person_id": person_id}})
+
+        turns = [{"role": turn["role"], "parts": turn["parts"]} for turn in turns]
+        # Hard cap: drop the oldest verbatim exchanges until the request fits,
+        # down to the latest one
+        while len(turns) > 2 and estimate_tokens(summary_turns(summary) + turns + [new_turn]) > FOLLOW_UP_TOKEN_BUDGET:
+            turns = turns[2:]
+
+        # A single turn can outgrow the budget on its own (the cold-message
+        # prompt carries the company research), so the longest are cut short
+        # rather than dropped
+        excess = sum(len(message_text(turn)) for turn in summary_turns(summary) + turns + [new_turn]) - FOLLOW_UP_TOKEN_BUDGET * 4
+        for i in sorted(range(len(turns)), key=lambda i: len(message_text(turns[i])), reverse=True):
+            if excess <= 0:
+                break
+            length = len(message_text(turns[i]))
+            max_chars = max(FOLLOW_UP_MIN_TURN_CHARS, length - excess - len(TRUNCATION_MARK))
+            if max_chars < length:
+                turns[i] = truncate_turn(turns[i], max_chars)
+                excess -= length - len(message_text(turns[i]))
+
+        contents = summary_turns(summary) + turns + [new_turn]
+        return {
+            "data": {
+                "contents": contents,
+                "summarized": summarized,
+                "estimated_prompt_tokens": estimate_tokens(contents)
+            },
+            "status": "success"
         }
 
-    def get_follow_up_response(self, db, prompt: list, person_id: str) -> dict:
+    def _prepare_follow_up(self, db, person_id: str, message: str) -> dict:
         try:
-            # prompt is ALREADY in Gemini format:
-            # [{ "role": "...", "parts": ["..."] }, ...]
+            return self._follow_up_context(db, person_id, follow_up_turn(message))
+        except Exception as e:
+            return generation_failure(e, "Failed to prepare follow-up context")
 
-            response = self.client.models.generate_content(
-                model="gemini-3-pro-preview",
-                contents=prompt
-            )
+    def _store_follow_up(self, db, person_id: str, context: dict, chat_response: str) -> dict:
+        # Store only the new user turn and the reply
+        return db.append_messages(id=person_id, messages=[context["data"]["contents"][-1], {
+            "role": "model",
+            "parts": [{"text": chat_response}]
+        }])
 
-            chat_response = response.text.strip()
+    def send_follow_up(self, db, person_id: str, message: str, progress=None) -> dict:
+        context = self._prepare_follow_up(db, person_id, message)
 
-            # Append model reply in Gemini format
-            prompt.append({
-                "role": "model",
-                "parts": [{"text": chat_response}]
-            })
+        if context.get("status") == "failure":
+            return context
 
-            # Store updated conversation
-            db.set_message(id=person_id, messages=prompt)
+        if progress:
+            progress("Generating follow-up response")
+        try:
+            response = self.backend.generate(
+                model="gemini-3-pro-preview",
+                contents=context["data"]["contents"]
+            )
+            chat_response = response.text.strip()
 
+            r = self._store_follow_up(db, person_id, context, chat_response)
+            if r.get("status") == "failure":
+                return r
         except Exception as e:
-            return {
-                "error": str(e),
-                "status": "failure",
-                "message": "Failed to get follow-up response"
-            }
+            return generation_failure(e, "Failed to get follow-up response")
+
+        return follow_up_result(context, chat_response, token_usage(response))
+
+    # Async counterparts for the ASGI routes (async_dashboard_page.py). Model
+    # calls await the backend's async client so an in-flight call holds no
+    # thread; database work, and the company research or summary call made on
+    # a cache miss, run in worker threads.
+    async def aget_profile_json(self, profile_text: str, db=None) -> dict:
+        if not isinstance(profile_text, str) or not profile_text.strip():
+            return profile_failure(ValueError("profile_text is required"))
+        cache_key = profile_cache_key(profile_text)
+        output = await asyncio.to_thread(self._cached_profile, cache_key, db)
+
+        if output is None:
+            try:
+                response = await self.backend.agenerate(**self._profile_request(profile_text))
+                output = json.loads(response.text)
+            except Exception as e:
+                return profile_failure(e)
+            await asyncio.to_thread(self._store_profile, cache_key, output, db)
 
         return {
-            "status": "success",
-            "message": "Follow-up response generated successfully"
+            "data": output,
+            "status": "success"
         }
 
-    
+    async def agenerate_cold_message(self, db, person_id, progress=None):
+        progress = progress or (lambda message: None)
+        r = await asyncio.to_thread(self._cold_message_inputs, db, person_id, progress)
+
+        if r.get("status") == "failure":
+            return r
+
+        try:
+            progress("Generating cold message")
+            cold_message, conversation = await self._awrite_cold_message(**r["data"])
+
+            r = await asyncio.to_thread(self._store_cold_message, db, person_id, conversation)
+            if r.get("status") == "failure":
+                return r
+        except Exception as e:
+            return generation_failure(e, "Failed to generate cold message")
+
+        return cold_message_result(cold_message)
+
+    async def _astream_text(self, model, contents, result):
+        # Async generators cannot return a value; the text and usage go in result
+        chunks = []
+        usage_chunk = None
+        async for chunk in self.backend.agenerate_stream(model=model, contents=contents):
+            if getattr(chunk, "usage_metadata", None) is not None:
+                usage_chunk = chunk
+            if chunk.text:
+                chunks.append(chunk.text)
+                yield {"event": "token", "data": {"text": chunk.text}}
+        result["text"] = "".join(chunks).strip()
+        result["usage"] = token_usage(usage_chunk)
+
+    async def astream_cold_message(self, db, person_id):
+        yield {"event": "progress", "data": {"message": "Researching company"}}
+        r = await asyncio.to_thread(self._cold_message_inputs, db, person_id, lambda message: None)
+
+        if r.get("status") == "failure":
+            yield stream_error(r, "Failed to generate cold message")
+            return
+
+        try:
+            yield {"event": "progress", "data": {"message": "Generating cold message"}}
+            message_prompt = self._cold_message_prompt(**r["data"])
+            result = {}
+            async for event in self._astream_text(COLD_MESSAGE_MODEL, message_prompt, result):
+                yield event
+            cold_message = result["text"]
+
+            r = await asyncio.to_thread(self._store_cold_message, db, person_id, cold_message_conversation(message_prompt, cold_message))
+            if r.get("status") == "failure":
+                yield stream_error(r, "Failed to generate cold message")
+                return
+        except Exception as e:
+            yield stream_error({"error": str(e)}, "Failed to generate cold message")
+            return
+
+        yield {"event": "done", "data": cold_message_result(cold_message, result["usage"])}
+
+    async def astream_follow_up(self, db, person_id: str, message: str):
+        yield {"event": "progress", "data": {"message": "Preparing conversation"}}
+        context = await asyncio.to_thread(self._prepare_follow_up, db, person_id, message)
+
+        if context.get("status") == "failure":
+            yield stream_error(context, "Failed to get follow-up response")
+            return
+
+        try:
+            yield {"event": "progress", "data": {"message": "Generating follow-up response"}}
+            result = {}
+            async for event in self._astream_text("gemini-3-pro-preview", context["data"]["contents"], result):
+                yield event
+            chat_response = result["text"]
+
+            r = await asyncio.to_thread(self._store_follow_up, db, person_id, context, chat_response)
+            if r.get("status") == "failure":
+                yield stream_error(r, "Failed to get follow-up response")
+                return
+        except Exception as e:
+            yield stream_error({"error": str(e)}, "Failed to get follow-up response")
+            return
+
+        yield {"event": "done", "data": follow_up_result(context, chat_response, result["usage"])}
+
+    async def asend_follow_up(self, db, person_id: str, message: str, progress=None) -> dict:
+        context = await asyncio.to_thread(self._prepare_follow_up, db, person_id, message)
+
+        if context.get("status") == "failure":
+            return context
+
+        if progress:
+            progress("Generating follow-up response")
+        try:
+            response = await self.backend.agenerate(
+                model="gemini-3-pro-preview",
+                contents=context["data"]["contents"]
+            )
+            chat_response = response.text.strip()
+
+            r = await asyncio.to_thread(self._store_follow_up, db, person_id, context, chat_response)
+            if r.get("status") == "failure":
+                return r
+        except Exception as e:
+            return generation_failure(e, "Failed to get follow-up response")
 
+        return follow_up_result(context, chat_response, token_usage(response))
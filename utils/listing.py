@@ -0,0 +1,125 @@
+from flask import Response, jsonify, stream_with_context
+from utils.database import JobInfo, PersonInfo
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def dumps(value):
+        return orjson.dumps(value, default=str)
+except ImportError:
+    def dumps(value):
+        return json.dumps(value, default=str, separators=(",", ":")).encode("utf-8")
+
+MAX_PAGE_SIZE = 500
+# Streamed rows are sent in writes of about this many bytes
+STREAM_CHUNK_BYTES = 64 * 1024
+STREAM_FORMATS = {"1": "json", "true": "json", "yes": "json", "json": "json", "ndjson": "ndjson"}
+STREAM_ERROR = {"error": "Failed to read rows", "status": "failure", "message": "The list ended early"}
+
+JOB_FIELDS = tuple(column.name for column in JobInfo.__table__.columns)
+PERSON_FIELDS = tuple(column.name for column in PersonInfo.__table__.columns)
+
+
+# Reads ?limit=&cursor=&fields=a,b&<filters> for the list endpoints. Raises
+# ValueError with a client-facing message on bad input.
+def parse_list_args(args, allowed_fields, filters=()):
+    options = {}
+
+    limit = args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError("limit must be a positive integer")
+        options["limit"] = min(int(limit), MAX_PAGE_SIZE)
+
+    if args.get('cursor'):
+        options["cursor"] = args.get('cursor')
+
+    if args.get('fields'):
+        fields = [field.strip() for field in args.get('fields').split(',') if field.strip()]
+        unknown = [field for field in fields if field not in allowed_fields]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        options["fields"] = fields
+
+    for name in filters:
+        if args.get(name):
+            options[name] = args.get(name)
+
+    return options
+
+
+def list_response(r, body=None):
+    response = jsonify(r if body is None else body)
+    if r.get("next_cursor"):
+        response.headers["X-Next-Cursor"] = r["next_cursor"]
+    return response
+
+
+# ?stream=true (or json) streams the usual JSON body, ?stream=ndjson one row
+# per line; None when the list should be built in one piece
+def stream_format(args):
+    return STREAM_FORMATS.get(args.get('stream', '').lower())
+
+
+# Serializes rows as they are read, so memory stays flat whatever the row
+# count. envelope holds the body's other top-level fields (None for a bare
+# array); NDJSON bodies are the rows alone.
+#
+# The 200 has gone out before a database error can happen, so a failed
+# stream says so in the body: NDJSON ends with a STREAM_ERROR line and
+# an envelope closes with STREAM_ERROR's fields in place of its own. A bare
+# array has nowhere to put it; the exception is re-raised, and the server
+# drops the connection before the final chunk, so the client sees a
+# truncated transfer rather than a short list.
+def stream_list_response(rows, format, envelope=None):
+    if format == "ndjson":
+        prefix, suffix = b"", b""
+    elif envelope is None:
+        prefix, suffix = b"[", b"]"
+    else:
+        # '{"data":[' rows '],' + the envelope's fields + '}'
+        prefix, suffix = b'{"data":[', b"]," + dumps(envelope)[1:]
+
+    def generate():
+        chunk = [prefix]
+        size = len(prefix)
+        first = True
+        try:
+            for row in rows:
+                item = dumps(row)
+                if format == "ndjson":
+                    item += b"\n"
+                elif not first:
+                    item = b"," + item
+                first = False
+                chunk.append(item)
+                size += len(item)
+                if size >= STREAM_CHUNK_BYTES:
+                    yield b"".join(chunk)
+                    chunk = []
+                    size = 0
+            chunk.append(suffix)
+            yield b"".join(chunk)
+        except Exception:
+            logger.exception("list stream failed")
+            if format == "ndjson":
+                chunk.append(dumps(STREAM_ERROR) + b"\n")
+            elif envelope is not None:
+                chunk.append(b"]," + dumps({**envelope, **STREAM_ERROR})[1:])
+            else:
+                raise
+            yield b"".join(chunk)
+        finally:
+            # Releases the rows' database connection when the client goes away
+            close = getattr(rows, "close", None)
+            if close is not None:
+                close()
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson" if format == "ndjson" else "application/json"
+    )
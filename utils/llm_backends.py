@@ -0,0 +1,247 @@
+from dotenv import load_dotenv
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from utils.telemetry import record_llm_call
+
+load_dotenv()
+
+
+# Model calls go through a backend so LLM can run against Gemini or, for local
+# runs and load tests, against FakeBackend. Responses only need the attributes
+# LLM reads from Gemini responses: .text and .usage_metadata. The a* variants
+# serve the async (ASGI) routes; agenerate_stream is an async iterator.
+# timeout (seconds) is set per model by utils/call_policy.py; an expired call
+# raises TimeoutError.
+class LLMBackend:
+    def generate(self, model, contents, config=None, timeout=None):
+        raise NotImplementedError
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        raise NotImplementedError
+
+    async def agenerate(self, model, contents, config=None, timeout=None):
+        # Fallback for backends without a native async client
+        return await asyncio.to_thread(self.generate, model, contents, config, timeout)
+
+    def agenerate_stream(self, model, contents, config=None, timeout=None):
+        raise NotImplementedError
+
+
+def with_timeout(config, timeout):
+    # google-genai takes a per-request timeout in milliseconds via http_options
+    if timeout is None:
+        return config
+    return {**(config or {}), "http_options": {"timeout": int(timeout * 1000)}}
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, api_key=None):
+        from google import genai
+
+        api_key = api_key or os.getenv("gemini_api_key")
+        if not api_key:
+            raise EnvironmentError("gemini_api_key not found in environment variables")
+        self.client = genai.Client(api_key=api_key)
+
+    def generate(self, model, contents, config=None, timeout=None):
+        return self.client.models.generate_content(model=model, contents=contents, config=with_timeout(config, timeout))
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        return self.client.models.generate_content_stream(model=model, contents=contents, config=with_timeout(config, timeout))
+
+    async def agenerate(self, model, contents, config=None, timeout=None):
+        return await self.client.aio.models.generate_content(model=model, contents=contents, config=with_timeout(config, timeout))
+
+    async def agenerate_stream(self, model, contents, config=None, timeout=None):
+        stream = await self.client.aio.models.generate_content_stream(model=model, contents=contents, config=with_timeout(config, timeout))
+        async for chunk in stream:
+            yield chunk
+
+
+# Wraps any backend to record per-model latency and token usage (see
+# utils/telemetry.py); LLM applies it to whichever backend it is given
+class InstrumentedBackend(LLMBackend):
+    def __init__(self, backend):
+        self.backend = backend
+
+    def generate(self, model, contents, config=None, timeout=None):
+        started = time.perf_counter()
+        try:
+            response = self.backend.generate(model=model, contents=contents, config=config, timeout=timeout)
+        except Exception as e:
+            record_llm_call(model, "generate", started, error=e)
+            raise
+        record_llm_call(model, "generate", started, usage=getattr(response, "usage_metadata", None))
+        return response
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        started = time.perf_counter()
+        usage = None
+        try:
+            for chunk in self.backend.generate_stream(model=model, contents=contents, config=config, timeout=timeout):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+        except Exception as e:
+            record_llm_call(model, "stream", started, error=e)
+            raise
+        record_llm_call(model, "stream", started, usage=usage)
+
+    async def agenerate(self, model, contents, config=None, timeout=None):
+        started = time.perf_counter()
+        try:
+            response = await self.backend.agenerate(model=model, contents=contents, config=config, timeout=timeout)
+        except Exception as e:
+            record_llm_call(model, "generate", started, error=e)
+            raise
+        record_llm_call(model, "generate", started, usage=getattr(response, "usage_metadata", None))
+        return response
+
+    async def agenerate_stream(self, model, contents, config=None, timeout=None):
+        started = time.perf_counter()
+        usage = None
+        try:
+            async for chunk in self.backend.agenerate_stream(model=model, contents=contents, config=config, timeout=timeout):
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                yield chunk
+        except Exception as e:
+            record_llm_call(model, "stream", started, error=e)
+            raise
+        record_llm_call(model, "stream", started, usage=usage)
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+# Raised for injected failures; .code mirrors the HTTP status Gemini would send
+class FakeBackendError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+# Deterministic offline stand-in: the same contents always produce the same
+# output. JSON-mode calls (profile extraction) get a profile matching
+# prompts/profile_extractor.txt, calls with a response_schema an object with
+# its properties; everything else gets plain text.
+class FakeBackend(LLMBackend):
+    def __init__(self, latency_ms=None, jitter_ms=None, failure_rate=None, rate_limit_rate=None, seed=None):
+        self.latency_ms = float(os.getenv("FAKE_LLM_LATENCY_MS", 0) if latency_ms is None else latency_ms)
+        self.jitter_ms = float(os.getenv("FAKE_LLM_JITTER_MS", 0) if jitter_ms is None else jitter_ms)
+        self.failure_rate = float(os.getenv("FAKE_LLM_FAILURE_RATE", 0) if failure_rate is None else failure_rate)
+        self.rate_limit_rate = float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", 0) if rate_limit_rate is None else rate_limit_rate)
+        self._random = random.Random(int(os.getenv("FAKE_LLM_SEED", 0)) if seed is None else seed)
+        self._random_lock = threading.Lock()
+
+    def _roll(self):
+        with self._random_lock:
+            return self._random.random(), self._random.uniform(-1, 1)
+
+    def _roll_outcome(self):
+        roll, jitter = self._roll()
+        delay = max(0.0, self.latency_ms + jitter * self.jitter_ms) / 1000
+        if roll < self.rate_limit_rate:
+            return delay, FakeBackendError(429, "Fake backend: resource exhausted")
+        if roll < self.rate_limit_rate + self.failure_rate:
+            return delay, FakeBackendError(503, "Fake backend: service unavailable")
+        return delay, None
+
+    def _outcome(self, timeout=None):
+        delay, error = self._roll_outcome()
+        # A call slower than its timeout gives up after the timeout, like the
+        # real client would
+        if timeout is not None and delay > timeout:
+            return timeout, TimeoutError(f"Fake backend: no response within {timeout}s")
+        return delay, error
+
+    def _simulate_call(self, timeout=None):
+        delay, error = self._outcome(timeout)
+        if delay:
+            time.sleep(delay)
+        if error:
+            raise error
+
+    async def _asimulate_call(self, timeout=None):
+        delay, error = self._outcome(timeout)
+        if delay:
+            await asyncio.sleep(delay)
+        if error:
+            raise error
+
+    def _text(self, model, contents, config):
+        digest = hashlib.sha256(json.dumps(contents, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        schema = (config or {}).get("response_schema")
+        if schema:
+            # Structured calls (resume tailoring) get a value for every property
+            return json.dumps({name: f"fake {name} {digest[:8]}" for name in schema.get("properties", {})})
+        if (config or {}).get("response_mime_type") == "application/json":
+            return json.dumps({
+                "name": f"fake person {digest[:8]}",
+                "headline": "software engineer",
+                "about": "builds reliable backend systems.",
+                "current_company": "Example Corp",
+                "current_job_title": "senior software engineer",
+                "duration_in_current_company": "2 years",
+                "currect_company_location": "bengaluru, india",
+                "previous_experiences": [{"Sample Labs": "software engineer"}],
+                "education": [{"Example University": "b.tech computer science"}],
+                "additional_info": [
+                    "works on the backend platform team at Example Corp",
+                    "shares an interest in distributed systems"
+                ]
+            })
+        words = " ".join(f"word{digest[i % len(digest)]}" for i in range(70))
+        return f"Fake {model} response {digest[:12]}. {words}"
+
+    def _usage(self, contents, text):
+        prompt_chars = len(json.dumps(contents, default=str))
+        return FakeUsage(prompt_chars // 4, len(text) // 4)
+
+    def generate(self, model, contents, config=None, timeout=None):
+        self._simulate_call(timeout)
+        text = self._text(model, contents, config)
+        return FakeResponse(text, self._usage(contents, text))
+
+    def generate_stream(self, model, contents, config=None, timeout=None):
+        self._simulate_call(timeout)
+        text = self._text(model, contents, config)
+        words = text.split(" ")
+        for i in range(0, len(words), 8):
+            yield FakeResponse(" ".join(words[i:i + 8]) + " ")
+        yield FakeResponse("", self._usage(contents, text))
+
+    async def agenerate(self, model, contents, config=None, timeout=None):
+        await self._asimulate_call(timeout)
+        text = self._text(model, contents, config)
+        return FakeResponse(text, self._usage(contents, text))
+
+    async def agenerate_stream(self, model, contents, config=None, timeout=None):
+        await self._asimulate_call(timeout)
+        text = self._text(model, contents, config)
+        words = text.split(" ")
+        for i in range(0, len(words), 8):
+            yield FakeResponse(" ".join(words[i:i + 8]) + " ")
+        yield FakeResponse("", self._usage(contents, text))
+
+
+def backend_from_env():
+    name = os.getenv("LLM_BACKEND", "gemini").lower()
+    if name == "fake":
+        return FakeBackend()
+    if name == "gemini":
+        return GeminiBackend()
+    raise ValueError(f"Unknown LLM_BACKEND '{name}'")
@@ -0,0 +1,73 @@
+from pathlib import Path
+from string import Template
+import hashlib
+import os
+import threading
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+# Re-read a template when its file changes on disk; meant for local development
+PROMPTS_HOT_RELOAD = os.getenv("PROMPTS_HOT_RELOAD", "false").lower() in ("1", "true", "yes")
+
+
+class PromptTemplate:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.mtime = path.stat().st_mtime
+
+        text = path.read_text(encoding="utf-8")
+        self.template = Template(text)
+        if not self.template.is_valid():
+            raise ValueError(f"Prompt '{name}' contains an invalid $placeholder")
+        self.placeholders = frozenset(self.template.get_identifiers())
+        # Changes whenever the template text does; used to key cached model output
+        self.version = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+    def render(self, **values):
+        missing = self.placeholders - values.keys()
+        if missing:
+            raise ValueError(f"Prompt '{self.name}' is missing values for: {', '.join(sorted(missing))}")
+        return self.template.substitute(values)
+
+
+class PromptRegistry:
+    def __init__(self, directory=PROMPTS_DIR, hot_reload=PROMPTS_HOT_RELOAD):
+        self.directory = Path(directory)
+        self.hot_reload = hot_reload
+        self._lock = threading.Lock()
+        self._prompts = {
+            path.stem: PromptTemplate(path.stem, path)
+            for path in sorted(self.directory.glob("*.txt"))
+        }
+
+    def get(self, name):
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            raise KeyError(f"Unknown prompt '{name}'")
+        if self.hot_reload:
+            try:
+                changed = prompt.path.stat().st_mtime != prompt.mtime
+            except OSError:
+                changed = False
+            if changed:
+                with self._lock:
+                    prompt = self._prompts[name] = PromptTemplate(name, prompt.path)
+        return prompt
+
+    def render(self, name, **values):
+        return self.get(name).render(**values)
+
+    def version(self, name):
+        return self.get(name).version
+
+    # Called at startup by the code that uses a prompt, so a renamed file or a
+    # dropped placeholder fails the boot instead of a request
+    def require(self, name, *placeholders):
+        prompt = self.get(name)
+        if prompt.placeholders != set(placeholders):
+            raise ValueError(
+                f"Prompt '{name}' expects {sorted(prompt.placeholders)}, code supplies {sorted(placeholders)}"
+            )
+
+
+prompts = PromptRegistry()
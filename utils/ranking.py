@@ -0,0 +1,194 @@
+from collections import Counter
+from dotenv import load_dotenv
+from scipy import sparse
+from utils.cache import TTLCache
+from utils.search import MAX_TERM_LENGTH, is_term, term_counts, words
+from utils.task_queue import KeyedLocks
+import math
+import numpy as np
+import os
+
+load_dotenv()
+
+# The profile fields a contact is matched on; the JSON ones are flattened to
+# their text
+CONTACT_RANK_FIELDS = ("headline", "about", "current_job_title", "previous_experiences", "additional_info")
+CONTACT_DISPLAY_FIELDS = ("person_id", "name", "headline", "current_company", "current_job_title", "status")
+# Term matrices are kept for the RANKING_CACHE_JOBS most recently ranked jobs
+RANKING_CACHE_JOBS = int(os.getenv("RANKING_CACHE_JOBS", 16))
+RANKING_CACHE_TTL = int(os.getenv("RANKING_CACHE_TTL", 3600))
+MATCHED_TERMS = 5
+
+
+def profile_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(f"{key} {profile_text(item)}" for key, item in value.items())
+    if isinstance(value, list):
+        return " ".join(profile_text(item) for item in value)
+    return "" if value is None else str(value)
+
+
+# A job's contacts as a sparse (people x terms) matrix of raw term counts, and
+# the same rows TF-IDF weighted and L2 normalised for scoring
+class ContactVectors:
+    def __init__(self, version, vocabulary, terms, person_ids, people, counts):
+        self.version = version
+        self.vocabulary = vocabulary
+        self.terms = terms
+        self.person_ids = person_ids
+        self.people = people
+        self.counts = counts
+        # Sublinear term frequency, smoothed idf over this job's contacts
+        tf = counts.copy()
+        np.log(tf.data, out=tf.data)
+        tf.data += 1
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self.idf = (np.log((1 + counts.shape[0]) / (1 + df)) + 1).astype(np.float32)
+        weights = tf @ sparse.diags(self.idf)
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        self.weights = sparse.diags(1 / norms) @ weights
+
+
+class ContactRanker:
+    def __init__(self, db, max_jobs=RANKING_CACHE_JOBS, ttl=RANKING_CACHE_TTL):
+        self.db = db
+        self._vectors = TTLCache(maxsize=max_jobs, ttl=ttl)
+        self._locks = KeyedLocks()
+
+    def _vectors_for(self, job_id):
+        # Any write to a job's people bumps "people:<job_id>", so a matching
+        # version means the cached matrix is current. On a mismatch only new
+        # contacts are tokenized: profiles are never edited in place, so a
+        # person_id's row stays valid for as long as the person exists.
+        versions = self.db.get_cache_versions([f"people:{job_id}"])
+        if versions.get("status") == "failure":
+            raise RuntimeError(versions.get("error"))
+        version = versions["data"].get(f"people:{job_id}")
+
+        cached = self._vectors.get(job_id)
+        if cached is not None and cached.version == version:
+            return cached
+
+        with self._locks.hold(job_id):
+            cached = self._vectors.get(job_id)
+            if cached is not None and cached.version == version:
+                return cached
+
+            # Statuses change in place, so they are read for everyone; the
+            # rest of a profile only for contacts not seen before
+            r = self.db.get_all_people(job_id, fields=["person_id", "status"])
+            if r.get("status") == "failure":
+                raise RuntimeError(r.get("error"))
+            statuses = {person["person_id"]: person["status"] for person in r["data"]}
+
+            vocabulary = dict(cached.vocabulary) if cached else {}
+            known = {person_id: row for row, person_id in enumerate(cached.person_ids)} if cached else {}
+            new_ids = [person_id for person_id in statuses if person_id not in known]
+
+            profiles = {}
+            if new_ids:
+                r = self.db.get_people_by_ids(new_ids, fields=list(dict.fromkeys(CONTACT_DISPLAY_FIELDS + CONTACT_RANK_FIELDS)))
+                if r.get("status") == "failure":
+                    raise RuntimeError(r.get("error"))
+                profiles = {profile["person_id"]: profile for profile in r["data"]}
+            # Anyone deleted between the two reads is left out
+            new_ids = [person_id for person_id in new_ids if person_id in profiles]
+            person_ids = [person_id for person_id in statuses if person_id in known or person_id in profiles]
+
+            people = []
+            for person_id in person_ids:
+                person = cached.people[known[person_id]] if person_id in known else profiles[person_id]
+                people.append({**{field: person[field] for field in CONTACT_DISPLAY_FIELDS}, "status": statuses[person_id]})
+
+            # Tokens are counted per profile in C, then each distinct token is
+            # checked and given a column once for the whole batch (-1 when
+            # it is not a term). New terms get the next column; the vocabulary
+            # keeps insertion order, so it doubles as the column -> term list.
+            token_counts = [
+                Counter(words(" ".join(profile_text(profiles[person_id][field]) for field in CONTACT_RANK_FIELDS)))
+                for person_id in new_ids
+            ]
+            columns = {}
+            for counts in token_counts:
+                for token in counts.keys() - columns.keys():
+                    columns[token] = vocabulary.setdefault(token[:MAX_TERM_LENGTH], len(vocabulary)) if is_term(token) else -1
+            indices = np.array([columns[token] for counts in token_counts for token in counts], dtype=np.int32)
+            data = np.array([count for counts in token_counts for count in counts.values()], dtype=np.float32)
+            rows = np.repeat(np.arange(len(new_ids)), [len(counts) for counts in token_counts])
+            terms = list(vocabulary)
+
+            kept = indices >= 0
+            new_counts = sparse.csr_matrix(
+                (data[kept], (rows[kept], indices[kept])),
+                shape=(len(new_ids), len(terms))
+            )
+            if cached:
+                # The cached rows widened to the grown vocabulary, then one
+                # row gather keeps the current contacts in person_id order
+                old = cached.counts
+                old_counts = sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], len(terms)))
+                new_rows = {person_id: old.shape[0] + row for row, person_id in enumerate(new_ids)}
+                order = [known[person_id] if person_id in known else new_rows[person_id] for person_id in person_ids]
+                counts = sparse.vstack([old_counts, new_counts], format="csr")[order]
+            else:
+                counts = new_counts
+
+            vectors = ContactVectors(version, vocabulary, terms, person_ids, people, counts)
+            self._vectors.set(job_id, vectors)
+            return vectors
+
+    def rank(self, job_id, limit=None, cursor=None, status=None):
+        try:
+            job = self.db.get_job_by_id(job_id)
+            if job.get("status") == "failure":
+                return job
+
+            vectors = self._vectors_for(job_id)
+
+            # The job description in the contacts' term space; terms no
+            # contact uses cannot change the order, so they are left out
+            query = np.zeros(len(vectors.terms), dtype=np.float32)
+            for term, count in term_counts(job["data"]["job_description"]).items():
+                column = vectors.vocabulary.get(term)
+                if column is not None:
+                    query[column] = (1 + math.log(count)) * vectors.idf[column]
+            norm = np.linalg.norm(query)
+            if norm:
+                query /= norm
+
+            # Cosine similarity of every contact in one sparse mat-vec
+            scores = vectors.weights @ query
+            rows = np.arange(len(vectors.person_ids))
+            if status:
+                rows = rows[np.array([person["status"] == status for person in vectors.people], dtype=bool)]
+            # Stable, so equal scores keep the contacts' creation order
+            rows = rows[np.argsort(-scores[rows], kind="stable")]
+
+            offset = int(cursor or 0)
+            page = rows[offset:offset + limit] if limit else rows[offset:]
+            ranked = []
+            for row in page:
+                contributions = vectors.weights[row].multiply(query).tocoo()
+                top = np.argsort(-contributions.data, kind="stable")[:MATCHED_TERMS]
+                ranked.append({
+                    **vectors.people[row],
+                    "score": round(float(scores[row]), 4),
+                    "matched_terms": [vectors.terms[contributions.col[i]] for i in top if contributions.data[i] > 0]
+                })
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to rank people"
+            }
+
+        next_offset = offset + len(ranked)
+        return {
+            "data": ranked,
+            "next_cursor": str(next_offset) if next_offset < len(rows) and ranked else None,
+            "status": "success",
+            "message": f"Ranked {len(rows)} people"
+        }
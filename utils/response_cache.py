@@ -0,0 +1,54 @@
+from flask import current_app, make_response, request
+from utils.cache import TTLCache, CacheStats
+import hashlib
+import os
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1024))
+# Stale entries are never served (a write changes the version stamp, and with
+# it the key); the TTL only bounds how long unused entries hold memory
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 3600))
+
+
+# Read-through cache for GET routes whose output depends on a few version
+# scopes ("jobs", "job:<job_id>", "people:<job_id>", "chat:<person_id>").
+# The Database rewrites a scope's stamp in the same transaction as each write
+# to it, so a request costs one primary-key lookup when nothing changed, and
+# the ETag, derived from the stamps, is the same on every worker process.
+class ResponseCache:
+    def __init__(self, db, maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL):
+        self.db = db
+        self._responses = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.stats = CacheStats("hits", "misses", "not_modified")
+
+    # build() produces the route's normal return value; only 200s are cached
+    def respond(self, scopes, build):
+        r = self.db.get_cache_versions(scopes)
+        if r.get("status") == "failure":
+            return build()
+
+        key = (request.full_path, tuple(r["data"].get(scope, "") for scope in scopes))
+        etag = hashlib.sha256(repr(key).encode("utf-8")).hexdigest()[:32]
+
+        if request.if_none_match.contains(etag):
+            self.stats.record("not_modified")
+            response = make_response("", 304)
+        else:
+            cached = self._responses.get(key)
+            if cached is not None:
+                self.stats.record("hits")
+                body, status, headers = cached
+                response = current_app.response_class(body, status=status, headers=headers)
+            else:
+                self.stats.record("misses")
+                response = make_response(build())
+                # Streamed bodies are neither held in memory nor given an
+                # ETag: the headers go out before the body is generated, so a
+                # stream that failed partway would later be confirmed by a 304
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                self._responses.set(key, (response.get_data(), response.status_code, list(response.headers.items())))
+
+        response.set_etag(etag)
+        # Let browsers keep the body but revalidate it on every poll
+        response.headers["Cache-Control"] = "no-cache"
+        return response
@@ -0,0 +1,267 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from docxtpl import DocxTemplate
+from dotenv import load_dotenv
+from pathlib import Path
+from utils.prompts import prompts
+from utils.telemetry import RESUME_RENDER_SECONDS
+import hashlib
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+load_dotenv()
+
+# The resume being tailored: a docxtpl template with one {{ placeholder }} per
+# key of the resume prompt's output, the plain text the prompt rewrites and
+# its current ATS score
+RESUME_TEMPLATE_PATH = os.getenv("RESUME_TEMPLATE_PATH", "templates/resume_template.docx")
+RESUME_TEXT_PATH = os.getenv("RESUME_TEXT_PATH", "templates/resume.txt")
+RESUME_ATS_SCORE = os.getenv("RESUME_ATS_SCORE", "unknown")
+# Rendered files, named by cache key, so every worker serves the same outputs
+RESUME_OUTPUT_DIR = os.getenv("RESUME_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "job-ref-sys-resumes"))
+# Rendering and PDF conversion are CPU-bound and run in their own processes;
+# a batch runs up to RESUME_BATCH_CONCURRENCY model calls at once
+RESUME_RENDER_WORKERS = int(os.getenv("RESUME_RENDER_WORKERS", 2))
+RESUME_BATCH_CONCURRENCY = int(os.getenv("RESUME_BATCH_CONCURRENCY", 4))
+PDF_CONVERSION_TIMEOUT = int(os.getenv("PDF_CONVERSION_TIMEOUT", 120))
+
+RESUME_FORMATS = ("docx", "pdf")
+
+
+def resume_cache_key(resume_version: str, job_id: str, remarks: str) -> str:
+    key = f"{resume_version}\n{job_id}\n{remarks.strip()}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+# Render worker state: the template bytes are read once per process, so each
+# render only parses them from memory
+_template_bytes = None
+
+
+def _init_render_worker(template_path):
+    global _template_bytes
+    _template_bytes = Path(template_path).read_bytes()
+
+
+def convert_to_pdf(docx_path, pdf_path):
+    # docx2pdf drives Word, so it only works on Windows and macOS; elsewhere
+    # (our containers) LibreOffice does the conversion
+    if sys.platform in ("win32", "darwin"):
+        from docx2pdf import convert
+        convert(docx_path, pdf_path)
+        return
+    soffice = shutil.which("soffice") or shutil.which("libreoffice")
+    if soffice is None:
+        raise RuntimeError("PDF conversion needs Word (docx2pdf) or LibreOffice")
+    with tempfile.TemporaryDirectory() as outdir:
+        # A profile per call: concurrent soffice processes cannot share one
+        profile = Path(outdir, "profile").as_uri()
+        subprocess.run(
+            [soffice, f"-env:UserInstallation={profile}", "--headless", "--convert-to", "pdf", "--outdir", outdir, docx_path],
+            check=True, capture_output=True, timeout=PDF_CONVERSION_TIMEOUT
+        )
+        os.replace(os.path.join(outdir, Path(docx_path).stem + ".pdf"), pdf_path)
+
+
+def render_resume(fields, docx_path, pdf_path):
+    # Runs in a render worker. Files are written under a temporary name and
+    # renamed, so a half-written file is never served.
+    template = DocxTemplate(io.BytesIO(_template_bytes))
+    template.render(fields, autoescape=True)
+    partial_docx = f"{docx_path}.{os.getpid()}.partial"
+    template.save(partial_docx)
+    os.replace(partial_docx, docx_path)
+
+    try:
+        partial_pdf = f"{pdf_path}.{os.getpid()}.partial"
+        convert_to_pdf(docx_path, partial_pdf)
+        os.replace(partial_pdf, pdf_path)
+    except Exception as e:
+        return {"pdf_error": str(e)}
+    return {}
+
+
+class ResumeRenderer:
+    def __init__(self, template_path=RESUME_TEMPLATE_PATH, output_dir=RESUME_OUTPUT_DIR, workers=RESUME_RENDER_WORKERS):
+        self.template_path = template_path
+        self.output_dir = output_dir
+        self.workers = workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def path(self, key, format):
+        return os.path.join(self.output_dir, f"{key}.{format}")
+
+    def rendered(self, key):
+        return os.path.exists(self.path(key, "docx"))
+
+    def _executor(self):
+        # Started on first use; spawn keeps the workers clear of the locks and
+        # connections held by this process's threads
+        with self._pool_lock:
+            if self._pool is None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                self._pool = ProcessPoolExecutor(
+                    max_workers=max(1, self.workers),
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_render_worker,
+                    initargs=(self.template_path,)
+                )
+            return self._pool
+
+    def submit(self, key, fields):
+        # Returns a future of {"pdf_error": ...} or {}; outputs already on disk
+        # are not rendered again
+        if self.rendered(key):
+            future = Future()
+            future.set_result({"cached": True})
+            return future
+
+        started = time.perf_counter()
+        future = self._executor().submit(render_resume, fields, self.path(key, "docx"), self.path(key, "pdf"))
+
+        def observe(future):
+            failed = future.exception() is not None or "pdf_error" in future.result()
+            RESUME_RENDER_SECONDS.observe(time.perf_counter() - started, outcome="failure" if failed else "success")
+
+        future.add_done_callback(observe)
+        return future
+
+
+class ResumeTailor:
+    def __init__(self, llm, renderer=None, template_path=RESUME_TEMPLATE_PATH, text_path=RESUME_TEXT_PATH, current_score=RESUME_ATS_SCORE):
+        self.llm = llm
+        self.renderer = renderer or ResumeRenderer(template_path=template_path)
+        self.current_score = current_score
+        self.error = None
+        try:
+            # Loaded once: the placeholders decide the fields asked of the model
+            template_bytes = Path(template_path).read_bytes()
+            self.fields = sorted(DocxTemplate(io.BytesIO(template_bytes)).get_undeclared_template_variables())
+            self.resume_text = Path(text_path).read_text(encoding="utf-8")
+        except Exception as e:
+            # The rest of the app works without a resume; the routes report it
+            self.error = f"Resume template or text unavailable: {e}"
+            return
+        # A new template, resume text, score or prompt invalidates every output
+        self.version = hashlib.sha256(b"\n".join([
+            template_bytes,
+            self.resume_text.encode("utf-8"),
+            current_score.encode("utf-8"),
+            prompts.version("resume_prompt").encode("utf-8")
+        ])).hexdigest()[:32]
+
+    def _unavailable(self):
+        return {
+            "error": self.error,
+            "status": "failure",
+            "message": "Resume tailoring is not configured"
+        }
+
+    def _fields(self, db, job_id, remarks):
+        # Returns (cache_key, fields); fields is None when the files already exist
+        key = resume_cache_key(self.version, job_id, remarks)
+        if self.renderer.rendered(key):
+            return key, None
+
+        r = db.get_tailored_resume(key)
+        if r.get("status") == "success":
+            return key, r["data"]
+
+        job = db.get_job_by_id(job_id)
+        if job.get("status") == "failure":
+            raise LookupError(job.get("error"))
+
+        fields = self.llm.tailor_resume(
+            job_description=job["data"]["job_description"],
+            resume_text=self.resume_text,
+            current_score=self.current_score,
+            remarks=remarks,
+            fields=self.fields
+        )
+        # A failed write only costs a future model call, so it is not fatal
+        db.set_tailored_resume(key, job_id, self.version, remarks, fields)
+        return key, fields
+
+    def _resume(self, job_id, key, rendered):
+        return {
+            "job_id": job_id,
+            "resume_id": key,
+            "docx": f"/resumes/{key}.docx",
+            "pdf": f"/resumes/{key}.pdf" if os.path.exists(self.renderer.path(key, "pdf")) else None,
+            "pdf_error": rendered.get("pdf_error"),
+            "cached": rendered.get("cached", False)
+        }
+
+    def tailor(self, db, job_id, remarks="", progress=None):
+        if self.error:
+            return self._unavailable()
+        progress = progress or (lambda message: None)
+        try:
+            progress("Tailoring resume")
+            key, fields = self._fields(db, job_id, remarks)
+            progress("Rendering resume")
+            rendered = self.renderer.submit(key, fields).result()
+        except Exception as e:
+            return {
+                "error": str(e),
+                "status": "failure",
+                "message": "Failed to tailor resume"
+            }
+
+        return {
+            "data": self._resume(job_id, key, rendered),
+            "status": "success",
+            "message": "Resume tailored successfully"
+        }
+
+    def tailor_batch(self, db, job_ids, remarks="", max_concurrency=RESUME_BATCH_CONCURRENCY, progress=None):
+        # Model calls run on a thread pool; each one's render is queued on the
+        # process pool as soon as it returns, so rendering overlaps the calls
+        # still in flight
+        if self.error:
+            return self._unavailable()
+        progress = progress or (lambda message: None)
+        renders = {}
+        resumes = {}
+        failed = {}
+        progress(f"Tailored 0/{len(job_ids)} resumes")
+
+        with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+            futures = {pool.submit(self._fields, db, job_id, remarks): job_id for job_id in job_ids}
+            for future in as_completed(futures):
+                job_id = futures[future]
+                try:
+                    key, fields = future.result()
+                    renders[job_id] = (key, self.renderer.submit(key, fields))
+                except Exception as e:
+                    failed[job_id] = str(e)
+                progress(f"Tailored {len(renders)}/{len(job_ids)} resumes")
+
+        for job_id, (key, future) in renders.items():
+            try:
+                resumes[job_id] = self._resume(job_id, key, future.result())
+            except Exception as e:
+                failed[job_id] = str(e)
+
+        if not resumes:
+            return {
+                "data": {"failed": failed},
+                "error": "Failed to tailor any resume",
+                "status": "failure"
+            }
+
+        return {
+            "data": {
+                "resumes": resumes,
+                "failed": failed
+            },
+            "status": "success",
+            "message": f"Tailored {len(resumes)} of {len(job_ids)} resumes"
+        }
@@ -0,0 +1,94 @@
+from collections import Counter
+import math
+import re
+
+# Documents in the search index and the fields they are built from, with the
+# weight a match in each field carries
+JOB_SEARCH_FIELDS = (("job_title", 3), ("company_name", 3), ("job_description", 1))
+PERSON_SEARCH_FIELDS = (("name", 3), ("headline", 2), ("current_company", 2))
+
+MAX_TERM_LENGTH = 64
+SNIPPET_LENGTH = 160
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+# For ASCII text TOKEN_PATTERN's matches are the runs left after blanking
+# every other character, which str.translate and str.split find much faster
+ASCII_SEPARATORS = str.maketrans({chr(c): " " for c in range(128) if not chr(c).isalnum()})
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have i in is it its of on or our so that the their this to was we were
+will with you your
+""".split())
+
+
+def is_term(token):
+    return (len(token) > 1 or token.isdigit()) and token not in STOPWORDS
+
+
+def words(text):
+    text = (text or "").lower()
+    if text.isascii():
+        return text.translate(ASCII_SEPARATORS).split()
+    return TOKEN_PATTERN.findall(text)
+
+
+def tokenize(text):
+    # Lowercased words and numbers, without stopwords and single letters
+    return [token[:MAX_TERM_LENGTH] for token in words(text) if is_term(token)]
+
+
+def term_counts(text):
+    # The terms of tokenize, counted; the filtering runs once per distinct
+    # token rather than once per occurrence
+    counts = {}
+    for token, count in Counter(words(text)).items():
+        if is_term(token):
+            token = token[:MAX_TERM_LENGTH]
+            counts[token] = counts.get(token, 0) + count
+    return counts
+
+
+def term_weights(fields):
+    # fields is [(text, field weight)]; a term's weight grows with the log of
+    # its weighted count so a long description cannot drown out a title match
+    counts = Counter()
+    for text, field_weight in fields:
+        for term, count in term_counts(text).items():
+            counts[term] += count * field_weight
+    return {term: 1 + math.log(count) for term, count in counts.items()}
+
+
+def message_text(parts):
+    return "".join(part if isinstance(part, str) else part.get("text", "") for part in parts or [])
+
+
+# Each document is (doc_type, doc_id, scope_id, {term: weight}); scope_id is
+# the job of a job or person and the conversation of a chat turn
+def job_document(job):
+    return ("job", job["job_id"], job["job_id"],
+            term_weights((job.get(field), weight) for field, weight in JOB_SEARCH_FIELDS))
+
+
+def person_document(person):
+    return ("person", person["person_id"], person["job_id"],
+            term_weights((person.get(field), weight) for field, weight in PERSON_SEARCH_FIELDS))
+
+
+# Every conversation opens with the generated cold-message prompt (template,
+# background, company research), the same words in every chat; only the
+# model's replies and the user's own follow-ups are worth indexing
+def is_searchable_message(message):
+    return not (message["seq"] == 0 and message["role"] == "user")
+
+
+def message_document(message):
+    return ("chat", f"{message['chat_id']}:{message['seq']}", message["chat_id"],
+            term_weights([(message_text(message["parts"]), 1)]))
+
+
+def snippet(text, terms, length=SNIPPET_LENGTH):
+    # The stretch of text around the first query term it contains
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in terms if term in lowered]
+    start = max(0, min(positions) - length // 4) if positions else 0
+    excerpt = text[start:start + length].strip()
+    return ("..." if start else "") + excerpt + ("..." if start + length < len(text) else "")
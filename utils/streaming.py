@@ -0,0 +1,35 @@
+from contextlib import nullcontext
+from flask import Response, stream_with_context
+import json
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop reverse proxies from buffering the stream
+    "X-Accel-Buffering": "no"
+}
+
+
+# Server-Sent Events: one "event:"/"data:" block per item from events, which
+# yields {"event": name, "data": json-serializable}
+def sse_event(event):
+    return f"event: {event['event']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+# lock, a context manager, is held while the events are produced rather than
+# while the response is set up
+def sse_response(events, lock=None):
+    def generate():
+        with lock or nullcontext():
+            for event in events:
+                yield sse_event(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+def wants_stream(args):
+    return args.get('stream', 'false').lower() in ('1', 'true', 'yes')
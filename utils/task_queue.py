@@ -0,0 +1,288 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone
+from utils.telemetry import TASK_SECONDS
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+import ulid
+
+logger = logging.getLogger(__name__)
+
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", 8))
+# A queued or running task not updated for this long belongs to a process that
+# stopped (a restart or a scaled-in instance) and is marked failed at startup
+TASK_STALE_SECONDS = int(os.getenv("TASK_STALE_SECONDS", 3600))
+INTERRUPTED_TASK_ERROR = "Interrupted by a restart"
+# Seconds between a waiting coroutine's attempts at a key lock, doubling
+LOCK_POLL_MIN = 0.01
+LOCK_POLL_MAX = 0.25
+
+
+# One lock per key, kept only while someone holds or waits for it, so keys
+# seen once (every person, job or website) do not pile up for the life of the
+# process. Threads and coroutines share the same locks, so a bulk task in a
+# worker thread and an async stream for the same person exclude each other.
+class KeyedLocks:
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def _checkout(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        return entry
+
+    def _checkin(self, key, entry):
+        with self._guard:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    @contextmanager
+    def hold(self, key):
+        entry = self._checkout(key)
+        try:
+            with entry[0]:
+                yield
+        finally:
+            self._checkin(key, entry)
+
+    # A coroutine polls the lock instead of blocking on it, so while it waits
+    # it holds neither the event loop nor a worker thread
+    @asynccontextmanager
+    async def ahold(self, key):
+        entry = self._checkout(key)
+        try:
+            delay = LOCK_POLL_MIN
+            while not entry[0].acquire(blocking=False):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, LOCK_POLL_MAX)
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            self._checkin(key, entry)
+
+
+# In-memory stand-in for the Tasks table, for local runs and tests with a single
+# process. Status polls must reach the process that ran the task.
+class LocalTaskStore:
+    def __init__(self):
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def create_task(self, kind):
+        task_id = str(ulid.new())
+        now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+        with self._lock:
+            self._tasks[task_id] = {
+                "task_id": task_id,
+                "kind": kind,
+                "status": "queued",
+                "progress": None,
+                "result": None,
+                "error": None,
+                "created_at": now,
+                "updated_at": now
+            }
+        return {
+            "data": {"task_id": task_id},
+            "status": "success"
+        }
+
+    def update_task(self, task_id, **fields):
+        fields["updated_at"] = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+        with self._lock:
+            if task_id in self._tasks:
+                self._tasks[task_id].update(fields)
+        return {
+            "status": "success"
+        }
+
+    def fail_stale_tasks(self, stale_seconds):
+        cutoff = (datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=stale_seconds)).isoformat()
+        now = datetime.now(timezone.utc).replace(tzinfo=None).isoformat()
+        failed = 0
+        with self._lock:
+            for task in self._tasks.values():
+                if task["status"] in ("queued", "running") and task["updated_at"] < cutoff:
+                    task.update(status="failed", error=INTERRUPTED_TASK_ERROR, updated_at=now)
+                    failed += 1
+        return {
+            "data": {"failed": failed},
+            "status": "success"
+        }
+
+    def get_task(self, task_id):
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if not task:
+                return {
+                    "error": "Task not found",
+                    "status": "failure"
+                }
+            return {
+                "data": dict(task),
+                "status": "success"
+            }
+
+
+class TaskQueue:
+    def __init__(self, store, max_workers=TASK_WORKERS):
+        self.store = store
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="task")
+        self._key_locks = KeyedLocks()
+        # Keyed tasks waiting for the one running for their key; a key is
+        # present while one of its tasks is on (or headed for) a worker
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._pending_drained = threading.Condition(self._pending_lock)
+        # Strong references; the event loop only keeps weak ones to its tasks
+        self._async_tasks = set()
+
+    # The lock tasks submitted with `key` run under, for work done outside the
+    # queue (a streamed reply) that must not interleave with them
+    def key_lock(self, key):
+        return self._key_locks.hold(key) if key is not None else nullcontext()
+
+    def async_key_lock(self, key):
+        return self._key_locks.ahold(key) if key is not None else nullcontext()
+
+    # fn must return the usual {"status": "success" | "failure", ...} dict and
+    # accept a `progress` callback. Tasks sharing a key run one at a time, so
+    # e.g. two follow-ups for the same person cannot interleave their writes.
+    # Only the first task for a key goes to the pool; the rest wait in
+    # _pending and are handed over as each one finishes, so a burst for one
+    # person occupies a single worker rather than all of them.
+    def submit(self, kind, fn, *args, key=None, **kwargs):
+        r = self.store.create_task(kind)
+        if r.get("status") == "failure":
+            return r
+
+        task_id = r["data"]["task_id"]
+        # Runs in the submitter's context so task logs keep its request id
+        job = (contextvars.copy_context(), task_id, kind, key, fn, args, kwargs)
+        if key is None:
+            self._start(job)
+        else:
+            with self._pending_lock:
+                waiting = self._pending.get(key)
+                if waiting is None:
+                    self._pending[key] = deque()
+                else:
+                    waiting.append(job)
+            if waiting is None:
+                self._start(job)
+
+        return {
+            "data": {"task_id": task_id},
+            "status": "success"
+        }
+
+    def _start(self, job):
+        context, *run_args = job
+        self.executor.submit(context.run, self._run, *run_args)
+
+    # Hands the key's next waiting task to the pool, or retires the key
+    def _start_next(self, key):
+        with self._pending_lock:
+            waiting = self._pending[key]
+            if not waiting:
+                del self._pending[key]
+                self._pending_drained.notify_all()
+                return
+            job = waiting.popleft()
+        self._start(job)
+
+    def _run(self, task_id, kind, key, fn, args, kwargs):
+        try:
+            self._execute(task_id, kind, key, fn, args, kwargs)
+        finally:
+            if key is not None:
+                self._start_next(key)
+
+    def _execute(self, task_id, kind, key, fn, args, kwargs):
+        def progress(message):
+            self.store.update_task(task_id, progress=message)
+
+        started = None
+        try:
+            # Still taken: streams and async tasks for the key run outside
+            # the pool and must not interleave with this task
+            with self.key_lock(key):
+                started = time.perf_counter()
+                self.store.update_task(task_id, status="running")
+                result = fn(*args, progress=progress, **kwargs)
+        except Exception as e:
+            logger.exception("task crashed", extra={"fields": {"task_id": task_id, "kind": kind}})
+            self._finish(task_id, kind, started, status="failed", error=str(e))
+            return
+
+        if result.get("status") == "failure":
+            logger.warning("task failed", extra={"fields": {"task_id": task_id, "kind": kind, "error": result.get("error")}})
+            self._finish(task_id, kind, started, status="failed", result=result, error=result.get("error"))
+        else:
+            self._finish(task_id, kind, started, status="succeeded", result=result)
+
+    def _finish(self, task_id, kind, started, **fields):
+        if started is not None:
+            TASK_SECONDS.observe(time.perf_counter() - started, kind=kind, status=fields["status"])
+        self.store.update_task(task_id, **fields)
+
+    # Async counterpart of submit for the ASGI routes: fn is a coroutine
+    # function and runs on the caller's event loop, so a task waiting on the
+    # model holds no thread. Store writes go through the thread pool.
+    async def submit_async(self, kind, fn, *args, key=None, **kwargs):
+        r = await asyncio.to_thread(self.store.create_task, kind)
+        if r.get("status") == "failure":
+            return r
+
+        task_id = r["data"]["task_id"]
+        task = asyncio.create_task(self._run_async(task_id, kind, key, fn, args, kwargs))
+        self._async_tasks.add(task)
+        task.add_done_callback(self._async_tasks.discard)
+
+        return {
+            "data": {"task_id": task_id},
+            "status": "success"
+        }
+
+    async def _run_async(self, task_id, kind, key, fn, args, kwargs):
+        def progress(message):
+            # Callable from the event loop and from worker threads alike
+            self.executor.submit(self.store.update_task, task_id, progress=message)
+
+        started = None
+        try:
+            async with self.async_key_lock(key):
+                started = time.perf_counter()
+                await asyncio.to_thread(self.store.update_task, task_id, status="running")
+                result = await fn(*args, progress=progress, **kwargs)
+        except Exception as e:
+            logger.exception("task crashed", extra={"fields": {"task_id": task_id, "kind": kind}})
+            await asyncio.to_thread(self._finish, task_id, kind, started, status="failed", error=str(e))
+            return
+
+        if result.get("status") == "failure":
+            logger.warning("task failed", extra={"fields": {"task_id": task_id, "kind": kind, "error": result.get("error")}})
+            await asyncio.to_thread(self._finish, task_id, kind, started, status="failed", result=result, error=result.get("error"))
+        else:
+            await asyncio.to_thread(self._finish, task_id, kind, started, status="succeeded", result=result)
+
+    def get(self, task_id):
+        return self.store.get_task(task_id)
+
+    def shutdown(self, wait=True):
+        # Waiting tasks reach the pool only as the task ahead of them
+        # finishes, so let every chain run out before closing it
+        if wait:
+            with self._pending_drained:
+                self._pending_drained.wait_for(lambda: not self._pending)
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,333 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from flask import Response, g, request
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import types
+import ulid
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# "json" (one object per line, for log shippers) or "text" for local reading
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+
+# Set per request (and copied into the background tasks it submits) so every
+# log line can be traced back to the request that caused it
+request_id_var = ContextVar("request_id", default=None)
+
+logger = logging.getLogger("job_ref_sys")
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(labels):
+    labels = list(labels)
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in labels) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{format_labels(zip(self.labelnames, key))} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+# Metrics are kept per worker process; scrape each worker (or run one) to
+# see the whole picture
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, help, labelnames=()):
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds", "Time to produce a response (headers, for streams)", ("method", "route", "status"))
+DB_METHOD_SECONDS = metrics.histogram(
+    "db_method_duration_seconds", "Duration of Database method calls, to the last row for streamed lists", ("method", "outcome"))
+DB_METHOD_ROWS = metrics.histogram(
+    "db_method_rows", "Rows returned or changed per Database method call", ("method",), buckets=ROW_BUCKETS)
+DB_STATEMENT_SECONDS = metrics.histogram(
+    "db_statement_duration_seconds", "Duration of individual SQL statements", ("operation",))
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "llm_request_duration_seconds", "Duration of model calls, to the last chunk for streams", ("model", "call", "outcome"))
+LLM_TOKENS = metrics.counter(
+    "llm_tokens_total", "Tokens reported by the model", ("model", "type"))
+LLM_POLICY_EVENTS = metrics.counter(
+    "llm_call_policy_events_total", "Retries, rate-limit waits and rejections by the call policy", ("model", "event"))
+RESUME_RENDER_SECONDS = metrics.histogram(
+    "resume_render_duration_seconds", "Time from queueing a resume render to its DOCX/PDF being written", ("outcome",))
+TASK_SECONDS = metrics.histogram(
+    "task_duration_seconds", "Background task run time, excluding queueing", ("kind", "status"))
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": request_id_var.get(),
+        }
+        # logger.info("...", extra={"fields": {...}}) adds structured fields
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging():
+    root = logging.getLogger()
+    if getattr(root, "_job_ref_sys_configured", False):
+        return
+    handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+    root._job_ref_sys_configured = True
+
+
+def row_count(r):
+    data = r.get("data") if isinstance(r, dict) else None
+    if isinstance(data, (list, set, tuple)):
+        return len(data)
+    if isinstance(data, dict):
+        for key in ("updated", "deleted"):
+            if isinstance(data.get(key), int):
+                return data[key]
+    return None
+
+
+# A streamed list (stream=True) runs its query while the response is being
+# sent, after the method has returned; its time and row count are recorded
+# when the rows run out, fail, or are closed early by a departing client
+def timed_rows(name, rows, started):
+    count = 0
+    outcome = "closed"
+    try:
+        for row in rows:
+            count += 1
+            yield row
+        outcome = "success"
+    except Exception as e:
+        outcome = "failure"
+        logger.warning("database call failed", extra={"fields": {
+            "method": name, "error": str(e), "rows": count,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+        }})
+        raise
+    finally:
+        rows.close()
+        DB_METHOD_SECONDS.observe(time.perf_counter() - started, method=name, outcome=outcome)
+        DB_METHOD_ROWS.observe(count, method=name)
+
+
+def timed_db_method(name, fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        r = fn(*args, **kwargs)
+        if isinstance(r, dict) and isinstance(r.get("data"), types.GeneratorType):
+            r["data"] = timed_rows(name, r["data"], started)
+            return r
+        elapsed = time.perf_counter() - started
+
+        failed = isinstance(r, dict) and r.get("status") == "failure"
+        DB_METHOD_SECONDS.observe(elapsed, method=name, outcome="failure" if failed else "success")
+        rows = row_count(r)
+        if rows is not None:
+            DB_METHOD_ROWS.observe(rows, method=name)
+        if failed:
+            # Missing rows are an expected answer; anything else was swallowed
+            # into the result dict and would otherwise leave no trace
+            error = str(r.get("error"))
+            level = logging.DEBUG if error.endswith("not found") else logging.WARNING
+            logger.log(level, "database call failed", extra={"fields": {
+                "method": name, "error": error, "duration_ms": round(elapsed * 1000, 2)
+            }})
+        return r
+    return wrapper
+
+
+# Class decorator: times every public method of Database
+def instrument_methods(cls):
+    for name, value in list(vars(cls).items()):
+        if name.startswith("_") or not callable(value) or isinstance(value, (classmethod, staticmethod)):
+            continue
+        setattr(cls, name, timed_db_method(name, value))
+    return cls
+
+
+def watch_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        context._telemetry_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def finish_statement(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_telemetry_started", None)
+        if started is None:
+            return
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        DB_STATEMENT_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+
+def record_llm_call(model, call, started, usage=None, error=None):
+    elapsed = time.perf_counter() - started
+    LLM_REQUEST_SECONDS.observe(elapsed, model=model, call=call, outcome="failure" if error else "success")
+    fields = {"model": model, "call": call, "duration_ms": round(elapsed * 1000, 2)}
+    if usage is not None:
+        for kind, attribute in (("prompt", "prompt_token_count"), ("completion", "candidates_token_count")):
+            tokens = getattr(usage, attribute, None) or 0
+            LLM_TOKENS.inc(tokens, model=model, type=kind)
+            fields[f"{kind}_tokens"] = tokens
+    if error is not None:
+        fields.update(error=str(error), code=getattr(error, "code", None))
+        logger.warning("llm call failed", extra={"fields": fields})
+    else:
+        logger.info("llm call", extra={"fields": fields})
+
+
+def observe_request(method, route, path, status, started):
+    elapsed = time.perf_counter() - started
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=status)
+    logger.info("request", extra={"fields": {
+        "method": method,
+        "route": route,
+        "path": path,
+        "status": status,
+        "duration_ms": round(elapsed * 1000, 2)
+    }})
+
+
+def register_telemetry(app):
+    configure_logging()
+
+    @app.before_request
+    def start_request():
+        g.request_started = time.perf_counter()
+        # Honour an id set by a proxy so logs line up across services
+        g.request_id_token = request_id_var.set(request.headers.get("X-Request-ID") or str(ulid.new()))
+
+    @app.after_request
+    def finish_request(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        observe_request(request.method, route, request.path, response.status_code, started)
+        response.headers["X-Request-ID"] = request_id_var.get()
+        return response
+
+    @app.teardown_request
+    def reset_request_id(exc):
+        token = g.pop("request_id_token", None)
+        if token is not None:
+            request_id_var.reset(token)
+
+    @app.route("/metrics", methods=["GET"])
+    def prometheus_metrics():
+        return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+# The same request id, latency histogram and log line for the Quart app in
+# asgi.py. Each request runs in its own asyncio task, so the context variable
+# needs no reset.
+def register_async_telemetry(app):
+    from quart import g as async_g, request as async_request
+
+    configure_logging()
+
+    @app.before_request
+    async def start_request():
+        async_g.request_started = time.perf_counter()
+        request_id_var.set(async_request.headers.get("X-Request-ID") or str(ulid.new()))
+
+    @app.after_request
+    async def finish_request(response):
+        route = async_request.url_rule.rule if async_request.url_rule else "unmatched"
+        observe_request(async_request.method, route, async_request.path, response.status_code, async_g.request_started)
+        response.headers["X-Request-ID"] = request_id_var.get()
+        return response